@@ -0,0 +1,93 @@
+"""
+Row-at-a-time versus bulk ingestion of tracks and enriched data.
+
+Run from the project root:
+
+    python -m benchmarks.bench_bulk_ingest --rows 100000
+"""
+
+import argparse
+import time
+
+from src.database import DatabaseModels
+
+from .common import add_on_disk_argument, bench_database
+
+
+def make_rows(count: int):
+    tracks = [
+        {
+            "id": f"track{i}",
+            "name": f"Song {i}",
+            "artist": f"Artist {i % 500}",
+            "album": f"Album {i % 2000}",
+            "played_at": "2025-10-03T12:00:00.000Z",
+        }
+        for i in range(count)
+    ]
+    enriched = [
+        {
+            "track_id": f"track{i}",
+            "popularity": i % 100,
+            "duration_ms": 180000 + i,
+            "explicit": i % 7 == 0,
+            "release_date": "2023-01-15",
+            "album_type": "album",
+            "genres": ["rock", f"genre{i % 40}"],
+            "artist_popularity": 55.0,
+            "artist_followers": 1000 + i,
+        }
+        for i in range(count)
+    ]
+    return tracks, enriched
+
+
+def run_row_at_a_time(db_models: DatabaseModels, tracks, enriched) -> float:
+    start = time.perf_counter()
+    for track in tracks:
+        db_models.save_track(
+            track["id"],
+            track["name"],
+            track["artist"],
+            track["album"],
+            track["played_at"],
+        )
+    for row in enriched:
+        db_models.save_enriched_track_data(row["track_id"], row)
+    return time.perf_counter() - start
+
+
+def run_bulk(db_models: DatabaseModels, tracks, enriched) -> float:
+    start = time.perf_counter()
+    db_models.save_tracks_bulk(tracks)
+    db_models.save_enriched_track_data_bulk(enriched)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingestion benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument(
+        "--row-at-a-time-rows",
+        type=int,
+        default=2_000,
+        help="rows for the (slow) per-row baseline",
+    )
+    add_on_disk_argument(parser)
+    args = parser.parse_args()
+
+    for label, runner, count in (
+        ("row-at-a-time", run_row_at_a_time, args.row_at_a_time_rows),
+        ("bulk", run_bulk, args.rows),
+    ):
+        tracks, enriched = make_rows(count)
+        with bench_database(args.on_disk) as db_models:
+            elapsed = runner(db_models, tracks, enriched)
+        print(
+            f"{label:<14}{count:>9} rows {elapsed:>8.2f} s "
+            f"{count / elapsed:>12,.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Per-call latency of DatabaseModels with and without a persistent
+connection.
+
+Run from the project root:
+
+    python -m benchmarks.bench_connection --calls 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from src.database import DatabaseConnection, DatabaseModels
+
+
+def run(persistent: bool, calls: int) -> dict:
+    """Time save_track and track_exists calls in one connection mode."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "bench.duckdb")
+        db_models = DatabaseModels(
+            DatabaseConnection(db_path, persistent=persistent)
+        )
+        db_models.initialize_database()
+
+        start = time.perf_counter()
+        for i in range(calls):
+            db_models.save_track(
+                f"track{i}",
+                f"Song {i}",
+                "Artist",
+                "Album",
+                "2025-10-03T12:00:00.000Z",
+            )
+        write_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(calls):
+            db_models.track_exists(f"track{i}")
+        read_elapsed = time.perf_counter() - start
+
+        db_models.close()
+
+    return {
+        "save_track_us": write_elapsed / calls * 1e6,
+        "track_exists_us": read_elapsed / calls * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="DuckDB connection mode benchmark"
+    )
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'save_track':>16}{'track_exists':>16}")
+    for label, persistent in (("per-call", False), ("persistent", True)):
+        result = run(persistent, args.calls)
+        print(
+            f"{label:<12}"
+            f"{result['save_track_us']:>13.1f} us"
+            f"{result['track_exists_us']:>13.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Genre queries over the track_genres bridge table versus parsing the
+JSON genres column.
+
+Run from the project root:
+
+    python -m benchmarks.bench_genres --rows 1000000
+"""
+
+import argparse
+import time
+
+from src.database import DatabaseModels
+from src.database.models import _sync_track_genres
+
+from .common import add_on_disk_argument, bench_database
+
+JSON_GENRE_COUNTS = """
+    SELECT genre, count(*) AS plays
+    FROM (
+        SELECT unnest(CAST(et.genres AS VARCHAR[])) AS genre
+        FROM plays p
+        JOIN enriched_track_data et ON p.track_id = et.track_id
+    )
+    GROUP BY genre
+    ORDER BY plays DESC, genre
+"""
+
+JSON_TRACKS_BY_GENRE = """
+    SELECT t.id, t.name, t.artist, t.album, t.played_at, et.popularity
+    FROM tracks t
+    JOIN enriched_track_data et ON t.id = et.track_id
+    WHERE list_contains(CAST(et.genres AS VARCHAR[]), ?)
+    ORDER BY et.popularity DESC NULLS LAST, t.id
+"""
+
+
+def populate(db_models: DatabaseModels, rows: int):
+    """Create ``rows`` tracks and plays with 1-3 of 500 genres each."""
+    with db_models.db as conn:
+        conn.execute(
+            """
+            INSERT INTO tracks (id, name, artist, album, played_at)
+            SELECT 'track' || i, 'Song ' || i, 'Artist ' || (i % 5000),
+                   'Album ' || (i % 20000),
+                   TIMESTAMP '2024-01-01' + INTERVAL (i) MINUTE
+            FROM range(?) r(i)
+        """,
+            [rows],
+        )
+        conn.execute(
+            """
+            INSERT INTO plays (track_id, played_at)
+            SELECT id, played_at FROM tracks ORDER BY played_at
+        """
+        )
+        conn.execute(
+            """
+            INSERT INTO enriched_track_data (track_id, popularity, genres)
+            SELECT 'track' || i, i % 100,
+                   to_json(list_transform(
+                       range(1 + i % 3),
+                       k -> 'genre' || ((i * 7 + k * 131) % 500)
+                   ))
+            FROM range(?) r(i)
+        """,
+            [rows],
+        )
+
+
+def timed(label: str, func, repeat: int = 5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<34}{min(timings) * 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genre storage benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    add_on_disk_argument(parser)
+    args = parser.parse_args()
+
+    with bench_database(args.on_disk) as db_models:
+        populate(db_models, args.rows)
+
+        start = time.perf_counter()
+        with db_models.db as conn:
+            _sync_track_genres(
+                conn, "SELECT track_id FROM enriched_track_data"
+            )
+        print(
+            f"{'build bridge table':<34}"
+            f"{(time.perf_counter() - start) * 1000:>10.1f} ms"
+        )
+
+        with db_models.db as conn:
+            timed(
+                "genre counts (JSON)",
+                lambda: conn.execute(JSON_GENRE_COUNTS).fetchall(),
+            )
+            timed("genre counts (bridge)", db_models.genre_counts)
+            timed(
+                "tracks by genre (JSON)",
+                lambda: conn.execute(
+                    JSON_TRACKS_BY_GENRE, ["genre42"]
+                ).fetchall(),
+            )
+            timed(
+                "tracks by genre (bridge)",
+                lambda: db_models.tracks_by_genre("genre42"),
+            )
+
+
+if __name__ == "__main__":
+    main()
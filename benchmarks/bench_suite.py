@@ -0,0 +1,295 @@
+"""
+Throughput, latency and peak memory of the enrichment, sync, ingest and
+read paths, driven by a synthetic Spotify API.
+
+Run from the project root:
+
+    python -m benchmarks.bench_suite --scales 1000 100000 \\
+        --output bench_results.json
+
+Every scenario and scale runs in a fresh process, so the peak RSS
+reported is its own. The JSON output records the commit and library
+versions next to the results, so runs can be compared over time.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Dict, List
+
+import duckdb
+import numpy as np
+
+from src.data_persistence import DataPersistenceLayer
+from src.database import DatabaseConnection, DatabaseModels
+from src.rate_limiter import RateLimiter
+from src.spotify_client import RECENTLY_PLAYED_PAGE_SIZE, SpotifyClient
+
+from .fake_spotify import FakeSpotify
+
+# Rows per save_tracks_bulk call when loading synthetic history
+INGEST_CHUNK_ROWS = 100_000
+
+
+def _record(
+    operation: str, rows: int, elapsed: float, latencies: List[float]
+) -> Dict:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "operation": operation,
+        "rows": rows,
+        "calls": len(latencies),
+        "seconds": elapsed,
+        "rows_per_s": rows / elapsed if elapsed else None,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def _client(fake: FakeSpotify, workers: int) -> SpotifyClient:
+    # No throttling: the stand-in has no rate limit to respect
+    return SpotifyClient(
+        rate_limiter=RateLimiter(rate=1e9, burst=10**9),
+        max_workers=workers,
+        spotify=fake,
+    )
+
+
+def _load_history(db_models: DatabaseModels, fake: FakeSpotify, rows: int):
+    """Save ``rows`` plays and their tracks' enriched data; yield timings."""
+    plays = fake.play_frame(rows)
+    for start in range(0, rows, INGEST_CHUNK_ROWS):
+        chunk = plays.iloc[start : start + INGEST_CHUNK_ROWS]
+        began = time.perf_counter()
+        db_models.save_tracks_bulk(chunk)
+        yield "save_tracks_bulk", len(chunk), time.perf_counter() - began
+
+    enriched = fake.enriched_frame(plays["id"])
+    for start in range(0, len(enriched), INGEST_CHUNK_ROWS):
+        chunk = enriched.iloc[start : start + INGEST_CHUNK_ROWS]
+        began = time.perf_counter()
+        db_models.save_enriched_track_data_bulk(chunk)
+        yield (
+            "save_enriched_track_data_bulk",
+            len(chunk),
+            time.perf_counter() - began,
+        )
+
+
+def bench_enrich(scale: int, args) -> List[Dict]:
+    """SpotifyClient.get_track_enriched_data over ``scale`` tracks."""
+    fake = FakeSpotify(tracks=scale, latency=args.latency)
+    client = _client(fake, args.workers)
+    latencies = []
+    rows = 0
+    start = time.perf_counter()
+    batch_start = start
+    for batch in client.iter_track_enriched_data(fake.track_ids(scale)):
+        now = time.perf_counter()
+        latencies.append(now - batch_start)
+        batch_start = now
+        rows += len(batch)
+    elapsed = time.perf_counter() - start
+    return [_record("get_track_enriched_data", rows, elapsed, latencies)]
+
+
+def bench_sync(scale: int, args) -> List[Dict]:
+    """Sync ``scale`` plays, one recently-played page per cycle."""
+    fake = FakeSpotify(tracks=max(scale, 1000), latency=args.latency)
+    persistence = DataPersistenceLayer(
+        _client(fake, args.workers),
+        DatabaseModels(
+            DatabaseConnection.in_memory(), cache_enriched_ids=True
+        ),
+    )
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(0, scale, RECENTLY_PLAYED_PAGE_SIZE):
+        fake.advance(RECENTLY_PLAYED_PAGE_SIZE)
+        began = time.perf_counter()
+        persistence.sync_recent_tracks_with_enriched_data()
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    persistence.close()
+    return [
+        _record(
+            "sync_recent_tracks_with_enriched_data",
+            len(latencies) * RECENTLY_PLAYED_PAGE_SIZE,
+            elapsed,
+            latencies,
+        )
+    ]
+
+
+def bench_ingest(scale: int, args) -> List[Dict]:
+    """Bulk-save ``scale`` synthetic plays and their enriched data."""
+    fake = FakeSpotify(tracks=max(scale, 1000))
+    db_models = DatabaseModels(DatabaseConnection.in_memory())
+    db_models.initialize_database()
+    timings = {}
+    for operation, rows, elapsed in _load_history(db_models, fake, scale):
+        timings.setdefault(operation, []).append((rows, elapsed))
+    db_models.close()
+    return [
+        _record(
+            operation,
+            sum(rows for rows, _ in chunks),
+            sum(elapsed for _, elapsed in chunks),
+            [elapsed for _, elapsed in chunks],
+        )
+        for operation, chunks in timings.items()
+    ]
+
+
+def bench_reads(scale: int, args) -> List[Dict]:
+    """Time DatabaseModels reads over a history of ``scale`` plays."""
+    fake = FakeSpotify(tracks=max(scale, 1000))
+    db_models = DatabaseModels(DatabaseConnection.in_memory())
+    db_models.initialize_database()
+    for _ in _load_history(db_models, fake, scale):
+        pass
+
+    queries = {
+        "get_recent_tracks": lambda: db_models.get_recent_tracks(limit=50),
+        "get_recent_tracks_user": lambda: db_models.get_recent_tracks(
+            limit=50, user_id="user0", output="pandas"
+        ),
+        "get_latest_played_at": lambda: db_models.get_latest_played_at(
+            "user0"
+        ),
+        "genre_counts": lambda: db_models.genre_counts(limit=20),
+    }
+    records = []
+    for operation, query in queries.items():
+        latencies = []
+        rows = 0
+        for _ in range(args.repeat):
+            began = time.perf_counter()
+            result = query()
+            latencies.append(time.perf_counter() - began)
+            rows += len(result) if hasattr(result, "__len__") else 1
+        records.append(_record(operation, rows, sum(latencies), latencies))
+    db_models.close()
+    return records
+
+
+SCENARIOS = {
+    "enrich": bench_enrich,
+    "sync": bench_sync,
+    "ingest": bench_ingest,
+    "reads": bench_reads,
+}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_scenario(name: str, scale: int, args) -> List[Dict]:
+    """Run one scenario at one scale; meant for a fresh process."""
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        records = SCENARIOS[name](scale, args)
+    peak_rss_mb = _peak_rss_mb()
+    return [
+        {
+            "scenario": name,
+            "scale": scale,
+            **record,
+            "peak_rss_mb": peak_rss_mb,
+        }
+        for record in records
+    ]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest and query benchmark suite"
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+        help="rows per scenario, e.g. 1000 ... 10000000",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="simulated seconds per Spotify API call",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=50, help="calls per read query"
+    )
+    parser.add_argument("--output", help="write results as JSON here")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'scenario':<8}{'scale':>10}  {'operation':<38}"
+        f"{'rows/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'RSS MB':>9}"
+    )
+    for name in args.scenarios:
+        for scale in args.scales:
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=get_context("spawn")
+            ) as executor:
+                records = executor.submit(
+                    run_scenario, name, scale, args
+                ).result()
+            for record in records:
+                rows_per_s = record["rows_per_s"] or 0
+                print(
+                    f"{name:<8}{scale:>10}  {record['operation']:<38}"
+                    f"{rows_per_s:>12,.0f}{record['p50_ms']:>10.2f}"
+                    f"{record['p99_ms']:>10.2f}"
+                    f"{record['peak_rss_mb']:>9.0f}"
+                )
+            results.extend(records)
+
+    if args.output:
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "arguments": vars(args),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from src.database import DatabaseConnection, DatabaseModels
+
+
+@contextmanager
+def bench_database(on_disk: bool = False) -> Iterator[DatabaseModels]:
+    """
+    Yield initialized DatabaseModels on a persistent connection.
+
+    The database is in memory unless ``on_disk`` is set, so timings
+    measure DuckDB's CPU work rather than fsync.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if on_disk:
+            db_conn = DatabaseConnection(
+                os.path.join(temp_dir, "bench.duckdb"), persistent=True
+            )
+        else:
+            db_conn = DatabaseConnection.in_memory()
+        db_models = DatabaseModels(db_conn)
+        try:
+            db_models.initialize_database()
+            yield db_models
+        finally:
+            db_models.close()
+
+
+def add_on_disk_argument(parser):
+    parser.add_argument(
+        "--on-disk",
+        action="store_true",
+        help="use a database file instead of an in-memory database",
+    )
@@ -0,0 +1,250 @@
+"""
+Deterministic stand-in for the parts of the Spotify Web API we call.
+
+Catalog entities are derived from their index on demand, so a catalog
+of 10^7 tracks costs no memory until it is requested. Responses have
+the shape of Spotify's JSON, so SpotifyClient parses them unchanged.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Plays start here and follow each other every three minutes
+HISTORY_START_MS = 1_735_689_600_000  # 2025-01-01T00:00:00Z
+PLAY_INTERVAL_MS = 3 * 60 * 1000
+
+GENRE_WORDS = [
+    "indie",
+    "pop",
+    "rock",
+    "dance",
+    "danish",
+    "electronic",
+    "hip hop",
+    "jazz",
+    "folk",
+    "metal",
+    "soul",
+    "techno",
+    "lo-fi",
+    "punk",
+    "ambient",
+]
+
+
+def _track_id(index: int) -> str:
+    return f"track{index:09d}"
+
+
+def _artist_id(index: int) -> str:
+    return f"artist{index:07d}"
+
+
+def _index(entity_id: str) -> int:
+    return int(entity_id.lstrip("abcdefghijklmnopqrstuvwxyz"))
+
+
+def _iso(ms: int) -> str:
+    played_at = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    return played_at.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class FakeSpotify:
+    """
+    Generate tracks, artists, genres and play histories at any scale.
+
+    ``tracks`` catalog entries are spread over ``tracks // 10`` artists
+    drawing from ``genres`` genre names. Plays pick tracks with a
+    heavy-tailed popularity, like real listening. ``latency`` seconds
+    are slept per call to model the network.
+    """
+
+    def __init__(
+        self,
+        tracks: int = 100_000,
+        genres: int = 500,
+        seed: int = 0,
+        latency: float = 0.0,
+    ):
+        self.track_count = tracks
+        self.artist_count = max(1, tracks // 10)
+        self.seed = seed
+        self.latency = latency
+        self.genre_names = self._make_genres(genres)
+        self.calls = 0
+        self._available_plays = 0
+        self._lock = threading.Lock()
+
+    def _make_genres(self, count: int) -> List[str]:
+        rng = random.Random(self.seed)
+        names = []
+        while len(names) < count:
+            name = " ".join(rng.sample(GENRE_WORDS, rng.randint(1, 3)))
+            names.append(f"{name} {len(names)}")
+        return names
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def track_ids(self, count: int) -> List[str]:
+        """IDs of the first ``count`` catalog tracks."""
+        return [_track_id(i) for i in range(min(count, self.track_count))]
+
+    def track(self, index: int) -> Dict:
+        """The full track object for a catalog index."""
+        rng = random.Random(self.seed * 1_000_003 + index)
+        artists = [index % self.artist_count]
+        if rng.random() < 0.2:
+            artists.append(rng.randrange(self.artist_count))
+        return {
+            "id": _track_id(index),
+            "name": f"Song {index}",
+            "popularity": rng.randint(0, 100),
+            "duration_ms": rng.randint(90_000, 420_000),
+            "explicit": rng.random() < 0.15,
+            "album": {
+                "name": f"Album {index // 12}",
+                "release_date": f"{rng.randint(1960, 2025)}-01-01",
+                "album_type": rng.choice(["album", "single", "compilation"]),
+            },
+            "artists": [
+                {"id": _artist_id(a), "name": f"Artist {a}"} for a in artists
+            ],
+        }
+
+    def artist(self, index: int) -> Dict:
+        """The full artist object for an artist index."""
+        rng = random.Random(self.seed * 7_000_003 + index)
+        return {
+            "id": _artist_id(index),
+            "name": f"Artist {index}",
+            "genres": rng.sample(self.genre_names, rng.randint(0, 4)),
+            "popularity": rng.randint(0, 100),
+            "followers": {"total": int(rng.paretovariate(1.2) * 1000)},
+        }
+
+    def play(self, user_id: str, position: int) -> Dict:
+        """The ``position``-th play in a user's history."""
+        rng = random.Random(f"{self.seed}/{user_id}/{position}")
+        # Heavy-tailed rank, scattered over the catalog
+        rank = min(int(rng.paretovariate(1.1)) - 1, self.track_count - 1)
+        return {
+            "track": self.track(rank * 7919 % self.track_count),
+            "played_at": _iso(HISTORY_START_MS + position * PLAY_INTERVAL_MS),
+        }
+
+    def play_frame(self, count: int, users: int = 10) -> pd.DataFrame:
+        """
+        ``count`` plays spread over ``users`` users, built with NumPy.
+
+        Rows are shaped like SpotifyClient.get_recent_tracks output and
+        in played_at order, for loading large histories directly.
+        """
+        rng = np.random.default_rng(self.seed)
+        rank = np.minimum(
+            rng.pareto(1.1, count).astype("int64"), self.track_count - 1
+        )
+        track = rank * 7919 % self.track_count
+        track_ids = np.char.add("track", np.char.zfill(track.astype(str), 9))
+        played_at = pd.to_datetime(
+            HISTORY_START_MS + np.arange(count) * (PLAY_INTERVAL_MS // users),
+            unit="ms",
+        )
+        return pd.DataFrame(
+            {
+                "id": track_ids,
+                "name": np.char.add("Song ", track.astype(str)),
+                "artist": np.char.add(
+                    "Artist ", (track % self.artist_count).astype(str)
+                ),
+                "album": np.char.add("Album ", (track // 12).astype(str)),
+                "played_at": played_at,
+                "user_id": np.char.add(
+                    "user", rng.integers(0, users, count).astype(str)
+                ),
+            }
+        )
+
+    def enriched_frame(self, track_ids) -> pd.DataFrame:
+        """Enriched rows for ``track_ids``, built with NumPy."""
+        track_ids = pd.unique(pd.Series(track_ids))
+        rng = np.random.default_rng(self.seed + 1)
+        count = len(track_ids)
+        genre_counts = rng.integers(0, 5, count)
+        names = np.array(self.genre_names, dtype=object)[
+            rng.integers(0, len(self.genre_names), genre_counts.sum())
+        ]
+        bounds = np.concatenate([[0], np.cumsum(genre_counts)])
+        return pd.DataFrame(
+            {
+                "track_id": track_ids,
+                "popularity": rng.integers(0, 101, count),
+                "duration_ms": rng.integers(90_000, 420_000, count),
+                "explicit": rng.random(count) < 0.15,
+                "release_date": np.char.add(
+                    rng.integers(1960, 2026, count).astype(str), "-01-01"
+                ),
+                "album_type": "album",
+                "genres": [
+                    list(names[start:end])
+                    for start, end in zip(bounds[:-1], bounds[1:])
+                ],
+                "artist_popularity": rng.random(count) * 100,
+                "artist_followers": rng.integers(0, 10**7, count),
+            }
+        )
+
+    def advance(self, plays: int):
+        """Make ``plays`` more plays visible to recently-played calls."""
+        with self._lock:
+            self._available_plays += plays
+
+    # spotipy.Spotify methods used by SpotifyClient
+
+    def tracks(self, tracks: List[str], market=None) -> Dict:
+        self._call()
+        return {
+            "tracks": [
+                self.track(i) if i < self.track_count else None
+                for i in map(_index, tracks)
+            ]
+        }
+
+    def artists(self, artists: List[str]) -> Dict:
+        self._call()
+        return {
+            "artists": [
+                self.artist(i) if i < self.artist_count else None
+                for i in map(_index, artists)
+            ]
+        }
+
+    def current_user_recently_played(
+        self, limit: int = 50, after: int = None, before: int = None
+    ) -> Dict:
+        self._call()
+        available = self._available_plays
+        if after is None:
+            first = max(0, available - limit)
+        else:
+            # Plays strictly after the cursor, oldest first
+            first = max(0, (after - HISTORY_START_MS) // PLAY_INTERVAL_MS + 1)
+        last = min(available, first + limit)
+        items = [
+            self.play("me", position)
+            for position in reversed(range(first, last))
+        ]
+        newest = HISTORY_START_MS + (last - 1) * PLAY_INTERVAL_MS
+        return {
+            "items": items,
+            "cursors": {"after": str(newest)} if items else None,
+        }
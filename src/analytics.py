@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .database import DatabaseModels
+
+# pandas frequency of each rollup period, for filling empty buckets
+PERIOD_FREQUENCIES = {"hour": "h", "day": "D", "week": "W-MON", "month": "MS"}
+
+SUM_COLUMNS = ["plays", "enriched_plays", "popularity_sum", "duration_ms_sum"]
+SERIES_COLUMNS = [
+    "bucket",
+    "user_id",
+    "plays",
+    "avg_popularity",
+    "listening_minutes",
+]
+
+
+class ListeningAnalytics:
+    """
+    Answer dashboard queries from the pre-aggregated rollup tables.
+
+    DatabaseModels adds every newly saved play to hourly and daily
+    rollups per user, artist and genre as part of the same transaction,
+    so these queries read one row per bucket instead of scanning the
+    play history: their cost depends on the window asked for, not on
+    how many plays are stored. Buckets are UTC.
+    """
+
+    def __init__(self, db_models: DatabaseModels):
+        self.db_models = db_models
+
+    def plays_over_time(
+        self,
+        period: str = "day",
+        since: datetime = None,
+        until: datetime = None,
+        user_id: str = None,
+    ) -> pd.DataFrame:
+        """
+        Plays, average popularity and listening time per period and user.
+
+        ``period`` is hour, day, week or month. Periods without plays
+        between a user's first and last are included with zero plays, so
+        the rows chart as a continuous series. ``avg_popularity`` is over
+        enriched plays and NaN where there were none.
+        """
+        frame = self.db_models.get_play_rollups(
+            period, since, until, user_id, output="pandas"
+        )
+        if not frame.empty:
+            frame = self._fill_gaps(frame, period)
+
+        popularity = frame["popularity_sum"].to_numpy("float64")
+        enriched = frame["enriched_plays"].to_numpy("float64")
+        frame["avg_popularity"] = np.divide(
+            popularity,
+            enriched,
+            out=np.full(len(frame), np.nan),
+            where=enriched > 0,
+        )
+        frame["listening_minutes"] = frame["duration_ms_sum"] / 60_000
+        return frame[SERIES_COLUMNS]
+
+    def top_artists(
+        self,
+        since: datetime = None,
+        until: datetime = None,
+        user_id: str = None,
+        limit: int = 10,
+    ) -> List[Dict]:
+        """Most played artists in a window, as {artist, plays} dicts."""
+        return self.db_models.get_top_artists(since, until, user_id, limit)
+
+    def top_genres(
+        self,
+        since: datetime = None,
+        until: datetime = None,
+        user_id: str = None,
+        limit: int = 10,
+    ) -> List[Dict]:
+        """Most played genres in a window, as {genre, plays} dicts."""
+        return self.db_models.get_top_genres(since, until, user_id, limit)
+
+    @staticmethod
+    def _fill_gaps(frame: pd.DataFrame, period: str) -> pd.DataFrame:
+        """Add zero rows for empty periods within each user's range."""
+        frame["bucket"] = frame["bucket"].astype("datetime64[ns]")
+        filled = []
+        for user_id, rows in frame.groupby("user_id", sort=False):
+            buckets = pd.date_range(
+                rows["bucket"].min(),
+                rows["bucket"].max(),
+                freq=PERIOD_FREQUENCIES[period],
+                name="bucket",
+            )
+            rows = rows.set_index("bucket")[SUM_COLUMNS]
+            filled.append(
+                rows.reindex(buckets, fill_value=0)
+                .reset_index()
+                .assign(user_id=user_id)
+            )
+        return pd.concat(filled).sort_values(
+            ["bucket", "user_id"], ignore_index=True
+        )
@@ -0,0 +1,48 @@
+import argparse
+from datetime import datetime
+
+from .database import DatabaseConnection, DatabaseModels
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export or archive play history as Parquet"
+    )
+    parser.add_argument("directory", help="Parquet output directory")
+    parser.add_argument(
+        "--before",
+        type=datetime.fromisoformat,
+        help="only plays before this date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="delete the exported plays from the database afterwards",
+    )
+    parser.add_argument(
+        "--attach",
+        action="store_true",
+        help="serve plays from an existing Parquet directory",
+    )
+    args = parser.parse_args()
+
+    db_models = DatabaseModels(DatabaseConnection.for_writing())
+    try:
+        db_models.initialize_database()
+        if args.attach:
+            db_models.attach_parquet_archive(args.directory)
+            print(f"Attached plays archive at {args.directory}")
+        elif args.archive:
+            if args.before is None:
+                parser.error("--archive requires --before")
+            count = db_models.archive_plays(args.directory, args.before)
+            print(f"Archived {count} plays to {args.directory}")
+        else:
+            count = db_models.export_parquet(args.directory, args.before)
+            print(f"Exported {count} plays to {args.directory}")
+    finally:
+        db_models.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Artist genres and follower counts drift slowly; a week is fresh enough
+DEFAULT_ARTIST_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Track metadata is fixed, but popularity moves; refresh it daily
+DEFAULT_TRACK_REFRESH_SECONDS = 24 * 60 * 60
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after a TTL.
+
+    Entries carry the wall-clock time they were fetched at, so values
+    loaded from a persistent store keep their original age.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl_seconds: float = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, fetched_at = entry
+            if self._is_expired(fetched_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, fetched_at: float = None):
+        """Store a value, evicting the least recently used when full."""
+        with self._lock:
+            self._entries[key] = (value, fetched_at or time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _is_expired(self, fetched_at: float) -> bool:
+        if self.ttl_seconds is None:
+            return False
+        return time.time() - fetched_at > self.ttl_seconds
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ArtistCache:
+    """
+    Artist metadata cache shared across enrichment batches and runs.
+
+    Lookups go to an in-process LRU first, then to an optional
+    persistent store (DatabaseModels) holding the ``artists`` table.
+    Only unknown or stale artist IDs need to be fetched from Spotify.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        ttl_seconds: float = DEFAULT_ARTIST_TTL_SECONDS,
+        max_size: int = 10_000,
+    ):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self._memory = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, artist_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Return fresh cached artist info for the given IDs."""
+        artist_ids = list(artist_ids)
+        found = {}
+        remaining = []
+        for artist_id in artist_ids:
+            info = self._memory.get(artist_id)
+            if info is None:
+                remaining.append(artist_id)
+            else:
+                found[artist_id] = info
+
+        if remaining and self.store is not None:
+            fresh_since = datetime.fromtimestamp(
+                time.time() - self.ttl_seconds, tz=timezone.utc
+            ).replace(tzinfo=None)
+            stored = self.store.get_artists(remaining, fresh_since=fresh_since)
+            for artist_id, info in stored.items():
+                fetched_at = info.pop("fetched_at")
+                self._memory.set(
+                    artist_id,
+                    info,
+                    fetched_at.replace(tzinfo=timezone.utc).timestamp(),
+                )
+                found[artist_id] = info
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(artist_ids) - len(found)
+        return found
+
+    def put_many(self, artists: Dict[str, Dict]):
+        """Cache freshly fetched artist info in memory and in the store."""
+        if not artists:
+            return
+        for artist_id, info in artists.items():
+            self._memory.set(artist_id, info)
+        if self.store is None:
+            return
+        # A failed write only costs a refetch later; the caller's
+        # enrichment batch must not fail because of it
+        try:
+            self.store.save_artists_bulk(
+                [
+                    {"id": artist_id, **info}
+                    for artist_id, info in artists.items()
+                ]
+            )
+        except Exception as e:
+            logger.warning("Could not store %d artists: %s", len(artists), e)
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of the cumulative hit and miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def hit_ratio(hits: int, misses: int) -> Optional[float]:
+        total = hits + misses
+        return hits / total if total else None
+
+
+class TrackCache:
+    """
+    Enriched track data cache shared by the single and batch APIs.
+
+    Lookups go to an in-process LRU first, then to an optional
+    persistent store (DatabaseModels) holding the ``track_catalog``
+    table. Entries older than ``refresh_seconds`` are refetched so the
+    volatile ``popularity`` fields stay current.
+
+    Concurrent fetches are coalesced: claim() hands each uncached ID to
+    exactly one caller, and the others wait on its in-flight Future
+    instead of fetching the same track again.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        refresh_seconds: float = DEFAULT_TRACK_REFRESH_SECONDS,
+        max_size: int = 100_000,
+    ):
+        self.store = store
+        self.refresh_seconds = refresh_seconds
+        self._memory = LRUCache(max_size=max_size, ttl_seconds=refresh_seconds)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_many(self, track_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Return fresh cached enriched data for the given IDs."""
+        track_ids = list(track_ids)
+        found = {}
+        remaining = []
+        for track_id in track_ids:
+            data = self._memory.get(track_id)
+            if data is None:
+                remaining.append(track_id)
+            else:
+                found[track_id] = data
+
+        if remaining and self.store is not None:
+            fresh_since = datetime.fromtimestamp(
+                time.time() - self.refresh_seconds, tz=timezone.utc
+            ).replace(tzinfo=None)
+            stored = self.store.get_track_catalog(
+                remaining, fresh_since=fresh_since
+            )
+            for track_id, data in stored.items():
+                fetched_at = data.pop("fetched_at")
+                self._memory.set(
+                    track_id,
+                    data,
+                    fetched_at.replace(tzinfo=timezone.utc).timestamp(),
+                )
+                found[track_id] = data
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(track_ids) - len(found)
+        return found
+
+    def put_many(self, tracks: Dict[str, Dict]):
+        """Cache freshly fetched track data in memory and in the store."""
+        if not tracks:
+            return
+        for track_id, data in tracks.items():
+            self._memory.set(track_id, data)
+        if self.store is None:
+            return
+        try:
+            self.store.save_track_catalog_bulk(list(tracks.values()))
+        except Exception as e:
+            logger.warning("Could not store %d tracks: %s", len(tracks), e)
+
+    def claim(
+        self, track_ids: Iterable[str]
+    ) -> Tuple[List[str], Dict[str, Future]]:
+        """
+        Split IDs into those the caller must fetch and those in flight.
+
+        Returns the IDs claimed by this caller, which must be passed to
+        settle() once fetched, and Futures for IDs another caller is
+        already fetching; each resolves to the track data or None.
+        """
+        owned, waiting = [], {}
+        with self._lock:
+            for track_id in track_ids:
+                future = self._in_flight.get(track_id)
+                data = self._memory.get(track_id) if future is None else None
+                if data is not None:
+                    # Settled since the caller's lookup missed
+                    future = Future()
+                    future.set_result(data)
+                if future is None:
+                    self._in_flight[track_id] = Future()
+                    owned.append(track_id)
+                else:
+                    waiting[track_id] = future
+            self.coalesced += len(waiting)
+        return owned, waiting
+
+    def settle(self, track_ids: Iterable[str], fetched: Dict[str, Dict]):
+        """Hand fetched data to callers waiting on claimed IDs."""
+        with self._lock:
+            futures = [
+                (self._in_flight.pop(track_id), fetched.get(track_id))
+                for track_id in track_ids
+                if track_id in self._in_flight
+            ]
+        for future, data in futures:
+            future.set_result(data)
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of the cumulative hit, miss and coalesced counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
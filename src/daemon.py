@@ -0,0 +1,263 @@
+import argparse
+import logging
+import signal
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from .data_persistence import DataPersistenceLayer
+from .database import DEFAULT_USER_ID, MEMORY_DB
+from .metrics import add_metrics_arguments, metrics_from_args
+from .spotify_client import TEAM_TOKEN_CACHE_DIR
+from .team_sync import DEFAULT_SYNC_WORKERS, TeamSync
+
+logger = logging.getLogger(__name__)
+
+# Poll intervals in seconds: active listeners every minute, idle users
+# backing off to every half hour
+DEFAULT_MIN_POLL_INTERVAL = 60.0
+DEFAULT_MAX_POLL_INTERVAL = 30 * 60.0
+
+# Spotify's /tracks batch limit; enrichment waits for full batches
+ENRICHMENT_BATCH_SIZE = 50
+
+# Longest a track may wait for a full enrichment batch
+DEFAULT_MAX_ENRICHMENT_DELAY = 5 * 60.0
+
+
+class PollSchedule:
+    """
+    Per-user poll intervals that adapt to listening activity.
+
+    A poll that finds new plays resets the user to ``min_interval``;
+    each poll that finds nothing multiplies the interval by ``backoff``
+    up to ``max_interval``. Failed polls keep the current interval.
+    """
+
+    def __init__(
+        self,
+        user_ids: Iterable[str] = (),
+        min_interval: float = DEFAULT_MIN_POLL_INTERVAL,
+        max_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        backoff: float = 2.0,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.intervals = {}
+        self._next_poll_at = {}
+        for user_id in user_ids:
+            self.add(user_id)
+
+    def add(self, user_id: str):
+        """Start polling a user, due immediately."""
+        self.intervals.setdefault(user_id, self.min_interval)
+        self._next_poll_at.setdefault(user_id, float("-inf"))
+
+    def due(self, now: float = None) -> List[str]:
+        """User IDs whose next poll time has passed."""
+        now = time.monotonic() if now is None else now
+        return sorted(
+            user_id
+            for user_id, poll_at in self._next_poll_at.items()
+            if poll_at <= now
+        )
+
+    def record(
+        self, user_id: str, new_plays: Optional[int], now: float = None
+    ):
+        """Schedule a user's next poll from the result of this one."""
+        now = time.monotonic() if now is None else now
+        interval = self.intervals[user_id]
+        if new_plays:
+            interval = self.min_interval
+        elif new_plays is not None:
+            interval = min(self.max_interval, interval * self.backoff)
+        self.intervals[user_id] = interval
+        self._next_poll_at[user_id] = now + interval
+
+    def seconds_until_due(self, now: float = None) -> float:
+        """Seconds until the next user is due, zero if one already is."""
+        if not self._next_poll_at:
+            return self.max_interval
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(self._next_poll_at.values()) - now)
+
+
+class SyncDaemon:
+    """
+    Keep the database in sync by polling users on their own schedule.
+
+    Each cycle fetches only the users that are due. Played tracks needing
+    enrichment are queued across cycles and users and fetched in full
+    50-ID batches, or once the oldest has waited ``max_enrichment_delay``
+    seconds; profiles of users with new plays are refreshed after their
+    tracks are enriched. stop() ends the loop after the current cycle,
+    and queued enrichment is flushed before run() returns. The database
+    file is closed between cycles, so read-only processes such as the
+    Streamlit app can open it.
+    """
+
+    def __init__(
+        self,
+        team_sync: TeamSync,
+        schedule: PollSchedule = None,
+        max_enrichment_delay: float = DEFAULT_MAX_ENRICHMENT_DELAY,
+    ):
+        self.team_sync = team_sync
+        self.persistence = team_sync.persistence
+        self.schedule = schedule or PollSchedule()
+        for user_id in team_sync.clients:
+            self.schedule.add(user_id)
+        self.max_enrichment_delay = max_enrichment_delay
+        self._pending_track_ids = {}
+        self._pending_profiles = set()
+        self._pending_since = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Ask run() to return after the current cycle."""
+        self._stop.set()
+
+    def run_once(self, now: float = None) -> Dict[str, Optional[int]]:
+        """Poll the users that are due and return their new play counts."""
+        now = time.monotonic() if now is None else now
+        due = self.schedule.due(now)
+        new_plays = {}
+        with self.persistence.metrics.span("poll"):
+            if due:
+                new_plays, new_track_ids = self.team_sync.fetch_and_save(due)
+                for user_id, count in new_plays.items():
+                    self.schedule.record(user_id, count, now)
+                self._queue_enrichment(new_track_ids, now)
+                self._pending_profiles.update(
+                    user_id for user_id, count in new_plays.items() if count
+                )
+
+            overdue = False
+            if self._pending_since is not None:
+                waited = now - self._pending_since
+                overdue = waited >= self.max_enrichment_delay
+            self.enrich_pending(flush=overdue)
+        return new_plays
+
+    def run(self):
+        """
+        Sync until stop() is called, then flush pending enrichment.
+
+        A failed cycle is logged and retried after ``min_interval``;
+        users it did not poll stay due, so only stop() ends the loop.
+        """
+        try:
+            while not self._stop.is_set():
+                self._stop.wait(self._run_cycle())
+        finally:
+            self.enrich_pending(flush=True)
+
+    def _run_cycle(self) -> float:
+        """Run one cycle and return the seconds until the next one."""
+        try:
+            new_plays = self.run_once()
+        except Exception:
+            logger.exception(
+                "Sync cycle failed, retrying in %.0fs",
+                self.schedule.min_interval,
+            )
+            self.persistence.metrics.count("daemon.failed_cycles")
+            self._release_database()
+            return self.schedule.min_interval
+
+        if new_plays:
+            synced = sum(count or 0 for count in new_plays.values())
+            logger.info(
+                "Synced %d users, %d new plays", len(new_plays), synced
+            )
+        self._release_database()
+        return self.schedule.seconds_until_due()
+
+    def _release_database(self):
+        """Drop the file lock while idle; the next cycle reconnects."""
+        db = self.persistence.db_models.db
+        if db.db_path != MEMORY_DB:
+            db.close()
+
+    def _queue_enrichment(self, track_ids: List[str], now: float):
+        """Queue the played tracks that have no enriched data yet."""
+        missing = self.persistence.db_models.missing_enrichment(
+            [tid for tid in track_ids if tid not in self._pending_track_ids]
+        )
+        if missing and self._pending_since is None:
+            self._pending_since = now
+        self._pending_track_ids.update(dict.fromkeys(missing))
+
+    def enrich_pending(self, flush: bool = False):
+        """
+        Enrich queued tracks in full batches, or all of them on flush.
+
+        Profiles waiting on enrichment are refreshed once the queue is
+        empty.
+        """
+        pending = list(self._pending_track_ids)
+        if not flush:
+            full = len(pending) - len(pending) % ENRICHMENT_BATCH_SIZE
+            pending = pending[:full]
+        if pending:
+            self.persistence.enrich_missing(pending)
+            for track_id in pending:
+                del self._pending_track_ids[track_id]
+        if not self._pending_track_ids:
+            self._pending_since = None
+            if self._pending_profiles:
+                self.persistence.refresh_profiles(
+                    sorted(self._pending_profiles)
+                )
+                self._pending_profiles.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep the database in sync with the team's plays"
+    )
+    parser.add_argument("--token-cache-dir", default=TEAM_TOKEN_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=DEFAULT_SYNC_WORKERS)
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=DEFAULT_MIN_POLL_INTERVAL,
+        help="seconds between polls of an active user",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=DEFAULT_MAX_POLL_INTERVAL,
+        help="seconds between polls of an idle user",
+    )
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    persistence = DataPersistenceLayer(metrics=metrics_from_args(args))
+    try:
+        team_sync = TeamSync.from_token_cache_dir(
+            persistence, args.token_cache_dir, max_workers=args.workers
+        )
+        if not team_sync.clients:
+            # No team logins: sync the default user's token
+            team_sync.clients = {DEFAULT_USER_ID: persistence.spotify_client}
+        daemon = SyncDaemon(
+            team_sync,
+            PollSchedule(
+                min_interval=args.min_interval,
+                max_interval=args.max_interval,
+            ),
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: daemon.stop())
+        print(f"Syncing {len(team_sync.clients)} users, Ctrl+C to stop")
+        daemon.run()
+    finally:
+        persistence.close()
+
+
+if __name__ == "__main__":
+    main()
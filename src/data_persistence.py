@@ -1,7 +1,29 @@
+import logging
 from typing import Dict, List
 
-from .database import DatabaseModels
-from .spotify_client import SpotifyClient
+import numpy as np
+import pandas as pd
+
+from .cache import ArtistCache, TrackCache
+from .database import DEFAULT_USER_ID, DatabaseConnection, DatabaseModels
+from .database.models import ENRICHED_TRACK_COLUMNS
+from .metrics import Metrics
+from .profiles import ProfileEngine
+from .spotify_client import RECENTLY_PLAYED_PAGE_SIZE, SpotifyClient
+
+logger = logging.getLogger(__name__)
+
+# Concurrent /tracks batches during a full enrichment backfill
+DEFAULT_ENRICHMENT_WORKERS = 4
+
+# Values stored for track fields missing from an API response
+ENRICHED_TRACK_DEFAULTS = {
+    "popularity": 0,
+    "duration_ms": 0,
+    "explicit": False,
+    "release_date": "",
+    "album_type": "",
+}
 
 
 class DataPersistenceLayer:
@@ -9,116 +31,232 @@ class DataPersistenceLayer:
         self,
         spotify_client: SpotifyClient = None,
         db_models: DatabaseModels = None,
+        metrics: Metrics = None,
     ):
-        self.spotify_client = spotify_client or SpotifyClient()
-        self.db_models = db_models or DatabaseModels()
+        # Spans of each pipeline stage; default components report here too
+        self.metrics = metrics or Metrics()
+        # Keep one connection open for the lifetime of the layer instead of
+        # reopening the database file on every query
+        self.db_models = db_models or DatabaseModels(
+            DatabaseConnection.for_writing(),
+            cache_enriched_ids=True,
+            metrics=self.metrics,
+        )
+        self.spotify_client = spotify_client or SpotifyClient(
+            artist_cache=ArtistCache(store=self.db_models),
+            track_cache=TrackCache(store=self.db_models),
+            metrics=self.metrics,
+        )
+        self.profile_engine = ProfileEngine(self.db_models)
 
         # Initialize database on first use
         self.db_models.initialize_database()
 
-    def _process_enriched_data(self, enriched_data: Dict) -> Dict:
-        """Process enriched data from Spotify API format to database format."""
-        # Collect all genres from all artists
-        all_genres = []
-        artist_popularities = []
-        total_followers = 0
-
-        for artist in enriched_data.get("artists", []):
-            all_genres.extend(artist.get("genres", []))
-            if artist.get("popularity", 0) > 0:
-                artist_popularities.append(artist["popularity"])
-            total_followers += artist.get("followers", 0)
-
-        # Calculate averages and aggregates
-        avg_artist_popularity = (
-            sum(artist_popularities) / len(artist_popularities)
-            if artist_popularities
-            else 0
+    def close(self):
+        """Close the database connection held by this layer."""
+        self.db_models.close()
+
+    def _process_enriched_batch(
+        self, enriched_data_list: List[Dict]
+    ) -> pd.DataFrame:
+        """
+        Process a page of API results into an enriched data frame.
+
+        Artists of all tracks are flattened into parallel arrays indexed
+        by track position, so average artist popularity, total followers
+        and unique genres are computed in one pass with NumPy instead of
+        per-track loops.
+        """
+        records = [data for data in enriched_data_list if data]  # Skip None
+        frame = pd.DataFrame.from_records(
+            records, columns=["id", *ENRICHED_TRACK_DEFAULTS]
         )
-        unique_genres = list(set(all_genres))  # Remove duplicates
-
-        return {
-            "popularity": enriched_data.get("popularity", 0),
-            "duration_ms": enriched_data.get("duration_ms", 0),
-            "explicit": enriched_data.get("explicit", False),
-            "release_date": enriched_data.get("release_date", ""),
-            "album_type": enriched_data.get("album_type", ""),
-            "genres": unique_genres,
-            "artist_popularity": avg_artist_popularity,
-            "artist_followers": total_followers,
-        }
+        if frame.empty:
+            return pd.DataFrame(columns=ENRICHED_TRACK_COLUMNS)
+        frame = frame.rename(columns={"id": "track_id"})
+        # Cast each filled column to its default's type explicitly, as
+        # pandas no longer downcasts object columns on fillna
+        for column, default in ENRICHED_TRACK_DEFAULTS.items():
+            values = frame[column]
+            frame[column] = values.where(values.notna(), default).astype(
+                type(default)
+            )
 
-    def sync_recent_tracks_with_enriched_data(
-        self, limit: int = 7
+        # One entry per (track, artist) and per (track, artist genre)
+        artists = [data.get("artists") or [] for data in records]
+        artist_track = np.repeat(
+            np.arange(len(records)), [len(a) for a in artists]
+        )
+        flat_artists = [artist for track in artists for artist in track]
+        popularity = np.array(
+            [a.get("popularity", 0) for a in flat_artists], dtype="float64"
+        )
+        followers = np.array(
+            [a.get("followers", 0) for a in flat_artists], dtype="int64"
+        )
+        artist_genres = [a.get("genres") or [] for a in flat_artists]
+        genre_track = np.repeat(artist_track, [len(g) for g in artist_genres])
+        flat_genres = [genre for genres in artist_genres for genre in genres]
+
+        # Artists with zero popularity are left out of the average
+        popular = popularity > 0
+        popularity_sum = np.bincount(
+            artist_track[popular],
+            weights=popularity[popular],
+            minlength=len(records),
+        )
+        popularity_count = np.bincount(
+            artist_track[popular], minlength=len(records)
+        )
+        frame["artist_popularity"] = np.divide(
+            popularity_sum,
+            popularity_count,
+            out=np.zeros(len(records)),
+            where=popularity_count > 0,
+        )
+        frame["artist_followers"] = np.bincount(
+            artist_track, weights=followers, minlength=len(records)
+        ).astype("int64")
+
+        # Unique genres per track, in first-seen order
+        genres = pd.DataFrame(
+            {"track": genre_track, "genre": flat_genres}
+        ).drop_duplicates()
+        bounds = np.searchsorted(
+            genres["track"].to_numpy(), np.arange(len(records) + 1)
+        ).tolist()
+        genre_names = genres["genre"].tolist()
+        frame["genres"] = [
+            genre_names[start:end] for start, end in zip(bounds, bounds[1:])
+        ]
+        return frame[ENRICHED_TRACK_COLUMNS]
+
+    def _enrich_and_save(
+        self, track_ids: List[str], max_workers: int = None
     ) -> List[Dict]:
         """
-        Fetch recent tracks from Spotify, save them to database,
-        and ensure enriched data is also fetched and saved.
+        Fetch enriched data for tracks, save it, and dead-letter the
+        IDs Spotify failed on.
         """
-        # Get recent tracks from Spotify
-        recent_tracks = self.spotify_client.get_recent_tracks(limit=limit)
-
-        # Save tracks to database
-        for track in recent_tracks:
-            self.db_models.save_track(
-                track_id=track["id"],
-                name=track["name"],
-                artist=track["artist"],
-                album=track["album"],
-                played_at=track["played_at"],
+        with self.metrics.span("fetch"):
+            enriched_data_list = self.spotify_client.get_track_enriched_data(
+                track_ids, max_workers=max_workers
+            )
+        with self.metrics.span("save"):
+            self.db_models.save_enriched_track_data_bulk(
+                self._process_enriched_batch(enriched_data_list)
             )
+            self.db_models.record_enrichment_failures(
+                self.spotify_client.pop_failed_track_ids()
+            )
+        return enriched_data_list
+
+    def fetch_new_plays(
+        self,
+        user_id: str = DEFAULT_USER_ID,
+        spotify_client: SpotifyClient = None,
+    ) -> List[Dict]:
+        """
+        Fetch a user's plays newer than the latest one already stored.
 
-        # Get track IDs that need enriched data
-        track_ids_needing_enrichment = []
-        for track in recent_tracks:
-            if not self.db_models.enriched_track_data_exist(track["id"]):
-                track_ids_needing_enrichment.append(track["id"])
+        Only reads from the database, so it is safe to run for many
+        users concurrently. ``spotify_client`` must be authorized as the
+        user; it defaults to this layer's client.
+        """
+        spotify_client = spotify_client or self.spotify_client
+        with self.metrics.span("fetch"):
+            latest_played_at = self.db_models.get_latest_played_at(user_id)
+            if latest_played_at is None:
+                # First sync: take as much history as Spotify returns
+                tracks = spotify_client.get_recent_tracks(
+                    limit=RECENTLY_PLAYED_PAGE_SIZE
+                )
+            else:
+                tracks = spotify_client.get_tracks_played_after(
+                    latest_played_at
+                )
+        self.metrics.count("sync.plays_fetched", len(tracks))
+        return tracks
 
-        # Fetch and save enriched data for tracks that need them
-        if track_ids_needing_enrichment:
-            enriched_data_list = self.spotify_client.get_track_enriched_data(
-                track_ids_needing_enrichment
+    def save_plays(
+        self, tracks: List[Dict], user_id: str = DEFAULT_USER_ID
+    ) -> int:
+        """Save fetched plays for a user to the database."""
+        with self.metrics.span("save"):
+            return self.db_models.save_tracks_bulk(tracks, user_id=user_id)
+
+    def enrich_missing(self, track_ids: List[str], max_workers: int = None):
+        """Fetch and save enriched data for tracks that don't have it."""
+        with self.metrics.span("enrich"):
+            # Get track IDs that need enriched data
+            track_ids_needing_enrichment = self.db_models.missing_enrichment(
+                track_ids
             )
 
-            for enriched_data in enriched_data_list:
-                if enriched_data:  # Skip None results
-                    processed_data = self._process_enriched_data(enriched_data)
-                    self.db_models.save_enriched_track_data(
-                        enriched_data["id"], processed_data
-                    )
+            # Fetch and save enriched data for tracks that need them
+            if track_ids_needing_enrichment:
+                self._enrich_and_save(
+                    track_ids_needing_enrichment, max_workers=max_workers
+                )
+
+    def refresh_profiles(self, user_ids: List[str] = None) -> Dict[str, Dict]:
+        """Fold newly saved plays into the users' listening profiles."""
+        with self.metrics.span("profiles"):
+            return self.profile_engine.refresh(user_ids)
+
+    def sync_recent_tracks_with_enriched_data(
+        self,
+        limit: int = 7,
+        user_id: str = DEFAULT_USER_ID,
+        spotify_client: SpotifyClient = None,
+    ) -> List[Dict]:
+        """
+        Fetch new plays from Spotify, save them to database,
+        and ensure enriched data is also fetched and saved.
+
+        Only plays after the latest one already stored are requested, so
+        a sync for an idle user makes one API call and no writes.
+        """
+        with self.metrics.span("sync"):
+            recent_tracks = self.fetch_new_plays(user_id, spotify_client)
+            self.save_plays(recent_tracks, user_id)
+            self.enrich_missing([track["id"] for track in recent_tracks])
+            self.refresh_profiles([user_id])
 
         # Return tracks with their enriched data from database
-        return self.db_models.get_recent_tracks(limit=limit)
+        return self.db_models.get_recent_tracks(limit=limit, user_id=user_id)
 
-    def ensure_enriched_data_for_all_tracks(self):
+    def ensure_enriched_data_for_all_tracks(
+        self, max_workers: int = DEFAULT_ENRICHMENT_WORKERS
+    ):
         """
         Find all tracks in database that don't have enriched data
-        and fetch them from Spotify.
-        """
-        track_ids_without_enrichment = (
-            self.db_models.get_tracks_without_enriched_data()
-        )
+        and fetch them from Spotify, ``max_workers`` batches at a time.
 
-        if track_ids_without_enrichment:
-            print(
-                f"Fetching enriched data for "
-                f"{len(track_ids_without_enrichment)} tracks..."
-            )
-            enriched_data_list = self.spotify_client.get_track_enriched_data(
-                track_ids_without_enrichment
-            )
+        Track IDs are paged out of the database lazily and every batch is
+        committed as soon as it arrives, so memory stays bounded and an
+        interrupted run resumes where it stopped.
+        """
+        pending = self.db_models.count_tracks_without_enriched_data()
+        if not pending:
+            return
 
-            for enriched_data in enriched_data_list:
-                if enriched_data:  # Skip None results
-                    processed_data = self._process_enriched_data(enriched_data)
-                    self.db_models.save_enriched_track_data(
-                        enriched_data["id"], processed_data
+        logger.info("Fetching enriched data for %d tracks...", pending)
+        saved = 0
+        with self.metrics.span("backfill"):
+            for enriched_batch in self.spotify_client.iter_track_enriched_data(
+                self.db_models.iter_tracks_without_enriched_data(),
+                max_workers=max_workers,
+            ):
+                with self.metrics.span("save"):
+                    saved += self.db_models.save_enriched_track_data_bulk(
+                        self._process_enriched_batch(enriched_batch)
+                    )
+                    self.db_models.record_enrichment_failures(
+                        self.spotify_client.pop_failed_track_ids()
                     )
 
-            print(
-                f"Successfully saved enriched data for "
-                f"{len(enriched_data_list)} tracks"
-            )
+        logger.info("Successfully saved enriched data for %d tracks", saved)
 
     def get_tracks_with_enriched_data(self, limit: int = 7) -> List[Dict]:
         """Get recent tracks with enriched data from database."""
@@ -1,4 +1,10 @@
-from .connection import DatabaseConnection
-from .models import DatabaseModels
+from .connection import MEMORY_DB, DatabaseConnection
+from .models import DEAD_LETTER_THRESHOLD, DEFAULT_USER_ID, DatabaseModels
 
-__all__ = ["DatabaseConnection", "DatabaseModels"]
+__all__ = [
+    "DEAD_LETTER_THRESHOLD",
+    "DEFAULT_USER_ID",
+    "MEMORY_DB",
+    "DatabaseConnection",
+    "DatabaseModels",
+]
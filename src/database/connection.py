@@ -1,36 +1,186 @@
+import threading
+import time
 from pathlib import Path
 
 import duckdb
 
+# Database path that keeps everything in memory, e.g. for tests
+MEMORY_DB = ":memory:"
+
+# Seconds the long-running readers and writers wait for another
+# process to release a conflicting lock on the database file
+DEFAULT_LOCK_TIMEOUT = 5.0
+
 
 class DatabaseConnection:
-    def __init__(self, db_path: str = None):
+    """
+    Open DuckDB databases as a file, read-only, or purely in memory.
+
+    File databases may be tuned with DuckDB's ``threads`` and
+    ``memory_limit`` settings. Read-only connections take DuckDB's
+    shared lock, so dashboard processes can read a file the sync
+    writer is not holding open; ``lock_timeout`` seconds are spent
+    waiting for a conflicting lock to be released before giving up.
+    """
+
+    def __init__(
+        self,
+        db_path: str = None,
+        persistent: bool = False,
+        read_only: bool = False,
+        threads: int = None,
+        memory_limit: str = None,
+        lock_timeout: float = 0.0,
+    ):
         if db_path is None:
             # Default to project root
             project_root = Path(__file__).parent.parent.parent
             db_path = project_root / "data" / "team_tracks.duckdb"
 
-        # Ensure data directory exists
-        db_path = Path(db_path)
-        db_path.parent.mkdir(parents=True, exist_ok=True)
+        if str(db_path) == MEMORY_DB:
+            if read_only:
+                raise ValueError("An in-memory database cannot be read-only")
+            # The data lives only as long as the connection
+            persistent = True
+        else:
+            db_path = Path(db_path)
+            if not read_only:
+                # Ensure data directory exists
+                db_path.parent.mkdir(parents=True, exist_ok=True)
 
         self.db_path = str(db_path)
+        self.persistent = persistent
+        self.read_only = read_only
+        self.lock_timeout = lock_timeout
+        self.config = {}
+        if threads is not None:
+            self.config["threads"] = threads
+        if memory_limit is not None:
+            self.config["memory_limit"] = memory_limit
         self.connection = None
 
+        # Per-thread cursors handed out in persistent mode
+        self._local = threading.local()
+        self._cursors = []
+        self._lock = threading.Lock()
+        # Per-thread stack of connections opened by ``with`` otherwise
+        self._opened = threading.local()
+
+    @classmethod
+    def in_memory(cls, **kwargs) -> "DatabaseConnection":
+        """A private in-memory database; nothing touches the disk."""
+        return cls(MEMORY_DB, **kwargs)
+
+    @classmethod
+    def for_writing(
+        cls,
+        db_path: str = None,
+        lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
+        **kwargs,
+    ) -> "DatabaseConnection":
+        """
+        A persistent read-write connection, e.g. for the sync CLIs.
+
+        Opening waits up to ``lock_timeout`` seconds for readers in
+        other processes to release the file, so a writer reconnecting
+        after close() does not fail while a dashboard query runs.
+        """
+        return cls(
+            db_path, persistent=True, lock_timeout=lock_timeout, **kwargs
+        )
+
+    @classmethod
+    def for_reading(
+        cls,
+        db_path: str = None,
+        lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
+        **kwargs,
+    ) -> "DatabaseConnection":
+        """
+        A read-only connection opened per operation, e.g. for dashboards.
+
+        The shared lock is only held while a query runs, so a writer
+        connecting per operation can get in between reads. Each
+        operation opens its own connection, so any number of threads
+        may read through one instance.
+        """
+        return cls(
+            db_path,
+            persistent=False,
+            read_only=True,
+            lock_timeout=lock_timeout,
+            **kwargs,
+        )
+
     def connect(self):
         """Establish connection to DuckDB database."""
-        if self.connection is None:
-            self.connection = duckdb.connect(self.db_path)
-        return self.connection
+        with self._lock:
+            if self.connection is None:
+                self.connection = self._open()
+            return self.connection
+
+    def _open(self):
+        """Open the database, waiting out locks held by other processes."""
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                return duckdb.connect(
+                    self.db_path, read_only=self.read_only, config=self.config
+                )
+            except duckdb.IOException as e:
+                if "lock" not in str(e) or time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+
+    def cursor(self):
+        """
+        Return the calling thread's cursor on the shared connection.
+
+        DuckDB connections must not be shared between threads, so each
+        thread gets its own cursor, created once and reused until close().
+        """
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.connect().cursor()
+            self._local.cursor = cursor
+            with self._lock:
+                self._close_orphaned_cursors()
+                self._cursors.append((threading.current_thread(), cursor))
+        return cursor
+
+    def _close_orphaned_cursors(self):
+        """Close cursors whose threads have exited (e.g. web requests)."""
+        alive = []
+        for thread, cursor in self._cursors:
+            if thread.is_alive():
+                alive.append((thread, cursor))
+            else:
+                cursor.close()
+        self._cursors = alive
 
     def close(self):
-        """Close database connection."""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """Close all cursors and the database connection."""
+        with self._lock:
+            for _, cursor in self._cursors:
+                cursor.close()
+            self._cursors = []
+            self._local = threading.local()
+
+            if self.connection:
+                self.connection.close()
+                self.connection = None
 
     def __enter__(self):
-        return self.connect()
+        if self.persistent:
+            return self.cursor()
+        # A private connection per block, so threads never share one
+        connection = self._open()
+        if not hasattr(self._opened, "stack"):
+            self._opened.stack = []
+        self._opened.stack.append(connection)
+        return connection
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+        # Persistent connections live until close() is called explicitly
+        if not self.persistent:
+            self._opened.stack.pop().close()
@@ -1,17 +1,437 @@
+import functools
 import json
-from typing import Dict, List
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
 
+import pandas as pd
+
+from ..metrics import Metrics
 from .connection import DatabaseConnection
 
+# Plays saved without an explicit user belong to this user
+DEFAULT_USER_ID = "default"
+
+# Tracks that failed enrichment this many times are no longer retried
+DEAD_LETTER_THRESHOLD = 3
+
+# Minutes a poster may hold a pending Teams digest before another
+# poster treats it as abandoned (e.g. by a crashed run) and reclaims it
+CLAIM_LEASE_MINUTES = 15
+
+TRACK_COLUMNS = ["id", "name", "artist", "album", "played_at", "user_id"]
+ENRICHED_TRACK_COLUMNS = [
+    "track_id",
+    "popularity",
+    "duration_ms",
+    "explicit",
+    "release_date",
+    "album_type",
+    "genres",
+    "artist_popularity",
+    "artist_followers",
+]
+ARTIST_COLUMNS = ["id", "name", "genres", "popularity", "followers"]
+
+Rows = Union[List[Dict], pd.DataFrame]
+
+# View over hot plays plus any attached Parquet archive, used by reads
+PLAYS_VIEW = "all_plays"
+PLAY_COLUMNS = "track_id, played_at, user_id, created_at"
+
+# Rows returned by read methods: dicts, a DataFrame or a pyarrow.Table
+Results = Union[List[Dict], pd.DataFrame, object]
+
+# Formats read methods can return their rows in
+RESULT_FORMATS = ("dicts", "pandas", "arrow")
+
+# Time buckets kept in the rollup tables, as DuckDB date_trunc parts,
+# finest first since coarser buckets are summed from the finest
+ROLLUP_GRANULARITIES = ("hour", "day")
+
+# Periods rollup reads can group by -> the rollup granularity summed
+ROLLUP_PERIODS = {"hour": "hour", "day": "day", "week": "day", "month": "day"}
+ROLLUP_TABLES = ("play_rollups", "artist_rollups", "genre_rollups")
+
+
+def _to_frame(rows: Rows, columns: List[str]) -> pd.DataFrame:
+    """Normalize a list of dicts, DataFrame or Arrow table to a DataFrame."""
+    if hasattr(rows, "to_pandas"):  # pyarrow.Table / RecordBatch
+        rows = rows.to_pandas()
+    if isinstance(rows, pd.DataFrame):
+        return rows.reindex(columns=columns)
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def _fetch(result, output: str = "dicts"):
+    """
+    Fetch a query result as dicts, a pandas DataFrame or an Arrow table.
+
+    The DataFrame and Arrow formats are built column by column by DuckDB
+    instead of allocating a dict per row; Arrow requires pyarrow.
+    """
+    if output == "dicts":
+        columns = [desc[0] for desc in result.description]
+        return [dict(zip(columns, row)) for row in result.fetchall()]
+    if output == "pandas":
+        return result.fetch_df()
+    if output == "arrow":
+        return _to_arrow_table(result)
+    raise ValueError(
+        f"Unknown output {output!r}, expected one of {RESULT_FORMATS}"
+    )
+
+
+def _to_arrow_table(result):
+    """Fetch a result as an Arrow table on any supported DuckDB."""
+    # DuckDB 1.4.0 only has the since-deprecated fetch_arrow_table()
+    if hasattr(result, "to_arrow_table"):
+        return result.to_arrow_table()
+    return result.fetch_arrow_table()
+
+
+def _to_arrow_reader(result, batch_size: int):
+    """Stream a result as an Arrow RecordBatchReader on any DuckDB."""
+    if hasattr(result, "to_arrow_reader"):
+        return result.to_arrow_reader(batch_size)
+    return result.fetch_record_batch(batch_size)
+
+
+def _sql_path(path: Path) -> str:
+    """Quote a filesystem path as a SQL string literal."""
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def _archived_plays(directory: Path) -> str:
+    """SQL reading the plays archived under ``directory`` from Parquet."""
+    plays_files = directory / "plays" / "**" / "*.parquet"
+    return f"""
+        read_parquet(
+            {_sql_path(plays_files.resolve())},
+            hive_partitioning = true,
+            hive_types_autocast = false
+        )
+    """
+
+
+def _export_parquet(conn, directory: Path, before: datetime = None) -> int:
+    """
+    Write plays before ``before`` and track data as Parquet files.
+
+    Plays are appended to the archive, skipping any it already holds,
+    so exporting the same plays twice does not store them twice.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    new_plays = f"""
+        SELECT {PLAY_COLUMNS}, strftime(played_at, '%Y-%m') AS month
+        FROM plays
+        WHERE ($before IS NULL OR played_at < $before)
+    """
+    if any((directory / "plays").rglob("*.parquet")):
+        new_plays += f"""
+            AND (track_id, played_at, user_id) NOT IN (
+                SELECT (track_id, played_at, user_id)
+                FROM {_archived_plays(directory)}
+            )
+        """
+    params = {"before": before}
+    count = conn.execute(
+        f"SELECT count(*) FROM ({new_plays})", params
+    ).fetchone()[0]
+    if count:
+        conn.execute(
+            f"""
+            COPY ({new_plays} ORDER BY played_at)
+            TO {_sql_path(directory / "plays")}
+            (FORMAT PARQUET, PARTITION_BY (user_id, month), APPEND)
+        """,
+            params,
+        )
+    for table in ("tracks", "enriched_track_data"):
+        conn.execute(
+            f"COPY {table} TO {_sql_path(directory / f'{table}.parquet')}"
+            " (FORMAT PARQUET)"
+        )
+    return count
+
+
+def _genres_to_json(genres) -> str:
+    """Serialize a genre list the same way save_enriched_track_data does."""
+    if genres is None or isinstance(genres, float):  # missing / NaN
+        return json.dumps(None)
+    return json.dumps(list(genres))
+
+
+def _sync_track_genres(conn, track_ids_query: str):
+    """
+    Rebuild the genre bridge rows for the tracks selected by a query.
+
+    New genre names are added to the genres dictionary first, then each
+    track's track_genres rows are replaced from its stored genre list.
+    """
+    affected = f"""
+        SELECT track_id, unnest(CAST(genres AS VARCHAR[])) AS genre
+        FROM enriched_track_data
+        WHERE track_id IN ({track_ids_query})
+    """
+    conn.execute(
+        f"""
+        INSERT INTO genres (name)
+        SELECT DISTINCT genre
+        FROM ({affected})
+        WHERE genre IS NOT NULL
+          AND genre NOT IN (SELECT name FROM genres)
+        ORDER BY genre
+    """
+    )
+    conn.execute(
+        f"DELETE FROM track_genres WHERE track_id IN ({track_ids_query})"
+    )
+    conn.execute(
+        f"""
+        INSERT INTO track_genres (track_id, genre_id)
+        SELECT DISTINCT a.track_id, g.id
+        FROM ({affected}) a
+        JOIN genres g ON a.genre = g.name
+    """
+    )
+
+
+def _upsert_rollup(
+    conn, table: str, keys: List[str], counts: List[str], query: str, params
+):
+    """
+    Add one query's counts to a rollup table at every granularity.
+
+    ``query`` yields ``bucket``, the ``keys`` and the ``counts`` at the
+    finest granularity; coarser buckets are summed from its rows, so
+    the plays are only scanned and joined once.
+    """
+    finest, *coarser = ROLLUP_GRANULARITIES
+    key_columns = ", ".join(["user_id", *keys])
+    count_columns = ", ".join(counts)
+    sums = ", ".join(f"sum({column})" for column in counts)
+    coarser_rows = "".join(
+        f"""
+        UNION ALL
+        SELECT '{granularity}', date_trunc('{granularity}', bucket),
+               {key_columns}, {sums}
+        FROM finest
+        GROUP BY ALL
+        """
+        for granularity in coarser
+    )
+    updates = ", ".join(
+        f"{column} = {column} + excluded.{column}" for column in counts
+    )
+    conn.execute(
+        f"""
+        INSERT INTO {table}
+        (granularity, bucket, {key_columns}, {count_columns})
+        WITH finest AS ({query})
+        SELECT '{finest}', bucket, {key_columns}, {count_columns}
+        FROM finest
+        {coarser_rows}
+        ON CONFLICT (granularity, bucket, {key_columns})
+        DO UPDATE SET {updates}
+    """,
+        params,
+    )
+
+
+def _roll_up_plays(
+    conn,
+    plays: str,
+    params=None,
+    enriched_only: bool = False,
+    subtract: bool = False,
+):
+    """
+    Add plays to the hourly and daily rollup tables.
+
+    ``plays`` names a table, view or subquery of (track_id, played_at,
+    user_id) rows, with ``params`` bound to any placeholders it has.
+    Play and artist counts are added for every play, and popularity,
+    duration and genre counts for plays of enriched tracks. With
+    ``enriched_only`` the plays were rolled up before their track was
+    enriched, so only the enrichment-based counts are added. With
+    ``subtract`` the counts are taken out again instead.
+    """
+    bucket = f"date_trunc('{ROLLUP_GRANULARITIES[0]}', p.played_at)"
+    sign = "-" if subtract else ""
+    _upsert_rollup(
+        conn,
+        "play_rollups",
+        [],
+        ["plays", "enriched_plays", "popularity_sum", "duration_ms_sum"],
+        f"""
+        SELECT {bucket} AS bucket, p.user_id,
+               {"0" if enriched_only else f"{sign}count(*)"} AS plays,
+               {sign}count(et.track_id) AS enriched_plays,
+               {sign}coalesce(sum(et.popularity), 0) AS popularity_sum,
+               {sign}coalesce(sum(et.duration_ms), 0) AS duration_ms_sum
+        FROM {plays} p
+        {"" if enriched_only else "LEFT "}JOIN enriched_track_data et
+            ON p.track_id = et.track_id
+        GROUP BY ALL
+        """,
+        params,
+    )
+    if not enriched_only:
+        _upsert_rollup(
+            conn,
+            "artist_rollups",
+            ["artist"],
+            ["plays"],
+            f"""
+            SELECT {bucket} AS bucket, p.user_id, t.artist,
+                   {sign}count(*) AS plays
+            FROM {plays} p
+            JOIN tracks t ON p.track_id = t.id
+            WHERE t.artist IS NOT NULL
+            GROUP BY ALL
+            """,
+            params,
+        )
+    _upsert_rollup(
+        conn,
+        "genre_rollups",
+        ["genre_id"],
+        ["plays"],
+        f"""
+        SELECT {bucket} AS bucket, p.user_id, tg.genre_id,
+               {sign}count(*) AS plays
+        FROM {plays} p
+        JOIN track_genres tg ON p.track_id = tg.track_id
+        GROUP BY ALL
+        """,
+        params,
+    )
+
+
+def _roll_up_inserted(conn, inserted):
+    """Roll up plays returned by an INSERT INTO plays ... RETURNING."""
+    if not len(inserted):
+        return
+    conn.register("inserted_plays", inserted)
+    try:
+        _roll_up_plays(conn, "inserted_plays")
+    finally:
+        conn.unregister("inserted_plays")
+
+
+def _roll_up_enriched(conn, track_ids, subtract: bool = False):
+    """
+    Add the enrichment-based rollup counts of the given tracks' plays.
+
+    With ``subtract`` they are taken out instead, so a track's counts
+    can be moved from its old enriched data to its new one.
+    """
+    if not len(track_ids):
+        return
+    conn.register("enriched_tracks", track_ids)
+    try:
+        _roll_up_plays(
+            conn,
+            f"""(
+                SELECT p.track_id, p.played_at, p.user_id
+                FROM {PLAYS_VIEW} p
+                SEMI JOIN enriched_tracks n ON p.track_id = n.track_id
+            )""",
+            enriched_only=True,
+            subtract=subtract,
+        )
+    finally:
+        conn.unregister("enriched_tracks")
+
+
+def _rollup_granularity(*bounds: Optional[datetime]) -> str:
+    """The coarsest rollup granularity that can honour these bounds."""
+    midnight = datetime.min.time()
+    if all(bound is None or bound.time() == midnight for bound in bounds):
+        return "day"
+    return "hour"
+
+
+@contextmanager
+def _transaction(conn):
+    """Run the enclosed statements in a single DuckDB transaction."""
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _instrumented(table: str = None):
+    """
+    Time a DatabaseModels method as ``db.statement_seconds``.
+
+    With ``table``, the row count the method returns is also counted as
+    ``db.rows_written`` to that table.
+    """
+
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(
+                "db.statement_seconds", operation=method.__name__
+            ):
+                result = method(self, *args, **kwargs)
+            if table:
+                self.metrics.count("db.rows_written", result, table=table)
+            return result
+
+        return wrapper
+
+    return decorate
+
 
 class DatabaseModels:
-    def __init__(self, db_connection: DatabaseConnection = None):
+    def __init__(
+        self,
+        db_connection: DatabaseConnection = None,
+        cache_enriched_ids: bool = False,
+        metrics: Metrics = None,
+    ):
         self.db = db_connection or DatabaseConnection()
+        self.metrics = metrics or Metrics()
+
+        # Optional in-memory set of track IDs known to have enriched data,
+        # kept warm across sync cycles so repeat lookups skip the database.
+        # Enriched rows are never deleted, so entries never go stale.
+        self._known_enriched_ids = set() if cache_enriched_ids else None
+
+        # Writes upsert shared rollup rows, so concurrent write
+        # transactions would conflict at COMMIT; they run one at a time
+        self._write_lock = threading.Lock()
+
+    def close(self):
+        """Release the underlying database connection."""
+        self.db.close()
+
+    @contextmanager
+    def _transaction(self, conn):
+        """A write transaction, waiting for other threads' to finish."""
+        with self._write_lock, _transaction(conn):
+            yield conn
 
     def initialize_database(self):
-        """Create all necessary tables."""
+        """
+        Create all necessary tables.
+
+        Read-only connections are left as they are; the writer creates
+        the schema.
+        """
+        if self.db.read_only:
+            return
         with self.db as conn:
-            # Create tracks table
+            # Create tracks table (one row per track, played_at is the
+            # latest play; the full history lives in plays)
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS tracks (
@@ -25,6 +445,46 @@ class DatabaseModels:
             """
             )
 
+            plays_exists = conn.execute(
+                "SELECT 1 FROM duckdb_tables() WHERE table_name = 'plays'"
+            ).fetchone()
+
+            # Create append-only plays table. Rows are inserted in played_at
+            # order, so DuckDB's per-row-group min/max statistics let the
+            # "latest N plays" top-N skip old row groups as history grows.
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS plays (
+                    track_id TEXT NOT NULL,
+                    played_at TIMESTAMP NOT NULL,
+                    user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (track_id, played_at, user_id)
+                )
+            """
+            )
+
+            # Seed plays from databases created before the plays table
+            if not plays_exists:
+                conn.execute(
+                    """
+                    INSERT INTO plays (track_id, played_at)
+                    SELECT id, played_at
+                    FROM tracks
+                    WHERE played_at IS NOT NULL
+                    ORDER BY played_at
+                """
+                )
+
+            # Plays read through this view, which also covers archived
+            # Parquet plays once attach_parquet_archive() is called
+            conn.execute(
+                f"""
+                CREATE VIEW IF NOT EXISTS {PLAYS_VIEW} AS
+                SELECT {PLAY_COLUMNS} FROM plays
+            """
+            )
+
             # Create enriched_track_data table (replaces audio_features)
             conn.execute(
                 """
@@ -39,10 +499,61 @@ class DatabaseModels:
                     artist_popularity REAL, -- Average artist popularity
                     artist_followers INTEGER, -- Total artist followers
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    -- Set on every save, including re-enrichment
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (track_id) REFERENCES tracks(id)
                 )
             """
             )
+            # Tables created before updated_at start from created_at
+            has_updated_at = conn.execute(
+                """
+                SELECT 1 FROM duckdb_columns()
+                WHERE table_name = 'enriched_track_data'
+                  AND column_name = 'updated_at'
+            """
+            ).fetchone()
+            if not has_updated_at:
+                conn.execute(
+                    """
+                    ALTER TABLE enriched_track_data
+                    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                """
+                )
+                conn.execute(
+                    "UPDATE enriched_track_data SET updated_at = created_at"
+                )
+
+            # Create genre dictionary and track -> genre bridge table, so
+            # genre queries join on integer IDs instead of parsing JSON
+            conn.execute("CREATE SEQUENCE IF NOT EXISTS genre_id_seq")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS genres (
+                    id INTEGER PRIMARY KEY DEFAULT nextval('genre_id_seq'),
+                    name TEXT NOT NULL UNIQUE
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS track_genres (
+                    track_id TEXT NOT NULL,
+                    genre_id INTEGER NOT NULL,
+                    PRIMARY KEY (track_id, genre_id)
+                )
+            """
+            )
+
+            # Seed the bridge from databases that predate it
+            has_genres = conn.execute(
+                "SELECT 1 FROM track_genres LIMIT 1"
+            ).fetchone()
+            if not has_genres:
+                with self._transaction(conn):
+                    _sync_track_genres(
+                        conn, "SELECT track_id FROM enriched_track_data"
+                    )
 
             # Create user_profiles table
             conn.execute(
@@ -57,63 +568,1017 @@ class DatabaseModels:
             """
             )
 
-    def save_track(
-        self, track_id: str, name: str, artist: str, album: str, played_at: str
-    ):
-        """Save a track to the database."""
-        with self.db as conn:
+            # Create enrichment_failures table (dead-letter list of track
+            # IDs Spotify repeatedly failed to return enriched data for)
             conn.execute(
                 """
-                INSERT OR REPLACE INTO tracks
-                (id, name, artist, album, played_at)
-                VALUES (?, ?, ?, ?, ?)
-            """,
-                [track_id, name, artist, album, played_at],
+                CREATE TABLE IF NOT EXISTS enrichment_failures (
+                    track_id TEXT PRIMARY KEY,
+                    failures INTEGER,
+                    last_error TEXT,
+                    last_failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+
+            # Create artists table (cached Spotify artist metadata)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS artists (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    genres JSON,
+                    popularity INTEGER,
+                    followers BIGINT,
+                    fetched_at TIMESTAMP -- UTC
+                )
+            """
+            )
+
+            # Create track_catalog table (cached enriched Spotify track
+            # data, refetched once popularity is due a refresh)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS track_catalog (
+                    id TEXT PRIMARY KEY,
+                    data JSON,
+                    fetched_at TIMESTAMP -- UTC
+                )
+            """
+            )
+
+            # Create posted_messages table (ledger of digests sent to
+            # Teams). Rows are claimed as 'pending' before sending, so
+            # concurrent posters never send the same digest twice.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS posted_messages (
+                    message_key TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    window_start TIMESTAMP NOT NULL,
+                    track_count INTEGER,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    claimed_at TIMESTAMP, -- UTC
+                    posted_at TIMESTAMP -- UTC
+                )
+            """
+            )
+            conn.execute(
+                """
+                ALTER TABLE posted_messages
+                ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP
+            """
+            )
+
+            # Create rollup tables: play, artist and genre counts per user
+            # and hour or day (UTC), kept up to date as plays and enriched
+            # data are saved, so dashboards never scan the play history.
+            # Popularity, duration and genres are counted once a play's
+            # track is enriched, as of its first enrichment.
+            rollups_exist = conn.execute(
+                "SELECT 1 FROM duckdb_tables() "
+                "WHERE table_name = 'play_rollups'"
+            ).fetchone()
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS play_rollups (
+                    granularity TEXT NOT NULL, -- 'hour' or 'day'
+                    bucket TIMESTAMP NOT NULL,
+                    user_id TEXT NOT NULL,
+                    plays BIGINT NOT NULL,
+                    enriched_plays BIGINT NOT NULL,
+                    popularity_sum BIGINT NOT NULL,
+                    duration_ms_sum BIGINT NOT NULL,
+                    PRIMARY KEY (granularity, bucket, user_id)
+                )
+            """
             )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS artist_rollups (
+                    granularity TEXT NOT NULL,
+                    bucket TIMESTAMP NOT NULL,
+                    user_id TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    plays BIGINT NOT NULL,
+                    PRIMARY KEY (granularity, bucket, user_id, artist)
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS genre_rollups (
+                    granularity TEXT NOT NULL,
+                    bucket TIMESTAMP NOT NULL,
+                    user_id TEXT NOT NULL,
+                    genre_id INTEGER NOT NULL,
+                    plays BIGINT NOT NULL,
+                    PRIMARY KEY (granularity, bucket, user_id, genre_id)
+                )
+            """
+            )
+
+            # Seed the rollups from databases that predate them
+            if not rollups_exist:
+                with self._transaction(conn):
+                    _roll_up_plays(conn, "plays")
+
+    def save_track(
+        self,
+        track_id: str,
+        name: str,
+        artist: str,
+        album: str,
+        played_at: str,
+        user_id: str = DEFAULT_USER_ID,
+    ):
+        """Save a track and record the play in the database."""
+        with self.db as conn:
+            with self._transaction(conn):
+                conn.execute(
+                    """
+                    INSERT INTO tracks (id, name, artist, album, played_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        name = excluded.name,
+                        artist = excluded.artist,
+                        album = excluded.album,
+                        played_at = greatest(played_at, excluded.played_at)
+                """,
+                    [track_id, name, artist, album, played_at],
+                )
+                inserted = conn.execute(
+                    """
+                    INSERT INTO plays (track_id, played_at, user_id)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT DO NOTHING
+                    RETURNING track_id, played_at, user_id
+                """,
+                    [track_id, played_at, user_id],
+                ).fetchone()
+                if inserted:
+                    # A new play is rolled up from its own values
+                    _roll_up_plays(
+                        conn,
+                        """(
+                            SELECT ? AS track_id,
+                                   CAST(? AS TIMESTAMP) AS played_at,
+                                   ? AS user_id
+                        )""",
+                        inserted,
+                    )
 
     def save_enriched_track_data(self, track_id: str, data: Dict):
         """Save enriched track data."""
+        self.save_enriched_track_data_bulk([{**data, "track_id": track_id}])
+
+    @_instrumented(table="plays")
+    def save_tracks_bulk(
+        self, tracks: Rows, user_id: str = DEFAULT_USER_ID
+    ) -> int:
+        """
+        Save many tracks and their plays in one transaction.
+
+        Accepts a list of dicts shaped like SpotifyClient.get_recent_tracks
+        output, or a DataFrame/Arrow table with the same columns. Rows
+        without a ``user_id`` are attributed to ``user_id``. Plays already
+        stored are skipped. Returns the number of plays added.
+        """
+        frame = _to_frame(tracks, TRACK_COLUMNS)
+        if frame.empty:
+            return 0
+        frame["user_id"] = (
+            frame["user_id"].astype(object).where(frame["user_id"].notna())
+        ).fillna(user_id)
+
         with self.db as conn:
-            conn.execute(
+            conn.register("incoming_tracks", frame)
+            try:
+                with self._transaction(conn):
+                    conn.execute(
+                        """
+                        INSERT INTO tracks
+                        (id, name, artist, album, played_at)
+                        SELECT id, name, artist, album,
+                               CAST(played_at AS TIMESTAMP)
+                        FROM incoming_tracks
+                        WHERE id IS NOT NULL
+                        QUALIFY row_number() OVER (
+                            PARTITION BY id
+                            ORDER BY CAST(played_at AS TIMESTAMP) DESC
+                        ) = 1
+                        ON CONFLICT (id) DO UPDATE SET
+                            name = excluded.name,
+                            artist = excluded.artist,
+                            album = excluded.album,
+                            played_at = greatest(
+                                played_at, excluded.played_at
+                            )
+                    """
+                    )
+                    # Only the plays actually inserted are rolled up
+                    inserted = conn.execute(
+                        """
+                        INSERT INTO plays (track_id, played_at, user_id)
+                        SELECT DISTINCT
+                            id, CAST(played_at AS TIMESTAMP), user_id
+                        FROM incoming_tracks
+                        WHERE id IS NOT NULL AND played_at IS NOT NULL
+                        ORDER BY 2
+                        ON CONFLICT DO NOTHING
+                        RETURNING track_id, played_at, user_id
+                    """
+                    )
+                    inserted = _to_arrow_table(inserted)
+                    _roll_up_inserted(conn, inserted)
+            finally:
+                conn.unregister("incoming_tracks")
+        return inserted.num_rows
+
+    @_instrumented(table="enriched_track_data")
+    def save_enriched_track_data_bulk(self, rows: Rows) -> int:
+        """
+        Save enriched data for many tracks in one transaction.
+
+        Each row holds a ``track_id`` plus the fields accepted by
+        save_enriched_track_data; a DataFrame/Arrow table with those
+        columns is accepted as well. Rows without a ``track_id`` and
+        repeats of an ID are skipped. Returns the number of tracks saved.
+        """
+        frame = _to_frame(rows, ENRICHED_TRACK_COLUMNS)
+        if frame.empty:
+            return 0
+        frame["genres"] = frame["genres"].map(_genres_to_json)
+
+        with self.db as conn:
+            conn.register("incoming_enriched_track_data", frame)
+            try:
+                with self._transaction(conn):
+                    # Plays of re-enriched tracks lose the counts of
+                    # their old enriched data and genres, and every
+                    # saved track's plays get its new counts below
+                    track_ids = _to_arrow_table(
+                        conn.execute(
+                            """
+                            SELECT DISTINCT track_id
+                            FROM incoming_enriched_track_data
+                            WHERE track_id IS NOT NULL
+                        """
+                        )
+                    )
+                    re_enriched = _to_arrow_table(
+                        conn.execute(
+                            """
+                            SELECT DISTINCT track_id
+                            FROM incoming_enriched_track_data i
+                            SEMI JOIN enriched_track_data et
+                                ON et.track_id = i.track_id
+                        """
+                        )
+                    )
+                    _roll_up_enriched(conn, re_enriched, subtract=True)
+                    written = conn.execute(
+                        """
+                        INSERT OR REPLACE INTO enriched_track_data (
+                            track_id, popularity, duration_ms,
+                            explicit, release_date, album_type,
+                            genres, artist_popularity, artist_followers,
+                            updated_at
+                        )
+                        SELECT track_id, popularity, duration_ms,
+                               explicit, release_date, album_type,
+                               genres, artist_popularity, artist_followers,
+                               CURRENT_TIMESTAMP
+                        FROM incoming_enriched_track_data
+                        WHERE track_id IS NOT NULL
+                        QUALIFY row_number() OVER (
+                            PARTITION BY track_id
+                        ) = 1
+                        RETURNING track_id
+                    """
+                    ).fetchall()
+                    _sync_track_genres(
+                        conn,
+                        "SELECT track_id FROM incoming_enriched_track_data",
+                    )
+                    _roll_up_enriched(conn, track_ids)
+                    if len(re_enriched):
+                        # Drop genres that re-enriched tracks no longer have
+                        conn.execute(
+                            "DELETE FROM genre_rollups WHERE plays = 0"
+                        )
+            finally:
+                conn.unregister("incoming_enriched_track_data")
+        self._remember_enriched(frame["track_id"].dropna())
+        return len(written)
+
+    @_instrumented(table="artists")
+    def save_artists_bulk(self, artists: Rows) -> int:
+        """Save fetched artist metadata, stamping it as fetched now."""
+        frame = _to_frame(artists, ARTIST_COLUMNS)
+        if frame.empty:
+            return 0
+        frame["genres"] = frame["genres"].map(_genres_to_json)
+        frame["fetched_at"] = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        with self.db as conn:
+            conn.register("incoming_artists", frame)
+            try:
+                with self._transaction(conn):
+                    written = conn.execute(
+                        """
+                        INSERT OR REPLACE INTO artists
+                        (id, name, genres, popularity, followers, fetched_at)
+                        SELECT id, name, genres, popularity, followers,
+                               fetched_at
+                        FROM incoming_artists
+                        WHERE id IS NOT NULL
+                        QUALIFY row_number() OVER (PARTITION BY id) = 1
+                        RETURNING id
+                    """
+                    ).fetchall()
+            finally:
+                conn.unregister("incoming_artists")
+        return len(written)
+
+    @_instrumented()
+    def get_artists(
+        self, artist_ids: List[str], fresh_since: datetime = None
+    ) -> Dict[str, Dict]:
+        """
+        Get cached artist metadata by ID.
+
+        When ``fresh_since`` (naive UTC) is given, artists fetched before
+        it are treated as stale and left out.
+        """
+        if not artist_ids:
+            return {}
+
+        with self.db as conn:
+            result = conn.execute(
                 """
-                INSERT OR REPLACE INTO enriched_track_data (
-                    track_id, popularity, duration_ms,
-                    explicit, release_date, album_type,
-                    genres, artist_popularity, artist_followers
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                SELECT id, name, genres, popularity, followers, fetched_at
+                FROM artists
+                WHERE id IN (SELECT unnest($ids::VARCHAR[]))
+                  AND ($fresh_since IS NULL OR fetched_at >= $fresh_since)
             """,
-                [
-                    track_id,
-                    data.get("popularity"),
-                    data.get("duration_ms"),
-                    data.get("explicit"),
-                    data.get("release_date"),
-                    data.get("album_type"),
-                    json.dumps(data.get("genres")),  # Store genres as JSON
-                    data.get("artist_popularity"),
-                    data.get("artist_followers"),
-                ],
+                {"ids": list(artist_ids), "fresh_since": fresh_since},
             )
+            return {
+                row[0]: {
+                    "name": row[1],
+                    "genres": json.loads(row[2]) if row[2] else [],
+                    "popularity": row[3],
+                    "followers": row[4],
+                    "fetched_at": row[5],
+                }
+                for row in result.fetchall()
+            }
+
+    @_instrumented(table="track_catalog")
+    def save_track_catalog_bulk(self, tracks: List[Dict]) -> int:
+        """Save fetched enriched track data, stamping it as fetched now."""
+        frame = pd.DataFrame(
+            {
+                "id": [track.get("id") for track in tracks],
+                "data": [json.dumps(track) for track in tracks],
+            }
+        )
+        if frame.empty:
+            return 0
+        frame["fetched_at"] = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        with self.db as conn:
+            conn.register("incoming_track_catalog", frame)
+            try:
+                with self._transaction(conn):
+                    written = conn.execute(
+                        """
+                        INSERT OR REPLACE INTO track_catalog
+                        (id, data, fetched_at)
+                        SELECT id, data, fetched_at
+                        FROM incoming_track_catalog
+                        WHERE id IS NOT NULL
+                        QUALIFY row_number() OVER (PARTITION BY id) = 1
+                        RETURNING id
+                    """
+                    ).fetchall()
+            finally:
+                conn.unregister("incoming_track_catalog")
+        return len(written)
+
+    @_instrumented()
+    def get_track_catalog(
+        self, track_ids: List[str], fresh_since: datetime = None
+    ) -> Dict[str, Dict]:
+        """
+        Get cached enriched track data by ID, with its ``fetched_at``.
+
+        When ``fresh_since`` (naive UTC) is given, tracks fetched before
+        it are treated as stale and left out.
+        """
+        if not track_ids:
+            return {}
 
-    def get_recent_tracks(self, limit: int = 7) -> List[Dict]:
-        """Get the most recent tracks with their enriched data."""
         with self.db as conn:
             result = conn.execute(
                 """
-                SELECT t.id, t.name, t.artist, t.album, t.played_at,
+                SELECT id, data, fetched_at
+                FROM track_catalog
+                WHERE id IN (SELECT unnest($ids::VARCHAR[]))
+                  AND ($fresh_since IS NULL OR fetched_at >= $fresh_since)
+            """,
+                {"ids": list(track_ids), "fresh_since": fresh_since},
+            )
+            return {
+                row[0]: {**json.loads(row[1]), "fetched_at": row[2]}
+                for row in result.fetchall()
+            }
+
+    @_instrumented()
+    def get_recent_tracks(
+        self, limit: int = 7, user_id: str = None, output: str = "dicts"
+    ) -> Results:
+        """
+        Get the most recent plays with their track and enriched data.
+
+        The top-N runs on plays alone before joining, so only ``limit``
+        rows are ever joined against the dimension tables. ``output``
+        selects dicts, a pandas DataFrame or an Arrow table.
+        """
+        with self.db as conn:
+            result = conn.execute(
+                f"""
+                WITH recent_plays AS (
+                    SELECT track_id, played_at, user_id
+                    FROM {PLAYS_VIEW}
+                    WHERE $user_id IS NULL OR user_id = $user_id
+                    ORDER BY played_at DESC
+                    LIMIT $limit
+                )
+                SELECT t.id, t.name, t.artist, t.album, p.played_at,
                        et.popularity, et.duration_ms, et.explicit,
                        et.release_date, et.album_type, et.genres,
-                       et.artist_popularity, et.artist_followers
-                FROM tracks t
+                       et.artist_popularity, et.artist_followers,
+                       p.user_id
+                FROM recent_plays p
+                JOIN tracks t ON p.track_id = t.id
                 LEFT JOIN enriched_track_data et ON t.id = et.track_id
-                ORDER BY t.played_at DESC
-                LIMIT ?
+                ORDER BY p.played_at DESC
+            """,
+                {"user_id": user_id, "limit": limit},
+            )
+
+            return _fetch(result, output)
+
+    @_instrumented()
+    def get_latest_played_at(
+        self, user_id: str = DEFAULT_USER_ID
+    ) -> Optional[datetime]:
+        """Get the high-water mark of stored plays for a user."""
+        with self.db as conn:
+            result = conn.execute(
+                f"SELECT max(played_at) FROM {PLAYS_VIEW} WHERE user_id = ?",
+                [user_id],
+            )
+            return result.fetchone()[0]
+
+    def genre_counts(
+        self,
+        since: datetime = None,
+        user_id: str = None,
+        limit: int = None,
+        output: str = "dicts",
+    ) -> Results:
+        """
+        Count plays per genre, most played first.
+
+        Optionally restricted to plays at or after ``since`` and to one
+        user. A play counts once for each genre of its track. ``output``
+        is one of RESULT_FORMATS.
+        """
+        with self.db as conn:
+            result = conn.execute(
+                f"""
+                SELECT g.name AS genre, count(*) AS plays
+                FROM {PLAYS_VIEW} p
+                JOIN track_genres tg ON p.track_id = tg.track_id
+                JOIN genres g ON tg.genre_id = g.id
+                WHERE ($since IS NULL OR p.played_at >= $since)
+                  AND ($user_id IS NULL OR p.user_id = $user_id)
+                GROUP BY g.name
+                ORDER BY plays DESC, genre
+                LIMIT $limit
             """,
-                [limit],
+                {"since": since, "user_id": user_id, "limit": limit},
             )
+            return _fetch(result, output)
 
-            columns = [desc[0] for desc in result.description]
-            return [dict(zip(columns, row)) for row in result.fetchall()]
+    def tracks_by_genre(self, genre: str, output: str = "dicts") -> Results:
+        """Get the tracks tagged with a genre, most popular first."""
+        with self.db as conn:
+            result = conn.execute(
+                """
+                SELECT t.id, t.name, t.artist, t.album, t.played_at,
+                       et.popularity
+                FROM genres g
+                JOIN track_genres tg ON g.id = tg.genre_id
+                JOIN tracks t ON tg.track_id = t.id
+                LEFT JOIN enriched_track_data et ON t.id = et.track_id
+                WHERE g.name = ?
+                ORDER BY et.popularity DESC NULLS LAST, t.id
+            """,
+                [genre],
+            )
+            return _fetch(result, output)
+
+    @_instrumented()
+    def get_play_rollups(
+        self,
+        period: str = "day",
+        since: datetime = None,
+        until: datetime = None,
+        user_id: str = None,
+        output: str = "dicts",
+    ) -> Results:
+        """
+        Get plays per ``period`` and user from the rollup tables.
+
+        ``period`` is one of ROLLUP_PERIODS; weeks (starting Monday) and
+        months are summed from the daily rollups. Rollup buckets before
+        ``since`` or at or after ``until`` (naive UTC) are left out.
+        Rows hold the bucket start, play and enriched play counts and
+        the popularity and duration sums, oldest bucket first.
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(
+                f"Unknown period {period!r}, expected one of "
+                f"{tuple(ROLLUP_PERIODS)}"
+            )
+        with self.db as conn:
+            result = conn.execute(
+                f"""
+                SELECT date_trunc('{period}', bucket) AS bucket, user_id,
+                       sum(plays)::BIGINT AS plays,
+                       sum(enriched_plays)::BIGINT AS enriched_plays,
+                       sum(popularity_sum)::BIGINT AS popularity_sum,
+                       sum(duration_ms_sum)::BIGINT AS duration_ms_sum
+                FROM play_rollups
+                WHERE granularity = $granularity
+                  AND ($since IS NULL OR bucket >= $since)
+                  AND ($until IS NULL OR bucket < $until)
+                  AND ($user_id IS NULL OR user_id = $user_id)
+                GROUP BY ALL
+                ORDER BY bucket, user_id
+            """,
+                {
+                    "granularity": ROLLUP_PERIODS[period],
+                    "since": since,
+                    "until": until,
+                    "user_id": user_id,
+                },
+            )
+            return _fetch(result, output)
+
+    @_instrumented()
+    def get_top_artists(
+        self,
+        since: datetime = None,
+        until: datetime = None,
+        user_id: str = None,
+        limit: int = 10,
+        output: str = "dicts",
+    ) -> Results:
+        """Get the most played artists between two times, from rollups."""
+        return self._top_from_rollups(
+            "SELECT artist, plays, bucket, granularity, user_id"
+            " FROM artist_rollups",
+            since,
+            until,
+            user_id,
+            limit,
+            output,
+        )
+
+    @_instrumented()
+    def get_top_genres(
+        self,
+        since: datetime = None,
+        until: datetime = None,
+        user_id: str = None,
+        limit: int = 10,
+        output: str = "dicts",
+    ) -> Results:
+        """Get the most played genres between two times, from rollups."""
+        return self._top_from_rollups(
+            """
+            SELECT g.name AS genre, r.plays, r.bucket, r.granularity,
+                   r.user_id
+            FROM genre_rollups r
+            JOIN genres g ON r.genre_id = g.id
+            """,
+            since,
+            until,
+            user_id,
+            limit,
+            output,
+        )
+
+    def _top_from_rollups(
+        self,
+        rollups: str,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        user_id: Optional[str],
+        limit: Optional[int],
+        output: str,
+    ) -> Results:
+        """
+        Sum a rollup query's plays per key, most played first.
+
+        Daily rollups are read unless a bound falls inside a day, in
+        which case the hourly ones are.
+        """
+        with self.db as conn:
+            result = conn.execute(
+                f"""
+                WITH rollups AS ({rollups})
+                SELECT * EXCLUDE (bucket, granularity, user_id, plays),
+                       sum(plays)::BIGINT AS plays
+                FROM rollups
+                WHERE granularity = $granularity
+                  AND ($since IS NULL OR bucket >= $since)
+                  AND ($until IS NULL OR bucket < $until)
+                  AND ($user_id IS NULL OR user_id = $user_id)
+                GROUP BY ALL
+                ORDER BY plays DESC, 1
+                LIMIT $limit
+            """,
+                {
+                    "granularity": _rollup_granularity(since, until),
+                    "since": since,
+                    "until": until,
+                    "user_id": user_id,
+                    "limit": limit,
+                },
+            )
+            return _fetch(result, output)
+
+    def rebuild_rollups(self):
+        """
+        Recompute the rollup tables from every play in all_plays.
+
+        Only needed when plays were added outside this class, e.g. after
+        attaching a Parquet archive exported from another database.
+        Plays archived out of this database stay counted only if their
+        archive is attached, and popularity is taken from the current
+        enriched data.
+        """
+        with self.db as conn:
+            with self._transaction(conn):
+                for table in ROLLUP_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+                _roll_up_plays(conn, PLAYS_VIEW)
+
+    def export_parquet(self, directory: str, before: datetime = None) -> int:
+        """
+        Export plays and track data to Parquet under ``directory``.
+
+        Plays before ``before`` (all plays by default) are appended to
+        ``plays/``, Hive-partitioned by user_id and month; plays already
+        there are skipped. Tracks and enriched data are written as
+        snapshot files next to them. Returns the number of plays added.
+        """
+        with self.db as conn:
+            with self._transaction(conn):
+                return _export_parquet(conn, Path(directory), before)
+
+    def archive_plays(self, directory: str, before: datetime) -> int:
+        """
+        Move plays older than ``before`` out of the database to Parquet.
+
+        The plays are exported as by export_parquet() and deleted in the
+        same transaction, then served from the archive through all_plays
+        so reads keep seeing the full history. Returns the plays moved.
+        """
+        with self.db as conn:
+            with self._transaction(conn):
+                _export_parquet(conn, Path(directory), before)
+                [archived] = conn.execute(
+                    "DELETE FROM plays WHERE played_at < ?", [before]
+                ).fetchone()
+        if archived:
+            self.attach_parquet_archive(directory)
+        return archived
+
+    def attach_parquet_archive(self, directory: str):
+        """
+        Serve plays stored under ``directory`` through the all_plays view.
+
+        Plays are read in place from Parquet, with filters on user_id and
+        month pruning partitions. Tracks and enriched data found in the
+        directory are loaded if missing, since reads join against them.
+        """
+        directory = Path(directory)
+        with self.db as conn:
+            with self._transaction(conn):
+                tracks_file = directory / "tracks.parquet"
+                if tracks_file.exists():
+                    conn.execute(
+                        f"""
+                        INSERT INTO tracks
+                        SELECT * FROM read_parquet({_sql_path(tracks_file)})
+                        ON CONFLICT DO NOTHING
+                    """
+                    )
+                enriched_file = directory / "enriched_track_data.parquet"
+                if enriched_file.exists():
+                    conn.execute(
+                        f"""
+                        CREATE OR REPLACE TEMP TABLE
+                            imported_enriched_track_data AS
+                        SELECT *
+                        FROM read_parquet({_sql_path(enriched_file)})
+                        WHERE track_id NOT IN (
+                            SELECT track_id FROM enriched_track_data
+                        )
+                    """
+                    )
+                    conn.execute(
+                        """
+                        INSERT INTO enriched_track_data BY NAME
+                        SELECT * FROM imported_enriched_track_data
+                    """
+                    )
+                    _sync_track_genres(
+                        conn,
+                        "SELECT track_id FROM imported_enriched_track_data",
+                    )
+                    conn.execute("DROP TABLE imported_enriched_track_data")
+
+                conn.execute(
+                    f"""
+                    CREATE OR REPLACE VIEW {PLAYS_VIEW} AS
+                    SELECT {PLAY_COLUMNS} FROM plays
+                    UNION ALL
+                    SELECT {PLAY_COLUMNS} FROM {_archived_plays(directory)}
+                """
+                )
+
+    def detach_parquet_archive(self):
+        """Serve all_plays from the plays table alone again."""
+        with self.db as conn:
+            conn.execute(
+                f"""
+                CREATE OR REPLACE VIEW {PLAYS_VIEW} AS
+                SELECT {PLAY_COLUMNS} FROM plays
+            """
+            )
+
+    def fetch_record_batches(
+        self,
+        query: str,
+        parameters=None,
+        batch_size: int = 100_000,
+        output: str = "arrow",
+    ) -> Iterator:
+        """
+        Stream the rows of a query in batches, e.g. for exports.
+
+        Yields Arrow record batches of up to ``batch_size`` rows, or with
+        ``output="pandas"`` DataFrames rounded up to DuckDB's 2048-row
+        vectors. The query runs on its own cursor, so other reads may
+        run while the batches are consumed.
+        """
+        if output not in ("arrow", "pandas"):
+            raise ValueError(
+                f"Unknown output {output!r}, expected 'arrow' or 'pandas'"
+            )
+
+        with self.db as conn:
+            cursor = conn.cursor()
+            try:
+                result = cursor.execute(query, parameters)
+                if output == "arrow":
+                    yield from _to_arrow_reader(result, batch_size)
+                    return
+
+                vectors_per_chunk = max(1, -(-batch_size // 2048))
+                while True:
+                    chunk = result.fetch_df_chunk(vectors_per_chunk)
+                    if chunk.empty:
+                        break
+                    yield chunk
+            finally:
+                cursor.close()
+
+    @_instrumented()
+    def get_user_profiles(self, user_ids: List[str] = None) -> Dict[str, Dict]:
+        """Get stored user profiles keyed by user ID."""
+        with self.db as conn:
+            result = conn.execute(
+                """
+                SELECT user_id, profile_data, based_on_tracks,
+                       calculated_at, track_count
+                FROM user_profiles
+                WHERE $user_ids IS NULL
+                   OR user_id IN (SELECT unnest($user_ids::VARCHAR[]))
+            """,
+                {"user_ids": user_ids},
+            )
+            return {
+                row[0]: {
+                    "profile_data": json.loads(row[1]) if row[1] else {},
+                    "based_on_tracks": json.loads(row[2]) if row[2] else [],
+                    "calculated_at": row[3],
+                    "track_count": row[4],
+                }
+                for row in result.fetchall()
+            }
+
+    @_instrumented()
+    def save_user_profiles(self, profiles: List[Dict]):
+        """Insert or replace user profiles in one transaction."""
+        if not profiles:
+            return
+        with self.db as conn:
+            with self._transaction(conn):
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO user_profiles (
+                        user_id, profile_data, based_on_tracks,
+                        calculated_at, track_count
+                    ) VALUES (?, ?, ?, ?, ?)
+                """,
+                    [
+                        [
+                            profile["user_id"],
+                            json.dumps(profile["profile_data"]),
+                            json.dumps(profile["based_on_tracks"]),
+                            profile["calculated_at"],
+                            profile["track_count"],
+                        ]
+                        for profile in profiles
+                    ],
+                )
+
+    @_instrumented()
+    def aggregate_new_plays(
+        self,
+        calculated_at: Dict[str, datetime],
+        user_ids: List[str] = None,
+        recent_track_count: int = 7,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Aggregate listening statistics over plays not yet profiled.
+
+        For users present in ``calculated_at`` only plays ingested after
+        that time are included; other users are aggregated over their
+        whole history. Returns DataFrames of per-user ``totals``, play
+        counts per ``genres`` and ``release_years``, and each user's most
+        ``recent_tracks``.
+        """
+        cutoffs = pd.DataFrame(
+            {
+                "user_id": list(calculated_at),
+                "since": pd.Series(
+                    list(calculated_at.values()), dtype="datetime64[us]"
+                ),
+            },
+            columns=["user_id", "since"],
+        )
+        new_plays = f"""
+            WITH new_plays AS (
+                SELECT p.*
+                FROM {PLAYS_VIEW} p
+                LEFT JOIN profile_cutoffs c ON p.user_id = c.user_id
+                WHERE (c.since IS NULL OR p.created_at > c.since)
+                  AND ($user_ids IS NULL
+                       OR p.user_id IN (SELECT unnest($user_ids::VARCHAR[])))
+            )
+        """
+        queries = {
+            "totals": """
+                SELECT np.user_id,
+                       count(*) AS play_count,
+                       sum(et.popularity) AS popularity_sum,
+                       count(et.popularity) AS popularity_count,
+                       sum(et.duration_ms) AS duration_ms_sum,
+                       count(et.duration_ms) AS duration_ms_count,
+                       count_if(et.explicit) AS explicit_count,
+                       count(et.explicit) AS explicit_total,
+                       max(np.created_at) AS last_created_at
+                FROM new_plays np
+                LEFT JOIN enriched_track_data et ON np.track_id = et.track_id
+                GROUP BY np.user_id
+            """,
+            "genres": """
+                SELECT np.user_id, g.name AS genre, count(*) AS plays
+                FROM new_plays np
+                JOIN track_genres tg ON np.track_id = tg.track_id
+                JOIN genres g ON tg.genre_id = g.id
+                GROUP BY np.user_id, g.name
+            """,
+            "release_years": """
+                SELECT np.user_id,
+                       TRY_CAST(left(et.release_date, 4) AS INTEGER)
+                           AS release_year,
+                       count(*) AS plays
+                FROM new_plays np
+                JOIN enriched_track_data et ON np.track_id = et.track_id
+                WHERE release_year IS NOT NULL
+                GROUP BY np.user_id, release_year
+            """,
+            "recent_tracks": """
+                SELECT user_id, track_id, played_at
+                FROM new_plays
+                QUALIFY row_number() OVER (
+                    PARTITION BY user_id ORDER BY played_at DESC
+                ) <= $recent_track_count
+            """,
+        }
+
+        with self.db as conn:
+            conn.register("profile_cutoffs", cutoffs)
+            try:
+                frames = {}
+                for name, query in queries.items():
+                    params = {"user_ids": user_ids}
+                    if name == "recent_tracks":
+                        params["recent_track_count"] = recent_track_count
+                    frames[name] = conn.execute(new_plays + query, params).df()
+            finally:
+                conn.unregister("profile_cutoffs")
+        return frames
+
+    def load_track_features(
+        self, since: datetime = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Load the enriched columns used as track features.
+
+        Only tracks enriched or re-enriched after ``since`` are included
+        when it is given. Returns DataFrames of per-track numeric
+        ``tracks`` columns and the track -> genre_id pairs of those
+        tracks as ``genres``.
+        """
+        queries = {
+            "tracks": """
+                SELECT track_id, popularity, duration_ms, explicit,
+                       TRY_CAST(left(release_date, 4) AS INTEGER)
+                           AS release_year,
+                       artist_popularity, artist_followers, updated_at
+                FROM enriched_track_data
+                WHERE $since IS NULL OR updated_at > $since
+            """,
+            "genres": """
+                SELECT tg.track_id, tg.genre_id
+                FROM track_genres tg
+                JOIN enriched_track_data et ON tg.track_id = et.track_id
+                WHERE $since IS NULL OR et.updated_at > $since
+            """,
+        }
+        with self.db as conn:
+            return {
+                name: conn.execute(query, {"since": since}).df()
+                for name, query in queries.items()
+            }
+
+    def count_plays_per_track(
+        self, user_ids: List[str] = None, output: str = "pandas"
+    ) -> Results:
+        """
+        Count each user's plays per track, with the latest ingest time.
+
+        Optionally restricted to ``user_ids``. ``output`` is one of
+        RESULT_FORMATS.
+        """
+        with self.db as conn:
+            result = conn.execute(
+                f"""
+                SELECT user_id, track_id, count(*) AS plays,
+                       max(created_at) AS last_created_at
+                FROM {PLAYS_VIEW}
+                WHERE $user_ids IS NULL
+                   OR user_id IN (SELECT unnest($user_ids::VARCHAR[]))
+                GROUP BY user_id, track_id
+                ORDER BY user_id
+            """,
+                {"user_ids": user_ids},
+            )
+            return _fetch(result, output)
+
+    def get_latest_ingested_at(self) -> Dict[str, datetime]:
+        """Get the ingest time of each user's most recently saved play."""
+        with self.db as conn:
+            result = conn.execute(
+                f"""
+                SELECT user_id, max(created_at)
+                FROM {PLAYS_VIEW}
+                GROUP BY user_id
+            """
+            )
+            return dict(result.fetchall())
 
     def track_exists(self, track_id: str) -> bool:
         """Check if a track exists in the database."""
@@ -125,22 +1590,334 @@ class DatabaseModels:
 
     def enriched_track_data_exist(self, track_id: str) -> bool:
         """Check if enriched track data exists for a track."""
+        if self._known_enriched_ids and track_id in self._known_enriched_ids:
+            return True
+
         with self.db as conn:
             result = conn.execute(
                 "SELECT 1 FROM enriched_track_data WHERE track_id = ?",
                 [track_id],
             )
-            return result.fetchone() is not None
+            exists = result.fetchone() is not None
+        if exists:
+            self._remember_enriched([track_id])
+        return exists
+
+    @_instrumented()
+    def missing_enrichment(self, track_ids: List[str]) -> List[str]:
+        """
+        Return the track IDs from a batch that have no enriched data yet.
+
+        Answers the whole batch with a single anti-join, skipping IDs the
+        known-enriched cache already vouches for. Order follows the input,
+        with None values and duplicates removed.
+        """
+        candidates = list(dict.fromkeys(tid for tid in track_ids if tid))
+        if self._known_enriched_ids is not None:
+            candidates = [
+                tid
+                for tid in candidates
+                if tid not in self._known_enriched_ids
+            ]
+        if not candidates:
+            return []
 
-    def get_tracks_without_enriched_data(self) -> List[str]:
-        """Get track IDs that don't have enriched data yet."""
+        with self.db as conn:
+            result = conn.execute(
+                """
+                SELECT ids.track_id
+                FROM unnest(?::VARCHAR[]) AS ids(track_id)
+                ANTI JOIN enriched_track_data et
+                    ON ids.track_id = et.track_id
+            """,
+                [candidates],
+            )
+            missing = {row[0] for row in result.fetchall()}
+
+        self._remember_enriched(
+            tid for tid in candidates if tid not in missing
+        )
+        return [tid for tid in candidates if tid in missing]
+
+    def _remember_enriched(self, track_ids):
+        """Add track IDs to the known-enriched cache when it is enabled."""
+        if self._known_enriched_ids is not None:
+            self._known_enriched_ids.update(track_ids)
+
+    def get_tracks_without_enriched_data(
+        self, max_failures: Optional[int] = DEAD_LETTER_THRESHOLD
+    ) -> List[str]:
+        """
+        Get track IDs that don't have enriched data yet.
+
+        IDs that already failed ``max_failures`` times are dead-lettered
+        and left out; pass None to include them.
+        """
         with self.db as conn:
             result = conn.execute(
                 """
                 SELECT t.id
                 FROM tracks t
                 LEFT JOIN enriched_track_data et ON t.id = et.track_id
+                LEFT JOIN enrichment_failures f ON t.id = f.track_id
                 WHERE et.track_id IS NULL
-            """
+                  AND ($max_failures IS NULL
+                       OR coalesce(f.failures, 0) < $max_failures)
+            """,
+                {"max_failures": max_failures},
+            )
+            return [row[0] for row in result.fetchall()]
+
+    def iter_tracks_without_enriched_data(
+        self,
+        page_size: int = 1000,
+        max_failures: Optional[int] = DEAD_LETTER_THRESHOLD,
+    ) -> Iterator[str]:
+        """
+        Lazily yield track IDs without enriched data, a page at a time.
+
+        Pages are keyed on track ID rather than offset, so rows enriched
+        while iterating do not shift later pages.
+        """
+        last_id = ""
+        while True:
+            with self.db as conn:
+                result = conn.execute(
+                    """
+                    SELECT t.id
+                    FROM tracks t
+                    LEFT JOIN enriched_track_data et ON t.id = et.track_id
+                    LEFT JOIN enrichment_failures f ON t.id = f.track_id
+                    WHERE et.track_id IS NULL
+                      AND t.id > $last_id
+                      AND ($max_failures IS NULL
+                           OR coalesce(f.failures, 0) < $max_failures)
+                    ORDER BY t.id
+                    LIMIT $page_size
+                """,
+                    {
+                        "last_id": last_id,
+                        "max_failures": max_failures,
+                        "page_size": page_size,
+                    },
+                )
+                page = [row[0] for row in result.fetchall()]
+            yield from page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]
+
+    @_instrumented()
+    def count_tracks_without_enriched_data(
+        self, max_failures: Optional[int] = DEAD_LETTER_THRESHOLD
+    ) -> int:
+        """Count tracks get_tracks_without_enriched_data would return."""
+        with self.db as conn:
+            result = conn.execute(
+                """
+                SELECT count(*)
+                FROM tracks t
+                LEFT JOIN enriched_track_data et ON t.id = et.track_id
+                LEFT JOIN enrichment_failures f ON t.id = f.track_id
+                WHERE et.track_id IS NULL
+                  AND ($max_failures IS NULL
+                       OR coalesce(f.failures, 0) < $max_failures)
+            """,
+                {"max_failures": max_failures},
+            )
+            return result.fetchone()[0]
+
+    @_instrumented()
+    def record_enrichment_failures(self, failures: Dict[str, str]):
+        """Count a failed enrichment attempt for each track ID -> error."""
+        if not failures:
+            return
+        with self.db as conn:
+            conn.executemany(
+                """
+                INSERT INTO enrichment_failures
+                (track_id, failures, last_error, last_failed_at)
+                VALUES (?, 1, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (track_id) DO UPDATE SET
+                    failures = failures + 1,
+                    last_error = excluded.last_error,
+                    last_failed_at = excluded.last_failed_at
+            """,
+                [[track_id, error] for track_id, error in failures.items()],
+            )
+
+    def get_dead_letter_track_ids(
+        self, max_failures: int = DEAD_LETTER_THRESHOLD
+    ) -> List[str]:
+        """Get track IDs given up on after ``max_failures`` failures."""
+        with self.db as conn:
+            result = conn.execute(
+                """
+                SELECT track_id
+                FROM enrichment_failures
+                WHERE failures >= ?
+                ORDER BY track_id
+            """,
+                [max_failures],
             )
             return [row[0] for row in result.fetchall()]
+
+    def get_unposted_digests(
+        self,
+        window_minutes: int = 60,
+        since: datetime = None,
+        until: datetime = None,
+        lease_minutes: int = CLAIM_LEASE_MINUTES,
+    ) -> List[Dict]:
+        """
+        Group plays into per-user digests of ``window_minutes`` windows.
+
+        Only windows starting at or after ``since`` and ending by
+        ``until`` (naive UTC) are returned, and windows already in the
+        posted_messages ledger are left out, unless their pending claim
+        is older than ``lease_minutes``. Each digest has a
+        ``message_key`` identifying it in the ledger and its ``tracks``
+        in play order.
+        """
+        with self.db as conn:
+            result = conn.execute(
+                f"""
+                WITH windowed AS (
+                    SELECT p.user_id, p.played_at, t.name, t.artist, t.album,
+                           time_bucket(
+                               to_minutes($window_minutes::BIGINT),
+                               p.played_at
+                           ) AS window_start
+                    FROM {PLAYS_VIEW} p
+                    JOIN tracks t ON p.track_id = t.id
+                    WHERE $since IS NULL OR p.played_at >= $since
+                ),
+                digests AS (
+                    SELECT user_id || '/' || $window_minutes::VARCHAR || '/'
+                           || strftime(window_start, '%Y-%m-%dT%H:%M')
+                               AS message_key,
+                           user_id,
+                           window_start,
+                           window_start + to_minutes($window_minutes::BIGINT)
+                               AS window_end,
+                           count(*) AS track_count,
+                           list(
+                               struct_pack(
+                                   name := name,
+                                   artist := artist,
+                                   album := album,
+                                   played_at := played_at
+                               )
+                               ORDER BY played_at
+                           ) AS tracks
+                    FROM windowed
+                    WHERE $since IS NULL OR window_start >= $since
+                    GROUP BY user_id, window_start
+                )
+                SELECT *
+                FROM digests d
+                WHERE ($until IS NULL OR d.window_end <= $until)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM posted_messages pm
+                      WHERE pm.message_key = d.message_key
+                        AND (pm.status = 'posted'
+                             OR pm.claimed_at >= now() AT TIME ZONE 'UTC'
+                                 - to_minutes($lease_minutes::BIGINT))
+                  )
+                ORDER BY window_start, user_id
+            """,
+                {
+                    "window_minutes": window_minutes,
+                    "since": since,
+                    "until": until,
+                    "lease_minutes": lease_minutes,
+                },
+            )
+            return _fetch(result)
+
+    def get_latest_posted_window(self) -> Optional[datetime]:
+        """Start of the latest window posted to Teams, if any."""
+        with self.db as conn:
+            [latest] = conn.execute(
+                """
+                SELECT max(window_start)
+                FROM posted_messages
+                WHERE status = 'posted'
+            """
+            ).fetchone()
+        return latest
+
+    def claim_messages(
+        self, digests: List[Dict], lease_minutes: int = CLAIM_LEASE_MINUTES
+    ) -> List[str]:
+        """
+        Record digests as pending in the posted_messages ledger.
+
+        Returns the message keys this call claimed; keys already in the
+        ledger, e.g. claimed by another poster, are not returned. Pending
+        claims older than ``lease_minutes`` are taken over.
+        """
+        if not digests:
+            return []
+        frame = pd.DataFrame.from_records(
+            digests,
+            columns=["message_key", "user_id", "window_start", "track_count"],
+        )
+        with self.db as conn:
+            conn.register("incoming_messages", frame)
+            try:
+                result = conn.execute(
+                    """
+                    INSERT INTO posted_messages (
+                        message_key,
+                        user_id,
+                        window_start,
+                        track_count,
+                        claimed_at
+                    )
+                    SELECT message_key, user_id, window_start, track_count,
+                           now() AT TIME ZONE 'UTC'
+                    FROM incoming_messages
+                    ON CONFLICT (message_key) DO UPDATE SET
+                        track_count = excluded.track_count,
+                        claimed_at = excluded.claimed_at
+                    WHERE posted_messages.status = 'pending'
+                      AND coalesce(posted_messages.claimed_at, '-infinity')
+                          < now() AT TIME ZONE 'UTC'
+                              - to_minutes($lease_minutes::BIGINT)
+                    RETURNING message_key
+                """,
+                    {"lease_minutes": lease_minutes},
+                )
+                return [row[0] for row in result.fetchall()]
+            finally:
+                conn.unregister("incoming_messages")
+
+    def mark_messages_posted(self, message_keys: List[str]):
+        """Mark claimed messages as delivered."""
+        if not message_keys:
+            return
+        with self.db as conn:
+            conn.execute(
+                """
+                UPDATE posted_messages
+                SET status = 'posted',
+                    posted_at = now() AT TIME ZONE 'UTC'
+                WHERE message_key IN (SELECT unnest(?::VARCHAR[]))
+            """,
+                [list(message_keys)],
+            )
+
+    def release_messages(self, message_keys: List[str]):
+        """Drop pending claims whose delivery failed so they are retried."""
+        if not message_keys:
+            return
+        with self.db as conn:
+            conn.execute(
+                """
+                DELETE FROM posted_messages
+                WHERE status = 'pending'
+                  AND message_key IN (SELECT unnest(?::VARCHAR[]))
+            """,
+                [list(message_keys)],
+            )
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .cache import LRUCache
+
+# On-disk cache of Spotify catalog responses, shared across runs
+DEFAULT_HTTP_CACHE_DIR = ".spotify_http_cache"
+
+# Catalog endpoints whose responses are the same for every user
+CACHEABLE_PATHS = ("/v1/tracks", "/v1/artists")
+
+# Open connections kept per host; at least one per enrichment worker
+DEFAULT_POOL_SIZE = 10
+
+
+def _max_age(headers) -> Optional[int]:
+    """Seconds a response may be reused, 0 if it must not be stored."""
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    try:
+        return max(0, int(directives.get("max-age", 0)))
+    except ValueError:
+        return 0
+
+
+def _cached_response(entry: Dict, request) -> requests.Response:
+    """Rebuild a 200 response from a cache entry."""
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response._content = entry["body"].encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = entry["url"]
+    response.request = request
+    return response
+
+
+class ResponseCache:
+    """
+    Conditional-response store: an LRU in memory over one file per URL.
+
+    Entries hold the response body and headers, its ETag and the
+    wall-clock time it expires at. Files are replaced atomically, so
+    concurrent workers and processes never read a partial entry.
+    """
+
+    def __init__(self, directory: str = None, max_size: int = 10_000):
+        self.directory = Path(directory) if directory else None
+        self._memory = LRUCache(max_size=max_size)
+
+    def _path(self, url: str) -> Path:
+        return self.directory / hashlib.sha256(url.encode()).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the entry stored for a URL, fresh or not."""
+        entry = self._memory.get(url)
+        if entry is None and self.directory is not None:
+            try:
+                entry = json.loads(self._path(url).read_text())
+            except (OSError, ValueError):
+                return None
+            self._memory.set(url, entry)
+        return entry
+
+    def set(self, url: str, entry: Dict):
+        """Store an entry in memory and on disk."""
+        self._memory.set(url, entry)
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, self._path(url))
+
+
+class CachingSession(requests.Session):
+    """
+    A requests session that answers catalog GETs from a ResponseCache.
+
+    Responses within their Cache-Control max-age are served without a
+    network round trip. Stale entries with an ETag are revalidated with
+    If-None-Match, and a 304 is answered from the cached body. Only
+    paths under ``cacheable_paths`` are cached, since responses are
+    shared by every user of the cache.
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        cacheable_paths: Iterable[str] = CACHEABLE_PATHS,
+    ):
+        super().__init__()
+        self.cache = cache
+        self.cacheable_paths = tuple(cacheable_paths)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def _is_cacheable(self, url: str) -> bool:
+        path = urlsplit(url).path.rstrip("/")
+        return any(
+            path == prefix or path.startswith(prefix + "/")
+            for prefix in self.cacheable_paths
+        )
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if method.upper() != "GET" or not self._is_cacheable(url):
+            return super().request(
+                method, url, params=params, headers=headers, **kwargs
+            )
+
+        request = requests.Request("GET", url, params=params).prepare()
+        key = request.url
+        entry = self.cache.get(key)
+        if entry is not None and entry["expires_at"] > time.time():
+            self._count("hits")
+            return _cached_response(entry, request)
+
+        headers = dict(headers or {})
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        response = super().request(
+            method, url, params=params, headers=headers, **kwargs
+        )
+
+        if response.status_code == 304 and entry is not None:
+            self._count("revalidations")
+            max_age = _max_age(response.headers) or 0
+            entry = {**entry, "expires_at": time.time() + max_age}
+            self.cache.set(key, entry)
+            return _cached_response(entry, request)
+
+        self._count("misses")
+        max_age = _max_age(response.headers)
+        etag = response.headers.get("ETag")
+        if response.status_code == 200 and max_age is not None:
+            if max_age or etag:
+                self.cache.set(
+                    key,
+                    {
+                        "url": key,
+                        "headers": {
+                            "Content-Type": response.headers.get(
+                                "Content-Type", "application/json"
+                            )
+                        },
+                        "body": response.text,
+                        "etag": etag,
+                        "expires_at": time.time() + max_age,
+                    },
+                )
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of the cumulative cache counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+            }
+
+
+def build_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    cache_dir: Optional[str] = DEFAULT_HTTP_CACHE_DIR,
+    cacheable_paths: Iterable[str] = CACHEABLE_PATHS,
+) -> requests.Session:
+    """
+    Build the pooled keep-alive session used for Spotify API calls.
+
+    Up to ``pool_size`` connections per host are kept open for reuse.
+    Catalog responses are cached under ``cache_dir``; pass None to keep
+    them in memory only. The adapter does no retries of its own, so
+    callers see every failure and 429s reach the shared rate limiter.
+    """
+    session = CachingSession(ResponseCache(cache_dir), cacheable_paths)
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -1,4 +1,4 @@
-from spotify_client import SpotifyClient
+from .spotify_client import SpotifyClient
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,343 @@
+"""
+Counters, timings and spans for the sync and enrichment pipeline.
+
+Instrumented code reports to a Metrics object, which forwards every
+measurement as an Event to its sinks: LoggingSink writes them to a
+logger, PrometheusSink aggregates them for a Prometheus text endpoint
+and MemorySink keeps them for tests. A Metrics object without sinks
+costs next to nothing, so instrumentation stays on everywhere.
+"""
+
+import argparse
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Upper bounds of the histogram buckets for timings, in seconds
+DEFAULT_SECONDS_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    60.0,
+)
+
+# Upper bounds of the histogram buckets for sizes, e.g. tracks per batch
+DEFAULT_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 500, 1000, 10_000)
+
+# Prepended to every metric name on the Prometheus endpoint
+PROMETHEUS_PREFIX = "team_tracks_"
+
+# Path of the spans enclosing the running code, e.g. "sync/enrich"
+_current_span: ContextVar[Optional[str]] = ContextVar(
+    "current_span", default=None
+)
+
+
+class Event(NamedTuple):
+    """One measurement, as passed to sinks."""
+
+    kind: str  # "counter", "observation" or "span"
+    name: str
+    value: float
+    labels: Dict[str, str]
+    span: Optional[str]  # Enclosing span path, None outside spans
+
+
+class Metrics:
+    """
+    Report counters, observations and spans to pluggable sinks.
+
+    Names are dotted, e.g. ``spotify.api_calls``; observations of
+    durations end in ``_seconds``. Labels should have few distinct
+    values, since sinks may keep one series per label combination.
+    Spans nest per thread and per context, so work submitted with
+    contextvars.copy_context() is attributed to the submitting span.
+    """
+
+    def __init__(self, sinks: Iterable = ()):
+        self.sinks = list(sinks)
+
+    def add_sink(self, sink):
+        """Send all further measurements to ``sink`` as well."""
+        self.sinks.append(sink)
+
+    def count(self, name: str, value: float = 1, **labels):
+        """Add ``value`` to a counter."""
+        if self.sinks:
+            self._emit("counter", name, value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one sample of a distribution, e.g. a latency."""
+        if self.sinks:
+            self._emit("observation", name, value, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the seconds the enclosed block takes."""
+        if not self.sinks:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._emit("observation", name, elapsed, labels)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Time a pipeline stage and attribute nested measurements to it.
+
+        The span is reported when the block exits, with an ``error``
+        label naming the exception if it raised.
+        """
+        if not self.sinks:
+            yield
+            return
+        parent = _current_span.get()
+        token = _current_span.set(f"{parent}/{name}" if parent else name)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            labels = {**labels, "error": type(e).__name__}
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_span.reset(token)
+            self._emit("span", name, elapsed, labels)
+
+    def _emit(self, kind: str, name: str, value: float, labels: Dict):
+        event = Event(
+            kind,
+            name,
+            value,
+            {key: str(label) for key, label in labels.items()},
+            _current_span.get(),
+        )
+        for sink in self.sinks:
+            sink.emit(event)
+
+
+class MemorySink:
+    """Keep every event in memory, for tests."""
+
+    def __init__(self):
+        self.events: List[Event] = []
+        self._lock = threading.Lock()
+
+    def emit(self, event: Event):
+        with self._lock:
+            self.events.append(event)
+
+    def find(self, name: str, kind: str = None, **labels) -> List[Event]:
+        """Events with this name, kind and at least these labels."""
+        with self._lock:
+            events = list(self.events)
+        wanted = {k: str(v) for k, v in labels.items()}
+        return [
+            event
+            for event in events
+            if event.name == name and kind in (None, event.kind)
+            if all(event.labels.get(k) == v for k, v in wanted.items())
+        ]
+
+    def total(self, name: str, **labels) -> float:
+        """Sum of a counter across matching events."""
+        return sum(e.value for e in self.find(name, "counter", **labels))
+
+
+class LoggingSink:
+    """
+    Write events to a logger.
+
+    Spans are logged at ``span_level`` with their duration; counters and
+    observations, which are far more frequent, at ``level``. The event
+    is attached to each record as ``record.metric``.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger = None,
+        level: int = logging.DEBUG,
+        span_level: int = logging.INFO,
+    ):
+        self.logger = logger or logging.getLogger("src.metrics")
+        self.level = level
+        self.span_level = span_level
+
+    def emit(self, event: Event):
+        level = self.span_level if event.kind == "span" else self.level
+        if not self.logger.isEnabledFor(level):
+            return
+        labels = " ".join(f"{k}={v}" for k, v in event.labels.items())
+        if event.kind == "span":
+            path = f"{event.span}/{event.name}" if event.span else event.name
+            message = f"span {path} took {event.value:.3f}s"
+        else:
+            message = f"{event.kind} {event.name}={event.value:g}"
+            if event.span:
+                message += f" in {event.span}"
+        if labels:
+            message += f" ({labels})"
+        self.logger.log(level, message, extra={"metric": event._asdict()})
+
+
+def _prometheus_name(name: str) -> str:
+    return PROMETHEUS_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prometheus_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class PrometheusSink:
+    """
+    Aggregate events into Prometheus counters and histograms.
+
+    Counters are exposed as ``<name>_total``; observations as
+    histograms, using the seconds buckets for names ending in
+    ``_seconds`` and the size buckets otherwise. Spans become one
+    ``span_seconds`` histogram labelled by span path, e.g.
+    ``sync/enrich/fetch``. render() returns the
+    text exposition format and serve() exposes it over HTTP.
+    """
+
+    def __init__(
+        self,
+        seconds_buckets: Tuple[float, ...] = DEFAULT_SECONDS_BUCKETS,
+        size_buckets: Tuple[float, ...] = DEFAULT_SIZE_BUCKETS,
+    ):
+        self.seconds_buckets = seconds_buckets
+        self.size_buckets = size_buckets
+        self._counters = {}
+        # (name, labels) -> [bucket counts..., sum, count]
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event: Event):
+        name, labels = event.name, event.labels
+        if event.kind == "span":
+            stage = f"{event.span}/{name}" if event.span else name
+            name, labels = "span_seconds", {"stage": stage, **labels}
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if event.kind == "counter":
+                self._counters[key] = self._counters.get(key, 0) + event.value
+                return
+            buckets = self._buckets(name)
+            histogram = self._histograms.setdefault(
+                key, [0] * (len(buckets) + 2)
+            )
+            for i, bound in enumerate(buckets):
+                if event.value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += event.value
+            histogram[-1] += 1
+
+    def _buckets(self, name: str) -> Tuple[float, ...]:
+        if name.endswith("_seconds"):
+            return self.seconds_buckets
+        return self.size_buckets
+
+    def render(self) -> str:
+        """The aggregated metrics in Prometheus text format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            metric = _prometheus_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    labels = _prometheus_labels(labels)
+                    lines.append(f"{metric}{labels} {value:g}")
+
+        for name in sorted({name for name, _ in histograms}):
+            metric = _prometheus_name(name)
+            lines.append(f"# TYPE {metric} histogram")
+            for (hist_name, labels), values in sorted(histograms.items()):
+                if hist_name != name:
+                    continue
+                bounds = [f"{b:g}" for b in self._buckets(name)] + ["+Inf"]
+                counts = values[:-2] + [values[-1]]
+                for bound, count in zip(bounds, counts):
+                    bucket = _prometheus_labels(labels + (("le", bound),))
+                    lines.append(f"{metric}_bucket{bucket} {count}")
+                labels = _prometheus_labels(labels)
+                lines.append(f"{metric}_sum{labels} {values[-2]:g}")
+                lines.append(f"{metric}_count{labels} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve render() at /metrics from a background thread.
+
+        Returns the server; call shutdown() on it to stop serving.
+        """
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    """Add the --metrics-port and --log-metrics options to a CLI."""
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve Prometheus metrics at http://127.0.0.1:PORT/metrics",
+    )
+    parser.add_argument(
+        "--log-metrics",
+        action="store_true",
+        help="log how long each pipeline stage takes",
+    )
+
+
+def metrics_from_args(args: argparse.Namespace) -> Metrics:
+    """Build Metrics with the sinks selected by add_metrics_arguments."""
+    metrics = Metrics()
+    if args.log_metrics:
+        metrics.add_sink(LoggingSink())
+    if args.metrics_port:
+        prometheus = PrometheusSink()
+        prometheus.serve(args.metrics_port)
+        metrics.add_sink(prometheus)
+    return metrics
@@ -0,0 +1,178 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .database import DatabaseModels
+
+# Number of most recent tracks a profile lists in based_on_tracks
+PROFILE_RECENT_TRACKS = 7
+
+# Running sums kept in profile_data so profiles can be updated from new
+# plays alone; the averages and ratios are derived from them
+SUM_FIELDS = [
+    "play_count",
+    "popularity_sum",
+    "popularity_count",
+    "duration_ms_sum",
+    "duration_ms_count",
+    "explicit_count",
+    "explicit_total",
+]
+
+
+def _merge_counts(previous: Dict, new: pd.DataFrame, key: str) -> Dict:
+    """Add play counts from ``new`` to a stored {key: plays} mapping."""
+    counts = pd.Series(previous, dtype="int64")
+    if not new.empty:
+        counts = counts.add(
+            new.set_index(key)["plays"].rename(index=str), fill_value=0
+        )
+    return {
+        name: int(plays)
+        for name, plays in counts.sort_values(ascending=False).items()
+    }
+
+
+class ProfileEngine:
+    """
+    Materialize each user's listening profile into ``user_profiles``.
+
+    A profile stores running sums (play count, popularity, duration,
+    explicit plays, genre and release-year counts) next to the averages
+    derived from them. ``calculated_at`` records the ingest time of the
+    newest play included, so a refresh aggregates only plays saved after
+    it and adds them to the stored sums instead of rescanning history.
+
+    Refresh after enrichment: plays of tracks that had no enriched data
+    when they were aggregated count towards play_count only.
+    """
+
+    def __init__(self, db_models: DatabaseModels):
+        self.db_models = db_models
+
+    def refresh(self, user_ids: List[str] = None) -> Dict[str, Dict]:
+        """
+        Update profiles with plays ingested since they were calculated.
+
+        Refreshes ``user_ids``, or every user with plays, and returns the
+        updated profiles keyed by user ID.
+        """
+        stored = self.db_models.get_user_profiles(user_ids)
+        frames = self.db_models.aggregate_new_plays(
+            {
+                user_id: profile["calculated_at"]
+                for user_id, profile in stored.items()
+            },
+            user_ids=user_ids,
+            recent_track_count=PROFILE_RECENT_TRACKS,
+        )
+        totals = frames["totals"]
+        if totals.empty:
+            return {}
+
+        genres = frames["genres"].groupby("user_id")
+        release_years = frames["release_years"].groupby("user_id")
+        recent_tracks = (
+            frames["recent_tracks"]
+            .sort_values("played_at", ascending=False)
+            .groupby("user_id")["track_id"]
+        )
+
+        # Add the new sums to the stored ones for all users at once
+        previous_sums = pd.DataFrame(
+            [
+                {
+                    "user_id": user_id,
+                    **{
+                        field: profile["profile_data"].get(field, 0)
+                        for field in SUM_FIELDS
+                    },
+                }
+                for user_id, profile in stored.items()
+            ],
+            columns=["user_id"] + SUM_FIELDS,
+        )
+        # Numeric even with no stored profiles, so the fill below does
+        # not rely on pandas downcasting an empty object frame
+        previous_sums = previous_sums.set_index("user_id").astype("float64")
+        sums = (
+            totals.set_index("user_id")[SUM_FIELDS]
+            .fillna(0)
+            .add(previous_sums.reindex(totals["user_id"]).fillna(0))
+            .astype("float64")
+        )
+        averages = pd.DataFrame(
+            {
+                "avg_popularity": sums["popularity_sum"].div(
+                    sums["popularity_count"]
+                ),
+                "avg_duration_ms": sums["duration_ms_sum"].div(
+                    sums["duration_ms_count"]
+                ),
+                "explicit_ratio": sums["explicit_count"].div(
+                    sums["explicit_total"]
+                ),
+            }
+        ).replace([np.inf, -np.inf], np.nan)
+        averages = averages.astype(object).where(averages.notna(), None)
+
+        profiles = []
+        for row in totals.itertuples(index=False):
+            user_id = row.user_id
+            previous = stored.get(user_id, {})
+            previous_data = previous.get("profile_data", {})
+            empty = pd.DataFrame(columns=["plays"])
+
+            genre_counts = _merge_counts(
+                previous_data.get("genre_counts", {}),
+                (
+                    genres.get_group(user_id)
+                    if user_id in genres.groups
+                    else empty
+                ),
+                "genre",
+            )
+            year_counts = _merge_counts(
+                previous_data.get("release_year_histogram", {}),
+                (
+                    release_years.get_group(user_id)
+                    if user_id in release_years.groups
+                    else empty
+                ),
+                "release_year",
+            )
+            genre_total = sum(genre_counts.values()) or 1
+
+            # New plays are newer than stored ones, so they come first
+            based_on_tracks = list(
+                recent_tracks.get_group(user_id)
+                if user_id in recent_tracks.groups
+                else []
+            )
+            based_on_tracks += previous.get("based_on_tracks", [])
+
+            profile_data = {
+                **{
+                    field: int(sums.at[user_id, field]) for field in SUM_FIELDS
+                },
+                **averages.loc[user_id].to_dict(),
+                "genre_counts": genre_counts,
+                "genre_distribution": {
+                    genre: plays / genre_total
+                    for genre, plays in genre_counts.items()
+                },
+                "release_year_histogram": dict(sorted(year_counts.items())),
+            }
+            profiles.append(
+                {
+                    "user_id": user_id,
+                    "profile_data": profile_data,
+                    "based_on_tracks": based_on_tracks[:PROFILE_RECENT_TRACKS],
+                    "calculated_at": row.last_created_at,
+                    "track_count": profile_data["play_count"],
+                }
+            )
+
+        self.db_models.save_user_profiles(profiles)
+        return {profile["user_id"]: profile for profile in profiles}
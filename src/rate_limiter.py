@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by all workers calling one API.
+
+    ``rate`` tokens are added per second up to ``burst``. When the API
+    answers 429, pause() stops every caller until the server's
+    Retry-After has passed, instead of each worker retrying on its own.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 10):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back all callers for ``seconds`` (e.g. a Retry-After)."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            # Resume gently rather than with a full burst
+            self._tokens = 0.0
+            self._updated_at = max(self._updated_at, self._paused_until)
+
+    def _refill(self, now: float):
+        if now > self._updated_at:
+            elapsed = now - self._updated_at
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated_at = now
@@ -0,0 +1,47 @@
+import random
+
+import requests
+import spotipy
+
+# HTTP status codes worth retrying; anything else is the request's fault
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient API failures.
+
+    Attempt ``n`` (1-based) that fails waits a random time between zero
+    and ``min(max_delay, base_delay * 2 ** (n - 1))`` seconds, so
+    concurrent workers do not retry in lockstep.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        jitter: bool = True,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the given failed attempt."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Whether an error is transient and the call may succeed later."""
+        if isinstance(error, spotipy.exceptions.SpotifyException):
+            return error.http_status in RETRYABLE_STATUS_CODES
+        if isinstance(error, requests.exceptions.HTTPError):
+            status = getattr(error.response, "status_code", None)
+            return status in RETRYABLE_STATUS_CODES
+        return isinstance(
+            error,
+            (requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+        )
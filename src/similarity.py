@@ -0,0 +1,296 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .database import DatabaseModels
+
+# Genres kept as multi-hot columns, most common first. Rarer genres are
+# dropped so 100k tracks stay around 100 MB of float32 features.
+DEFAULT_MAX_GENRES = 256
+
+# Rows per matrix product, bounding the temporaries of batched scoring
+DEFAULT_BATCH_SIZE = 8192
+
+# Users scored together against each batch of track rows
+USER_BATCH_SIZE = 256
+
+NUMERIC_FEATURES = [
+    "popularity",
+    "duration_ms",
+    "explicit",
+    "release_year",
+    "artist_popularity",
+    "artist_followers",
+]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving all-zero rows at zero."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int):
+    """Keep the ``k`` highest scores per row of a score matrix."""
+    if scores.shape[1] > k:
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, best, axis=1)
+        rows = np.take_along_axis(rows, best, axis=1)
+    return scores, rows
+
+
+class SimilarityEngine:
+    """
+    Compare team members' tastes and suggest tracks from enriched data.
+
+    Each track becomes a unit-length feature vector: z-scored numeric
+    columns (popularity, duration, explicit, release year, artist
+    popularity and log followers) next to a multi-hot genre encoding,
+    each block weighted equally. A user's profile is the play-weighted
+    mean of the tracks they played, so cosine similarity between users
+    and between users and tracks is a plain matrix product.
+
+    The track matrix, user profiles and user-similarity matrix are kept
+    between refreshes. refresh() appends newly enriched tracks using the
+    normalization and genre vocabulary of the first build, and
+    recomputes profiles and similarity rows only for users with plays
+    ingested since the last refresh.
+    """
+
+    def __init__(
+        self,
+        db_models: DatabaseModels,
+        max_genres: int = DEFAULT_MAX_GENRES,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.db_models = db_models
+        self.max_genres = max_genres
+        self.batch_size = batch_size
+
+        self.track_ids = []
+        self.track_matrix = np.zeros((0, 0), dtype="float32")
+        self._track_rows = {}
+        self._numeric_stats = None
+        self._genre_columns = None
+        self._features_since = None
+
+        self.user_ids = []
+        self.user_matrix = np.zeros((0, 0), dtype="float32")
+        self.similarity = np.zeros((0, 0), dtype="float32")
+        self._user_rows = {}
+        self._played_rows = {}
+        self._ingested_at = {}
+        self._incomplete_users = set()
+
+    def refresh(self) -> List[str]:
+        """
+        Bring features and similarities up to date with the database.
+
+        Returns the IDs of the users whose rows were recomputed.
+        """
+        tracks_added, updated_rows = self._update_track_features()
+        if not self.track_ids:
+            return []
+        latest = self.db_models.get_latest_ingested_at()
+        # Users who played re-enriched tracks are redone too, as are
+        # users with plays of then-unenriched tracks once tracks arrive
+        redo = {
+            user_id
+            for user_id, played in self._played_rows.items()
+            if np.isin(played, updated_rows).any()
+        }
+        if tracks_added:
+            redo |= self._incomplete_users
+        changed = sorted(
+            user_id
+            for user_id, ingested_at in latest.items()
+            if self._ingested_at.get(user_id) != ingested_at or user_id in redo
+        )
+        if changed:
+            self._update_users(changed)
+            self._ingested_at.update(
+                {user_id: latest[user_id] for user_id in changed}
+            )
+        return changed
+
+    def similar_users(self, user_id: str, limit: int = 5) -> List[Dict]:
+        """Other users most similar to ``user_id``, most similar first."""
+        row = self._user_rows.get(user_id)
+        if row is None:
+            return []
+        scores = self.similarity[row].copy()
+        scores[row] = -np.inf
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [
+            {"user_id": self.user_ids[i], "similarity": float(scores[i])}
+            for i in order
+            if np.isfinite(scores[i])
+        ]
+
+    def recommend(self, user_id: str, limit: int = 10) -> List[Dict]:
+        """Tracks closest to a user's profile that they have not played."""
+        return self.recommend_many([user_id], limit).get(user_id, [])
+
+    def recommend_many(
+        self, user_ids: List[str], limit: int = 10
+    ) -> Dict[str, List[Dict]]:
+        """
+        Recommend tracks for many users with batched matrix products.
+
+        Candidates are every enriched track, i.e. what the team plays.
+        Tracks are scored ``batch_size`` rows at a time and only the
+        running top ``limit`` per user is kept, so memory stays bounded
+        for any catalog size.
+        """
+        user_ids = [u for u in user_ids if u in self._user_rows]
+        recommendations = {}
+        for start in range(0, len(user_ids), USER_BATCH_SIZE):
+            batch = user_ids[start : start + USER_BATCH_SIZE]
+            scores, rows = self._score_tracks(batch, limit)
+            for user_id, user_scores, user_rows in zip(batch, scores, rows):
+                order = np.argsort(-user_scores, kind="stable")
+                recommendations[user_id] = [
+                    {
+                        "track_id": self.track_ids[user_rows[i]],
+                        "score": float(user_scores[i]),
+                    }
+                    for i in order
+                    if np.isfinite(user_scores[i])
+                ]
+        return recommendations
+
+    def _score_tracks(self, user_ids: List[str], limit: int):
+        """Top ``limit`` unplayed track scores and rows per user."""
+        vectors = self.user_matrix[[self._user_rows[u] for u in user_ids]]
+        best_scores = np.full((len(user_ids), 0), -np.inf, dtype="float32")
+        best_rows = np.zeros((len(user_ids), 0), dtype="int64")
+
+        for start in range(0, len(self.track_ids), self.batch_size):
+            end = min(start + self.batch_size, len(self.track_ids))
+            scores = vectors @ self.track_matrix[start:end].T
+            for i, user_id in enumerate(user_ids):
+                played = self._played_rows[user_id]
+                played = played[(played >= start) & (played < end)]
+                scores[i, played - start] = -np.inf
+
+            rows = np.broadcast_to(np.arange(start, end), scores.shape).copy()
+            best_scores, best_rows = _top_k(
+                np.hstack([best_scores, scores]),
+                np.hstack([best_rows, rows]),
+                limit,
+            )
+        return best_scores, best_rows
+
+    def _update_track_features(self) -> Tuple[int, np.ndarray]:
+        """
+        Encode tracks enriched since the last refresh into the matrix.
+
+        Returns the number of tracks added and the matrix rows of the
+        re-enriched tracks that were overwritten.
+        """
+        frames = self.db_models.load_track_features(self._features_since)
+        tracks = frames["tracks"]
+        if tracks.empty:
+            return 0, np.array([], dtype="int64")
+
+        values = tracks[NUMERIC_FEATURES].astype("float64")
+        values["artist_followers"] = np.log1p(
+            values["artist_followers"].clip(lower=0)
+        )
+        values = values.to_numpy()
+        if self._numeric_stats is None:
+            mean = np.nan_to_num(np.nanmean(values, axis=0))
+            std = np.nan_to_num(np.nanstd(values, axis=0))
+            self._numeric_stats = (mean, np.where(std > 0, std, 1.0))
+        mean, std = self._numeric_stats
+        # Missing values count as average
+        numeric = np.nan_to_num((values - mean) / std)
+
+        genres = frames["genres"]
+        if self._genre_columns is None:
+            top = genres["genre_id"].value_counts(sort=True).index
+            top = top[: self.max_genres]
+            self._genre_columns = pd.Series(np.arange(len(top)), index=top)
+        rows = pd.Index(tracks["track_id"]).get_indexer(genres["track_id"])
+        columns = (
+            genres["genre_id"].map(self._genre_columns).to_numpy("float64")
+        )
+        known = (rows >= 0) & ~np.isnan(columns)
+        genre_matrix = np.zeros((len(tracks), len(self._genre_columns)))
+        genre_matrix[rows[known], columns[known].astype("int64")] = 1.0
+
+        features = _normalize_rows(
+            np.hstack(
+                [_normalize_rows(numeric), _normalize_rows(genre_matrix)]
+            )
+        ).astype("float32")
+
+        # Re-enriched tracks are overwritten, new ones appended
+        positions = np.array(
+            [self._track_rows.get(t, -1) for t in tracks["track_id"]]
+        )
+        existing = positions >= 0
+        if existing.any():
+            self.track_matrix[positions[existing]] = features[existing]
+        new_ids = tracks["track_id"][~existing].tolist()
+        self._track_rows.update(
+            {
+                track_id: len(self.track_ids) + i
+                for i, track_id in enumerate(new_ids)
+            }
+        )
+        self.track_ids.extend(new_ids)
+        self.track_matrix = (
+            np.vstack([self.track_matrix, features[~existing]])
+            if self.track_matrix.size
+            else features[~existing]
+        )
+        self._features_since = tracks["updated_at"].max()
+        return len(new_ids), positions[existing]
+
+    def _update_users(self, user_ids: List[str]):
+        """Recompute profiles and similarity rows for some users."""
+        plays = self.db_models.count_plays_per_track(user_ids)
+        plays = plays.assign(row=plays["track_id"].map(self._track_rows))
+        unknown = plays["row"].isna()
+        self._incomplete_users.difference_update(user_ids)
+        self._incomplete_users.update(plays.loc[unknown, "user_id"])
+        plays = plays[~unknown]
+
+        width = self.track_matrix.shape[1]
+        vectors = np.zeros((len(user_ids), width), dtype="float32")
+        positions = {user_id: i for i, user_id in enumerate(user_ids)}
+        for user_id in user_ids:
+            self._played_rows[user_id] = np.array([], dtype="int64")
+        for user_id, user_plays in plays.groupby("user_id", sort=False):
+            rows = user_plays["row"].to_numpy("int64")
+            weights = user_plays["plays"].to_numpy("float32")
+            vectors[positions[user_id]] = weights @ self.track_matrix[rows]
+            self._played_rows[user_id] = np.sort(rows)
+        vectors = _normalize_rows(vectors)
+
+        new_users = [u for u in user_ids if u not in self._user_rows]
+        if new_users:
+            self._user_rows.update(
+                {
+                    user_id: len(self.user_ids) + i
+                    for i, user_id in enumerate(new_users)
+                }
+            )
+            self.user_ids.extend(new_users)
+            size = len(self.user_ids)
+            user_matrix = np.zeros((size, width), dtype="float32")
+            if len(self.user_matrix):
+                user_matrix[: len(self.user_matrix)] = self.user_matrix
+            self.user_matrix = user_matrix
+            similarity = np.zeros((size, size), dtype="float32")
+            old = len(self.similarity)
+            similarity[:old, :old] = self.similarity
+            self.similarity = similarity
+
+        rows = np.array([self._user_rows[u] for u in user_ids])
+        self.user_matrix[rows] = vectors
+        changed = self.user_matrix[rows] @ self.user_matrix.T
+        self.similarity[rows, :] = changed
+        self.similarity[:, rows] = changed.T
@@ -1,146 +1,475 @@
+import contextvars
+import logging
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
+import requests
 import spotipy
 from dotenv import load_dotenv
 from spotipy.oauth2 import SpotifyOAuth
 
+from .cache import ArtistCache, TrackCache
+from .http_cache import DEFAULT_POOL_SIZE, build_session
+from .metrics import Metrics
+from .rate_limiter import RateLimiter
+from .retry import RetryPolicy
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Spotify's maximum page size for /me/player/recently-played
+RECENTLY_PLAYED_PAGE_SIZE = 50
+
+# One OAuth token cache file per team member, named by user ID
+TEAM_TOKEN_CACHE_DIR = ".spotify_caches"
+
+# How often one call may wait out a 429 before giving up
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Seconds to wait for Spotify to connect and respond
+DEFAULT_REQUESTS_TIMEOUT = 10
+
+
+def _to_epoch_ms(timestamp: Union[datetime, int]) -> int:
+    """Convert a played_at timestamp to Spotify's Unix-millisecond cursor."""
+    if isinstance(timestamp, int):
+        return timestamp
+    if timestamp.tzinfo is None:
+        # DuckDB TIMESTAMP values are naive UTC
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+
+def _batched(track_ids: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Lazily group IDs into batches, dropping None values and repeats."""
+    batch = []
+    for track_id in track_ids:
+        if track_id and track_id not in batch:
+            batch.append(track_id)
+            if len(batch) == size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
 
 class SpotifyClient:
-    def __init__(self):
-        self.sp = spotipy.Spotify(
+    def __init__(
+        self,
+        artist_cache: ArtistCache = None,
+        track_cache: TrackCache = None,
+        rate_limiter: RateLimiter = None,
+        max_workers: int = 1,
+        retry_policy: RetryPolicy = None,
+        cache_path: str = ".spotify_cache",
+        requests_session: requests.Session = None,
+        requests_timeout: float = DEFAULT_REQUESTS_TIMEOUT,
+        spotify: spotipy.Spotify = None,
+        metrics: Metrics = None,
+    ):
+        # In-memory only unless a persistent cache is passed in
+        self.artist_cache = artist_cache or ArtistCache()
+        self.track_cache = track_cache or TrackCache()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_workers = max_workers
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or Metrics()
+        self.last_enrichment_stats = {}
+        # Track ID -> error for IDs given up on during the last run
+        self.last_failed_track_ids = {}
+        self._failures_lock = threading.Lock()
+        # Pooled keep-alive session with an on-disk catalog response
+        # cache; it has no urllib3 retries, as _call_api owns retrying
+        # and 429s must reach the shared rate limiter intact
+        self.session = requests_session or build_session(
+            pool_size=max(DEFAULT_POOL_SIZE, max_workers * 2)
+        )
+        # An API stand-in (e.g. for benchmarks) replaces the OAuth client
+        self.sp = spotify or spotipy.Spotify(
             auth_manager=SpotifyOAuth(
                 client_id=os.getenv("SPOTIFY_CLIENT_ID"),
                 client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
                 redirect_uri=os.getenv("SPOTIFY_REDIRECT_URI"),
                 scope="user-read-recently-played",
-                cache_path=".spotify_cache",  # Explicit cache path
-            )
+                cache_path=cache_path,  # Explicit token cache path
+            ),
+            requests_session=self.session,
+            requests_timeout=requests_timeout,
         )
 
+    @classmethod
+    def for_user(
+        cls,
+        user_id: str,
+        token_cache_dir: str = TEAM_TOKEN_CACHE_DIR,
+        **kwargs,
+    ) -> "SpotifyClient":
+        """Create a client authorized with one team member's token cache."""
+        Path(token_cache_dir).mkdir(parents=True, exist_ok=True)
+        return cls(cache_path=str(Path(token_cache_dir) / user_id), **kwargs)
+
+    @staticmethod
+    def _parse_play_item(item: Dict) -> Dict:
+        """Flatten a recently-played item into a track dict."""
+        track = item["track"]
+        return {
+            "id": track["id"],  # Added track ID for audio features
+            "name": track["name"],
+            "artist": track["artists"][0]["name"],
+            "album": track["album"]["name"],
+            "played_at": item["played_at"],
+        }
+
     def get_recent_tracks(self, limit=10):
-        results = self.sp.current_user_recently_played(limit=limit)
+        results = self._call_api(
+            self.sp.current_user_recently_played, limit=limit
+        )
+        return [self._parse_play_item(item) for item in results["items"]]
+
+    def get_tracks_played_after(
+        self,
+        after: Union[datetime, int],
+        max_pages: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Get only the plays newer than a high-water mark.
+
+        ``after`` is the latest played_at already stored, as a datetime or
+        Unix milliseconds. Pages forward with the returned ``after`` cursor
+        until Spotify has nothing newer, so an idle user costs one call.
+        """
+        cursor = _to_epoch_ms(after)
         tracks = []
-        for item in results["items"]:
-            track = item["track"]
-            tracks.append(
-                {
-                    "id": track["id"],  # Added track ID for audio features
-                    "name": track["name"],
-                    "artist": track["artists"][0]["name"],
-                    "album": track["album"]["name"],
-                    "played_at": item["played_at"],
-                }
+        pages = 0
+
+        while True:
+            results = self._call_api(
+                self.sp.current_user_recently_played,
+                limit=RECENTLY_PLAYED_PAGE_SIZE,
+                after=cursor,
             )
+            items = results.get("items") or []
+            tracks.extend(self._parse_play_item(item) for item in items)
+            pages += 1
+
+            next_cursor = int((results.get("cursors") or {}).get("after") or 0)
+            exhausted = len(items) < RECENTLY_PLAYED_PAGE_SIZE
+            if exhausted or next_cursor <= cursor:
+                break
+            if max_pages is not None and pages >= max_pages:
+                break
+            cursor = next_cursor
+
         return tracks
 
-    def get_track_enriched_data(self, track_ids: List[str]) -> List[Dict]:
+    def get_track_enriched_data(
+        self, track_ids: List[str], max_workers: int = None
+    ) -> List[Dict]:
         """
         Get enriched track data including artist genres, popularity,
         and release info.
         """
-        if not track_ids:
-            return []
+        all_enriched_data = []
+        for enriched_batch in self.iter_track_enriched_data(
+            track_ids, max_workers=max_workers
+        ):
+            all_enriched_data.extend(enriched_batch)
+        return all_enriched_data
 
-        # Remove None values and duplicates
-        clean_track_ids = list(set([tid for tid in track_ids if tid]))
+    def iter_track_enriched_data(
+        self, track_ids: Iterable[str], max_workers: int = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Yield enriched track data one 50-track batch at a time.
+
+        ``track_ids`` may be any iterable, including a lazy generator; it
+        is consumed one batch ahead of the work, so memory stays bounded
+        by the number of batches in flight. With ``max_workers`` > 1
+        batches are fetched concurrently on a thread pool, throttled by
+        the shared rate limiter, and still yielded in input order.
+        """
+        if isinstance(track_ids, (list, tuple)):
+            # Remove duplicates across the whole input, keeping order
+            track_ids = list(dict.fromkeys(track_ids))
 
         # Split into batches of 50 (Spotify's limit for /tracks endpoint)
-        batch_size = 50
-        all_enriched_data = []
+        batches = _batched(track_ids, 50)
+        cache_stats_before = self.artist_cache.stats()
+        with self._failures_lock:
+            self.last_failed_track_ids = {}
+
+        max_workers = max_workers or self.max_workers
+        if max_workers <= 1:
+            for batch in batches:
+                yield self._fetch_enriched_batch(batch)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                in_flight = deque()
+                for batch in batches:
+                    # Workers report their metrics under the caller's span
+                    in_flight.append(
+                        executor.submit(
+                            contextvars.copy_context().run,
+                            self._fetch_enriched_batch,
+                            batch,
+                        )
+                    )
+                    # Keep every worker busy with one batch queued behind it
+                    if len(in_flight) >= max_workers * 2:
+                        yield in_flight.popleft().result()
+                while in_flight:
+                    yield in_flight.popleft().result()
+
+        self._report_artist_cache_stats(cache_stats_before)
+
+    def pop_failed_track_ids(self) -> Dict[str, str]:
+        """Return and clear the track IDs given up on so far this run."""
+        with self._failures_lock:
+            failed, self.last_failed_track_ids = self.last_failed_track_ids, {}
+        return failed
+
+    def _call_api(self, method, *args, **kwargs):
+        """
+        Call a spotipy method through the shared rate limiter and retry
+        policy.
 
-        for i in range(0, len(clean_track_ids), batch_size):
-            batch = clean_track_ids[i : i + batch_size]
+        A 429 pauses every worker for the server's Retry-After; other
+        transient failures back off with jitter. Up to
+        ``retry_policy.max_attempts`` failures are tolerated per call, not
+        counting rate limiting.
+        """
+        endpoint = getattr(method, "__name__", "unknown")
+        attempt = 0
+        rate_limited = 0
+        while True:
+            self.rate_limiter.acquire()
+            self.metrics.count("spotify.api_calls", endpoint=endpoint)
             try:
-                print(
-                    f"Fetching enriched track data for {len(batch)} tracks..."
+                with self.metrics.timer(
+                    "spotify.api_call_seconds", endpoint=endpoint
+                ):
+                    return method(*args, **kwargs)
+            except Exception as e:
+                if not RetryPolicy.is_retryable(e):
+                    raise
+                if getattr(e, "http_status", None) == 429:
+                    rate_limited += 1
+                    if rate_limited > MAX_RATE_LIMIT_RETRIES:
+                        raise
+                    retry_after = float(e.headers.get("Retry-After") or 1)
+                    self.metrics.count("spotify.rate_limited")
+                    logger.warning(
+                        "Rate limited by Spotify, waiting %ss", retry_after
+                    )
+                    self.rate_limiter.pause(retry_after)
+                    continue
+
+                attempt += 1
+                if attempt >= self.retry_policy.max_attempts:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                self.metrics.count("spotify.retries", endpoint=endpoint)
+                logger.warning(
+                    "Spotify API error: %s, retrying in %.1fs", e, delay
                 )
-                # Get tracks with full data
-                tracks_data = self.sp.tracks(batch)
-
-                # Get unique artist IDs for genre information
-                artist_ids = set()
-                for track in tracks_data.get("tracks", []):
-                    if track and track.get("artists"):
-                        for artist in track["artists"]:
-                            artist_ids.add(artist["id"])
-
-                # Fetch artist data for genres
-                artist_info = {}
-                if artist_ids:
-                    artist_list = list(artist_ids)
-                    for j in range(
-                        0, len(artist_list), 50
-                    ):  # Artists endpoint also has 50 limit
-                        artist_batch = artist_list[j : j + 50]
-                        artists_data = self.sp.artists(artist_batch)
-                        for artist in artists_data.get("artists", []):
-                            if artist:
-                                artist_info[artist["id"]] = {
-                                    "genres": artist.get("genres", []),
-                                    "popularity": artist.get("popularity", 0),
-                                    "followers": artist.get(
-                                        "followers", {}
-                                    ).get("total", 0),
-                                }
-
-                # Combine track and artist data
-                for track in tracks_data.get("tracks", []):
-                    if track and track.get("id"):
-                        enriched_data = {
-                            "id": track["id"],
-                            "name": track["name"],
-                            "popularity": track.get("popularity", 0),
-                            "duration_ms": track.get("duration_ms", 0),
-                            "explicit": track.get("explicit", False),
-                            "release_date": track.get("album", {}).get(
-                                "release_date", ""
-                            ),
-                            "album_type": track.get("album", {}).get(
-                                "album_type", ""
-                            ),
-                            "artists": [],
-                        }
-
-                        # Add artist information with genres
-                        for artist in track.get("artists", []):
-                            artist_data = {
-                                "id": artist["id"],
-                                "name": artist["name"],
-                                "genres": artist_info.get(
-                                    artist["id"], {}
-                                ).get("genres", []),
-                                "popularity": artist_info.get(
-                                    artist["id"], {}
-                                ).get("popularity", 0),
-                                "followers": artist_info.get(
-                                    artist["id"], {}
-                                ).get("followers", 0),
-                            }
-                            enriched_data["artists"].append(artist_data)
-
-                        all_enriched_data.append(enriched_data)
-
-                print(
-                    f"Successfully retrieved enriched data for "
-                    f"{len(all_enriched_data)} tracks"
+                time.sleep(delay)
+
+    def _fetch_enriched_batch(self, batch: List[str]) -> List[Dict]:
+        """
+        Get enriched data for a batch, fetching only uncached tracks.
+
+        Tracks another worker is already fetching are waited for rather
+        than fetched twice. Results keep the order of ``batch``; tracks
+        that could not be fetched are left out.
+        """
+        cached = self.track_cache.get_many(batch)
+        owned, waiting = self.track_cache.claim(
+            [track_id for track_id in batch if track_id not in cached]
+        )
+        self.metrics.count("cache.hits", len(cached), cache="track")
+        self.metrics.count("cache.misses", len(owned), cache="track")
+        self.metrics.count("cache.coalesced", len(waiting), cache="track")
+        fetched = {}
+        try:
+            if owned:
+                fetched = {
+                    data["id"]: data for data in self._fetch_and_isolate(owned)
+                }
+                self.track_cache.put_many(fetched)
+        finally:
+            self.track_cache.settle(owned, fetched)
+
+        for track_id, future in waiting.items():
+            data = future.result()
+            if data is not None:
+                fetched[track_id] = data
+        return [
+            cached.get(track_id) or fetched[track_id]
+            for track_id in batch
+            if track_id in cached or track_id in fetched
+        ]
+
+    def _fetch_and_isolate(self, batch: List[str]) -> List[Dict]:
+        """
+        Fetch enriched data for a batch, isolating IDs that fail.
+
+        A batch rejected outright (e.g. 400 for one malformed ID) is split
+        in half until the bad IDs are found, so the rest still succeed.
+        IDs still failing once retries are exhausted, and IDs Spotify
+        answers with null (e.g. removed tracks), are recorded in
+        last_failed_track_ids.
+        """
+        try:
+            enriched_batch = self._fetch_enriched_batch_once(batch)
+        except Exception as e:
+            if len(batch) > 1 and not RetryPolicy.is_retryable(e):
+                logger.warning(
+                    "Batch of %d tracks failed (%s), "
+                    "splitting to isolate bad IDs",
+                    len(batch),
+                    e,
                 )
+                middle = len(batch) // 2
+                return self._fetch_and_isolate(
+                    batch[:middle]
+                ) + self._fetch_and_isolate(batch[middle:])
 
-            except spotipy.exceptions.SpotifyException as e:
-                print(f"Spotify API error: {e}")
-                continue
-            except Exception as e:
-                print(f"Error fetching enriched track data: {e}")
-                continue
+            logger.error("Error fetching enriched track data: %s", e)
+            self._record_failures(batch, str(e))
+            return []
 
-        return all_enriched_data
+        returned = {data["id"] for data in enriched_batch}
+        missing = [track_id for track_id in batch if track_id not in returned]
+        if missing:
+            logger.warning(
+                "Spotify returned no data for %d tracks", len(missing)
+            )
+            self._record_failures(missing, "Track not returned by Spotify")
+        return enriched_batch
+
+    def _record_failures(self, track_ids: List[str], error: str):
+        """Record track IDs given up on this run, for dead-lettering."""
+        self.metrics.count("spotify.failed_tracks", len(track_ids))
+        with self._failures_lock:
+            for track_id in track_ids:
+                self.last_failed_track_ids[track_id] = error
+
+    def _fetch_enriched_batch_once(self, batch: List[str]) -> List[Dict]:
+        """Fetch and combine track and artist data for up to 50 tracks."""
+        with self.metrics.timer("spotify.enrich_batch_seconds"):
+            enriched_batch = self._combine_track_and_artist_data(batch)
+        self.metrics.observe("spotify.batch_size", len(batch))
+        logger.debug(
+            "Retrieved enriched data for %d of %d tracks",
+            len(enriched_batch),
+            len(batch),
+        )
+        return enriched_batch
+
+    def _combine_track_and_artist_data(self, batch: List[str]) -> List[Dict]:
+        """Fetch a batch's tracks and their uncached artists."""
+        enriched_batch = []
+        # Get tracks with full data
+        tracks_data = self._call_api(self.sp.tracks, batch)
+
+        # Get unique artist IDs for genre information
+        artist_ids = set()
+        for track in tracks_data.get("tracks", []):
+            if track and track.get("artists"):
+                for artist in track["artists"]:
+                    artist_ids.add(artist["id"])
+
+        # Fetch artist data for genres, skipping cached artists
+        artist_info = self.artist_cache.get_many(artist_ids)
+        artist_list = [a for a in artist_ids if a not in artist_info]
+        self.metrics.count("cache.hits", len(artist_info), cache="artist")
+        self.metrics.count("cache.misses", len(artist_list), cache="artist")
+        fetched_artists = {}
+        for j in range(
+            0, len(artist_list), 50
+        ):  # Artists endpoint also has 50 limit
+            artist_batch = artist_list[j : j + 50]
+            artists_data = self._call_api(self.sp.artists, artist_batch)
+            for artist in artists_data.get("artists", []):
+                if artist:
+                    fetched_artists[artist["id"]] = {
+                        "name": artist.get("name"),
+                        "genres": artist.get("genres", []),
+                        "popularity": artist.get("popularity", 0),
+                        "followers": artist.get("followers", {}).get(
+                            "total", 0
+                        ),
+                    }
+        self.artist_cache.put_many(fetched_artists)
+        artist_info.update(fetched_artists)
+
+        # Combine track and artist data
+        for track in tracks_data.get("tracks", []):
+            if track and track.get("id"):
+                enriched_data = {
+                    "id": track["id"],
+                    "name": track["name"],
+                    "popularity": track.get("popularity", 0),
+                    "duration_ms": track.get("duration_ms", 0),
+                    "explicit": track.get("explicit", False),
+                    "release_date": track.get("album", {}).get(
+                        "release_date", ""
+                    ),
+                    "album_type": track.get("album", {}).get("album_type", ""),
+                    "artists": [],
+                }
+
+                # Add artist information with genres
+                for artist in track.get("artists", []):
+                    info = artist_info.get(artist["id"], {})
+                    artist_data = {
+                        "id": artist["id"],
+                        "name": artist["name"],
+                        "genres": info.get("genres", []),
+                        "popularity": info.get("popularity", 0),
+                        "followers": info.get("followers", 0),
+                    }
+                    enriched_data["artists"].append(artist_data)
+
+                enriched_batch.append(enriched_data)
+
+        return enriched_batch
+
+    def _report_artist_cache_stats(self, stats_before: Dict[str, int]):
+        """Record and log the artist cache hit ratio for one run."""
+        stats_after = self.artist_cache.stats()
+        hits = stats_after["hits"] - stats_before["hits"]
+        misses = stats_after["misses"] - stats_before["misses"]
+        hit_ratio = ArtistCache.hit_ratio(hits, misses)
+        self.last_enrichment_stats = {
+            "artist_cache_hits": hits,
+            "artist_cache_misses": misses,
+            "artist_cache_hit_ratio": hit_ratio,
+        }
+        if hit_ratio is not None:
+            logger.info(
+                "Artist cache hit ratio: %.1f%% (%d hits, %d misses)",
+                hit_ratio * 100,
+                hits,
+                misses,
+            )
 
     def get_track_enriched_data_single(self, track_id: str) -> Optional[Dict]:
-        """Get enriched data for a single track."""
+        """
+        Get enriched data for a single track.
+
+        Served from the track cache when fresh, and otherwise shares any
+        fetch of the same track already in flight.
+        """
         if not track_id:
             return None
 
-        result = self.get_track_enriched_data([track_id])
+        result = self._fetch_enriched_batch([track_id])
         return result[0] if result else None
@@ -1,12 +1,39 @@
+import sys
+from pathlib import Path
+
 import streamlit as st
 
-from spotify_client import SpotifyClient
+# `streamlit run src/streamlit_app.py` only puts src/ on the path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import DatabaseConnection, DatabaseModels  # noqa: E402
+
+TRACK_LIMIT = 10
+REFRESH_INTERVAL_SECONDS = 60
+
+
+@st.cache_resource
+def get_db_models() -> DatabaseModels:
+    """
+    Read-only database access shared by all viewers.
+
+    The app never syncs; run ``python -m src.daemon`` next to it. Each
+    query opens its own read-only connection and holds DuckDB's shared
+    lock only while it runs, so the daemon can write between reads.
+    """
+    return DatabaseModels(DatabaseConnection.for_reading())
+
+
+@st.cache_data(ttl=REFRESH_INTERVAL_SECONDS)
+def load_recent_tracks(limit: int):
+    """Read recent tracks from DuckDB, cached across reruns and sessions."""
+    return get_db_models().get_recent_tracks(limit=limit)
+
 
 st.title("Spotify Recently Played Tracks")
 
 try:
-    client = SpotifyClient()
-    tracks = client.get_recent_tracks(limit=10)
+    tracks = load_recent_tracks(TRACK_LIMIT)
     if tracks:
         for t in tracks:
             st.write(f"**{t['name']}** by {t['artist']} (Album: {t['album']})")
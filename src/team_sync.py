@@ -0,0 +1,173 @@
+import argparse
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .data_persistence import DataPersistenceLayer
+from .http_cache import DEFAULT_POOL_SIZE, build_session
+from .metrics import add_metrics_arguments, metrics_from_args
+from .spotify_client import TEAM_TOKEN_CACHE_DIR, SpotifyClient
+
+logger = logging.getLogger(__name__)
+
+# Concurrent recently-played fetches; each is one or two slow API calls
+DEFAULT_SYNC_WORKERS = 16
+
+
+def discover_team_members(
+    token_cache_dir: str = TEAM_TOKEN_CACHE_DIR,
+) -> List[str]:
+    """List the user IDs that have a token cache file."""
+    cache_dir = Path(token_cache_dir)
+    if not cache_dir.is_dir():
+        return []
+    return sorted(path.name for path in cache_dir.iterdir() if path.is_file())
+
+
+class TeamSync:
+    """
+    Sync every team member's plays concurrently into one database.
+
+    Fetching runs on a worker pool, one task per user, while all
+    database writes happen on the calling thread as results come in, so
+    a single DuckDB writer is shared by the whole team. New tracks are
+    enriched once at the end, in full 50-ID batches across users.
+    """
+
+    def __init__(
+        self,
+        persistence: DataPersistenceLayer,
+        clients: Dict[str, SpotifyClient],
+        max_workers: int = DEFAULT_SYNC_WORKERS,
+    ):
+        self.persistence = persistence
+        self.clients = clients
+        self.max_workers = max_workers
+
+    @classmethod
+    def from_token_cache_dir(
+        cls,
+        persistence: DataPersistenceLayer,
+        token_cache_dir: str = TEAM_TOKEN_CACHE_DIR,
+        max_workers: int = DEFAULT_SYNC_WORKERS,
+    ) -> "TeamSync":
+        """
+        Build clients for every user with a cached token.
+
+        The clients share the persistence layer's rate limiter, caches
+        and metrics, since Spotify rate limits per app rather than per
+        user and catalog data is the same for everyone. They also share
+        one HTTP session whose pool keeps a connection per fetch worker.
+        """
+        shared_client = persistence.spotify_client
+        session = build_session(pool_size=max(DEFAULT_POOL_SIZE, max_workers))
+        clients = {
+            user_id: SpotifyClient.for_user(
+                user_id,
+                token_cache_dir,
+                artist_cache=shared_client.artist_cache,
+                track_cache=shared_client.track_cache,
+                rate_limiter=shared_client.rate_limiter,
+                retry_policy=shared_client.retry_policy,
+                requests_session=session,
+                metrics=shared_client.metrics,
+            )
+            for user_id in discover_team_members(token_cache_dir)
+        }
+        return cls(persistence, clients, max_workers=max_workers)
+
+    def fetch_and_save(
+        self, user_ids: List[str] = None
+    ) -> Tuple[Dict[str, Optional[int]], List[str]]:
+        """
+        Fetch and save new plays for some users (all by default).
+
+        Returns the number of new plays per user, None for users whose
+        fetch failed, and the IDs of the tracks played. Enrichment is
+        left to the caller so it can be coalesced across calls.
+        """
+        if user_ids is None:
+            user_ids = list(self.clients)
+        new_plays = {}
+        new_track_ids = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Fetches report their metrics under the caller's span
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self.persistence.fetch_new_plays,
+                    user_id,
+                    self.clients[user_id],
+                ): user_id
+                for user_id in user_ids
+            }
+            for future in as_completed(futures):
+                user_id = futures[future]
+                try:
+                    tracks = future.result()
+                except Exception as e:
+                    logger.error("Sync failed for %s: %s", user_id, e)
+                    self.persistence.metrics.count("sync.failures")
+                    new_plays[user_id] = None
+                    continue
+
+                self.persistence.save_plays(tracks, user_id)
+                new_plays[user_id] = len(tracks)
+                new_track_ids.extend(track["id"] for track in tracks)
+
+        return new_plays, new_track_ids
+
+    def sync_all(self) -> Dict[str, Optional[int]]:
+        """
+        Sync all users and return the number of new plays per user.
+
+        Users whose fetch failed map to None; the others are still saved.
+        """
+        with self.persistence.metrics.span("sync"):
+            new_plays, new_track_ids = self.fetch_and_save()
+            self.persistence.enrich_missing(new_track_ids)
+            self.persistence.refresh_profiles(
+                [user_id for user_id, count in new_plays.items() if count]
+            )
+        return new_plays
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sync recently played tracks for the whole team"
+    )
+    parser.add_argument(
+        "--login",
+        metavar="USER_ID",
+        help="authorize a team member and store their token",
+    )
+    parser.add_argument("--token-cache-dir", default=TEAM_TOKEN_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=DEFAULT_SYNC_WORKERS)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.login:
+        client = SpotifyClient.for_user(args.login, args.token_cache_dir)
+        # Any API call runs the OAuth flow and writes the token cache
+        client.get_recent_tracks(limit=1)
+        print(f"Stored token for {args.login}")
+        return
+
+    persistence = DataPersistenceLayer(metrics=metrics_from_args(args))
+    try:
+        team_sync = TeamSync.from_token_cache_dir(
+            persistence, args.token_cache_dir, max_workers=args.workers
+        )
+        for user_id, count in sorted(team_sync.sync_all().items()):
+            status = "failed" if count is None else f"{count} new plays"
+            print(f"- {user_id}: {status}")
+    finally:
+        persistence.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from .database import DatabaseConnection, DatabaseModels
+from .rate_limiter import RateLimiter
+from .retry import RetryPolicy
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Digests are claimed, sent and marked posted this many at a time
+DEFAULT_POST_BATCH_SIZE = 50
+
+# Concurrent webhook requests; also the size of the connection pool
+DEFAULT_POST_WORKERS = 4
+
+# Plays are grouped into one digest per user and window of this length
+DEFAULT_WINDOW_MINUTES = 60
+
+# Minutes to wait after a window closes before posting it. The daemon
+# polls idle users every 30 minutes, so plays near the end of a window
+# may only be synced that long after it closed; a digest posted sooner
+# would leave them out for good.
+DEFAULT_SETTLE_MINUTES = 35
+
+# Without --since, windows are read from this long before the latest
+# posted one, or before now on the first run, so failed posts are
+# retried for a day but months of seeded history are never sent
+DEFAULT_CATCH_UP_HOURS = 24
+
+
+def build_digest_card(digest: Dict) -> Dict:
+    """Render a play digest as a Teams message with an Adaptive Card."""
+    window_start = digest["window_start"].strftime("%Y-%m-%d %H:%M")
+    facts = [
+        {
+            "title": track["played_at"].strftime("%H:%M"),
+            "value": f"{track['name']} by {track['artist']}",
+        }
+        for track in digest["tracks"]
+    ]
+    return {
+        "type": "message",
+        "attachments": [
+            {
+                "contentType": "application/vnd.microsoft.card.adaptive",
+                "content": {
+                    "$schema": (
+                        "http://adaptivecards.io/schemas/adaptive-card.json"
+                    ),
+                    "type": "AdaptiveCard",
+                    "version": "1.4",
+                    "body": [
+                        {
+                            "type": "TextBlock",
+                            "size": "Medium",
+                            "weight": "Bolder",
+                            "text": (
+                                f"{digest['user_id']} played "
+                                f"{digest['track_count']} tracks"
+                            ),
+                        },
+                        {
+                            "type": "TextBlock",
+                            "isSubtle": True,
+                            "spacing": "None",
+                            "text": f"From {window_start} UTC",
+                        },
+                        {"type": "FactSet", "facts": facts},
+                    ],
+                },
+            }
+        ],
+    }
+
+
+class WebhookSender:
+    """
+    Post JSON messages to a Teams incoming webhook.
+
+    All requests go through one pooled ``requests.Session``, so
+    concurrent posts reuse keep-alive connections. Posts are throttled
+    by a rate limiter, a 429 pauses every worker for the Retry-After,
+    and other transient failures back off with jitter.
+    """
+
+    def __init__(
+        self,
+        webhook_url: str,
+        rate_limiter: RateLimiter = None,
+        retry_policy: RetryPolicy = None,
+        pool_size: int = DEFAULT_POST_WORKERS,
+        timeout: float = 10.0,
+    ):
+        self.webhook_url = webhook_url
+        # Teams throttles webhooks at a few posts per second
+        self.rate_limiter = rate_limiter or RateLimiter(rate=4, burst=4)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def send(self, payload: Dict):
+        """Post one message, raising once retries are exhausted."""
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.post(
+                    self.webhook_url, json=payload, timeout=self.timeout
+                )
+                response.raise_for_status()
+                return
+            except Exception as e:
+                if not RetryPolicy.is_retryable(e):
+                    raise
+                response = getattr(e, "response", None)
+                if response is not None and response.status_code == 429:
+                    retry_after = float(
+                        response.headers.get("Retry-After") or 1
+                    )
+                    self.rate_limiter.pause(retry_after)
+
+                attempt += 1
+                if attempt >= self.retry_policy.max_attempts:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logger.warning(
+                    "Webhook error: %s, retrying in %.1fs", e, delay
+                )
+                time.sleep(delay)
+
+
+class TeamsPoster:
+    """
+    Post per-user play digests to a Teams channel exactly once.
+
+    Digests are read from DuckDB in batches and claimed in the
+    posted_messages ledger before sending, so reruns and concurrent
+    posters never send a digest twice. A window is posted once it has
+    been closed for ``settle_minutes``, which should be at least the
+    daemon's --max-interval: plays synced after their window was posted
+    are not posted. Only plays from ``catch_up_hours`` before the latest
+    posted window are read, so each run costs the same however long the
+    history grows. ``sender`` is any object with a ``send(payload)``
+    method, e.g. WebhookSender.
+    """
+
+    def __init__(
+        self,
+        db_models: DatabaseModels,
+        sender,
+        window_minutes: int = DEFAULT_WINDOW_MINUTES,
+        batch_size: int = DEFAULT_POST_BATCH_SIZE,
+        max_workers: int = DEFAULT_POST_WORKERS,
+        settle_minutes: int = DEFAULT_SETTLE_MINUTES,
+        catch_up_hours: int = DEFAULT_CATCH_UP_HOURS,
+    ):
+        self.db_models = db_models
+        self.sender = sender
+        self.window_minutes = window_minutes
+        self.settle_minutes = settle_minutes
+        self.catch_up_hours = catch_up_hours
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def post_pending(
+        self, since: datetime = None, until: datetime = None
+    ) -> Dict[str, int]:
+        """
+        Post every digest not yet in the ledger.
+
+        Only windows that have closed by ``until`` are posted, by default
+        ``settle_minutes`` ago, so a digest is not sent while plays may
+        still join it. Without ``since``, windows from ``catch_up_hours``
+        before the latest posted window are read, or before ``until`` if
+        nothing was posted yet. Digests that fail to send are released
+        and retried next run, as are claims a crashed run left pending.
+        Returns the number of digests ``posted`` and ``failed``.
+        """
+        if until is None:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            until = now - timedelta(minutes=self.settle_minutes)
+        if since is None:
+            latest = self.db_models.get_latest_posted_window() or until
+            since = latest - timedelta(hours=self.catch_up_hours)
+        digests = self.db_models.get_unposted_digests(
+            self.window_minutes, since=since, until=until
+        )
+
+        totals = {"posted": 0, "failed": 0}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for start in range(0, len(digests), self.batch_size):
+                posted, failed = self._post_batch(
+                    digests[start : start + self.batch_size], executor
+                )
+                totals["posted"] += len(posted)
+                totals["failed"] += len(failed)
+        return totals
+
+    def _post_batch(
+        self, digests: List[Dict], executor: ThreadPoolExecutor
+    ) -> Tuple[List[str], List[str]]:
+        """Claim, send and settle one batch of digests."""
+        claimed = set(self.db_models.claim_messages(digests))
+        digests = [d for d in digests if d["message_key"] in claimed]
+        futures = {
+            digest["message_key"]: executor.submit(
+                self.sender.send, build_digest_card(digest)
+            )
+            for digest in digests
+        }
+
+        posted, failed = [], []
+        for message_key, future in futures.items():
+            try:
+                future.result()
+                posted.append(message_key)
+            except Exception as e:
+                logger.error("Posting %s failed: %s", message_key, e)
+                failed.append(message_key)
+
+        self.db_models.mark_messages_posted(posted)
+        self.db_models.release_messages(failed)
+        return posted, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Post play digests to a Teams channel"
+    )
+    parser.add_argument(
+        "--webhook-url",
+        default=os.getenv("TEAMS_WEBHOOK_URL"),
+        help="Teams incoming webhook (default: $TEAMS_WEBHOOK_URL)",
+    )
+    parser.add_argument(
+        "--window-minutes", type=int, default=DEFAULT_WINDOW_MINUTES
+    )
+    parser.add_argument(
+        "--settle-minutes",
+        type=int,
+        default=DEFAULT_SETTLE_MINUTES,
+        help="minutes to wait after a window closes before posting it",
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help=(
+            "only post windows starting at or after this time (UTC; "
+            "default: a day before the latest posted window)"
+        ),
+    )
+    parser.add_argument("--workers", type=int, default=DEFAULT_POST_WORKERS)
+    args = parser.parse_args()
+    if not args.webhook_url:
+        parser.error("--webhook-url or TEAMS_WEBHOOK_URL is required")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    db_models = DatabaseModels(DatabaseConnection.for_writing())
+    sender = WebhookSender(args.webhook_url, pool_size=args.workers)
+    try:
+        db_models.initialize_database()
+        poster = TeamsPoster(
+            db_models,
+            sender,
+            window_minutes=args.window_minutes,
+            max_workers=args.workers,
+            settle_minutes=args.settle_minutes,
+        )
+        totals = poster.post_pending(since=args.since)
+        print(f"Posted {totals['posted']} digests, {totals['failed']} failed")
+    finally:
+        sender.close()
+        db_models.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+from src.analytics import ListeningAnalytics
+from src.database import DatabaseConnection, DatabaseModels
+from tests.test_profiles import make_enriched_row, make_track
+
+
+def make_play(track_id, played_at, artist="Artist"):
+    return {**make_track(track_id, played_at), "artist": artist}
+
+
+def test_rollups_follow_inserted_plays_and_enrichment():
+    """Test rollups count new plays once and enrichment when it lands."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        plays = [
+            make_play("t1", "2025-10-03T12:00:00.000Z", "Alpha"),
+            make_play("t1", "2025-10-03T12:30:00.000Z", "Alpha"),
+            make_play("t2", "2025-10-03T15:00:00.000Z", "Beta"),
+        ]
+        db_models.save_tracks_bulk(plays, user_id="alice")
+        # Plays already stored are not counted again
+        db_models.save_tracks_bulk(plays, user_id="alice")
+
+        [day] = db_models.get_play_rollups("day")
+        assert day["plays"] == 3
+        assert day["enriched_plays"] == 0
+        hours = db_models.get_play_rollups("hour")
+        assert [h["plays"] for h in hours] == [2, 1]
+
+        # Enriching t1 adds its earlier plays' popularity and genres
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("t1", 60, False, 2020, ["rock"])]
+        )
+        [day] = db_models.get_play_rollups("day")
+        assert (day["plays"], day["enriched_plays"]) == (3, 2)
+        assert day["popularity_sum"] == 120
+        assert db_models.get_top_genres() == [{"genre": "rock", "plays": 2}]
+
+        # Incremental rollups match a rebuild from the plays
+        before = db_models.get_play_rollups("hour")
+        db_models.rebuild_rollups()
+        assert db_models.get_play_rollups("hour") == before
+
+        # Re-enriching moves the plays to the new popularity, once
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("t1", 70, False, 2020, ["rock"])]
+        )
+        # A new play of an enriched track is counted in full at once
+        db_models.save_tracks_bulk(
+            [make_play("t1", "2025-10-04T09:00:00.000Z", "Alpha")],
+            user_id="alice",
+        )
+        days = db_models.get_play_rollups("day")
+        assert [d["enriched_plays"] for d in days] == [2, 1]
+        assert [d["popularity_sum"] for d in days] == [140, 70]
+        assert db_models.get_top_artists() == [
+            {"artist": "Alpha", "plays": 3},
+            {"artist": "Beta", "plays": 1},
+        ]
+        assert db_models.get_top_artists(
+            since=datetime(2025, 10, 3, 13), until=datetime(2025, 10, 4)
+        ) == [{"artist": "Beta", "plays": 1}]
+
+        with pytest.raises(ValueError):
+            db_models.get_play_rollups("fortnight")
+
+
+def test_rollups_follow_re_enrichment():
+    """Test re-enriched tracks move their plays to the new genres."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        db_models.save_tracks_bulk(
+            [
+                make_play("t1", "2025-10-03T12:00:00.000Z"),
+                make_play("t1", "2025-10-04T12:00:00.000Z"),
+            ],
+            user_id="alice",
+        )
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("t1", 60, False, 2020, ["rock"])]
+        )
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("t1", 40, False, 2020, ["pop"])]
+        )
+
+        assert db_models.get_top_genres() == [{"genre": "pop", "plays": 2}]
+        assert db_models.get_top_genres() == db_models.genre_counts()
+        days = db_models.get_play_rollups("day")
+        assert [d["popularity_sum"] for d in days] == [40, 40]
+
+        # The incremental rollups match a rebuild from the plays
+        def rollup_rows():
+            with db_models.db as conn:
+                return [
+                    conn.execute(
+                        f"SELECT * FROM {table} ORDER BY ALL"
+                    ).fetchall()
+                    for table in ("play_rollups", "genre_rollups")
+                ]
+
+        before = rollup_rows()
+        db_models.rebuild_rollups()
+        assert rollup_rows() == before
+
+
+def test_listening_analytics_builds_continuous_series():
+    """Test series fill empty periods and weeks sum daily rollups."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        db_models.save_tracks_bulk(
+            [
+                make_play("t1", "2025-10-06T08:00:00.000Z"),
+                make_play("t2", "2025-10-08T08:00:00.000Z"),
+                make_play("t3", "2025-10-14T08:00:00.000Z"),
+            ],
+            user_id="alice",
+        )
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("t1", 40, False, 2020, ["pop"])]
+        )
+        analytics = ListeningAnalytics(db_models)
+
+        daily = analytics.plays_over_time("day", user_id="alice")
+        assert len(daily) == 9  # Oct 6 through Oct 14
+        assert daily["plays"].tolist() == [1, 0, 1, 0, 0, 0, 0, 0, 1]
+        assert daily["avg_popularity"].iloc[0] == 40
+        assert daily["avg_popularity"].isna().sum() == 8
+        assert daily["listening_minutes"].iloc[0] == pytest.approx(200 / 60)
+
+        weekly = analytics.plays_over_time("week")
+        assert weekly["bucket"].dt.day.tolist() == [6, 13]
+        assert weekly["plays"].tolist() == [2, 1]
+
+        assert analytics.plays_over_time("day", user_id="bob").empty
+        assert analytics.top_genres(user_id="alice") == [
+            {"genre": "pop", "plays": 1}
+        ]
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from src.cache import ArtistCache, LRUCache, TrackCache
+from src.database import DatabaseConnection, DatabaseModels
+
+
+def test_lru_cache_evicts_and_expires():
+    """Test LRU eviction order and TTL expiry."""
+    cache = LRUCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes most recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    cache.set("old", 4, fetched_at=time.time() - 120)
+    assert cache.get("old") is None
+
+
+def test_artist_cache_reads_through_to_store():
+    """Test artists persisted by one cache are served to a fresh one."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        info = {
+            "name": "Artist 1",
+            "genres": ["rock"],
+            "popularity": 70,
+            "followers": 1000,
+        }
+        ArtistCache(store=db_models).put_many({"artist1": info})
+
+        cache = ArtistCache(store=db_models)
+        assert cache.get_many(["artist1", "artist2"]) == {"artist1": info}
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+        # Stored entries older than the TTL are stale
+        stale_cache = ArtistCache(store=db_models, ttl_seconds=60)
+        with patch("src.cache.time.time", return_value=time.time() + 120):
+            assert stale_cache.get_many(["artist1"]) == {}
+
+
+def test_track_cache_reads_through_to_store_and_refreshes():
+    """Test stored tracks are served until popularity is due a refresh."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        data = {"id": "track1", "name": "Song", "popularity": 80}
+        TrackCache(store=db_models).put_many({"track1": data})
+
+        cache = TrackCache(store=db_models, refresh_seconds=60)
+        assert cache.get_many(["track1", "track2"]) == {"track1": data}
+
+        stale_cache = TrackCache(store=db_models, refresh_seconds=60)
+        with patch("src.cache.time.time", return_value=time.time() + 120):
+            assert stale_cache.get_many(["track1"]) == {}
+
+
+def test_track_cache_coalesces_in_flight_fetches():
+    """Test an ID being fetched is handed to later callers once."""
+    cache = TrackCache()
+    owned, waiting = cache.claim(["track1", "track2"])
+    assert owned == ["track1", "track2"] and waiting == {}
+
+    owned_again, waiting = cache.claim(["track2", "track3"])
+    assert owned_again == ["track3"]
+    assert list(waiting) == ["track2"]
+
+    cache.settle(owned, {"track2": {"id": "track2"}})
+    assert waiting["track2"].result(timeout=1) == {"id": "track2"}
+    assert cache.stats()["coalesced"] == 1
+
+    # Settled IDs can be claimed again
+    assert cache.claim(["track1"])[0] == ["track1"]
+
+
+def test_concurrent_artist_cache_writes_do_not_conflict():
+    """Test batches sharing an uncached artist store it without errors."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(
+            DatabaseConnection(db_path, persistent=True)
+        )
+        db_models.initialize_database()
+        cache = ArtistCache(store=db_models)
+        artists = {
+            f"artist{i}": {
+                "name": f"Artist {i}",
+                "genres": ["rock"],
+                "popularity": i,
+                "followers": 10,
+            }
+            for i in range(20)
+        }
+
+        def put(_):
+            for _ in range(10):
+                cache.put_many(artists)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(put, range(8)))
+
+        assert len(db_models.get_artists(list(artists))) == 20
+        db_models.close()
+
+
+def test_artist_cache_keeps_store_errors_from_callers():
+    """Test a failing store write still caches the artists in memory."""
+    db_models = MagicMock()
+    db_models.save_artists_bulk.side_effect = RuntimeError("disk full")
+    db_models.get_artists.return_value = {}
+    cache = ArtistCache(store=db_models)
+
+    cache.put_many({"artist1": {"name": "Artist", "genres": []}})
+
+    assert cache.get_many(["artist1"]) == {
+        "artist1": {"name": "Artist", "genres": []}
+    }
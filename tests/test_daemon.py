@@ -0,0 +1,182 @@
+import os
+import tempfile
+import threading
+from unittest.mock import MagicMock
+
+import duckdb
+
+from src.daemon import PollSchedule, SyncDaemon
+from src.data_persistence import DataPersistenceLayer
+from src.database import DatabaseConnection, DatabaseModels
+from src.team_sync import TeamSync
+from tests.test_team_sync import make_user_client
+
+
+def test_poll_schedule_adapts_to_activity():
+    """Test active users stay on the short interval, idle ones back off."""
+    schedule = PollSchedule(["alice", "bob"], min_interval=10, max_interval=40)
+    assert schedule.due(now=0) == ["alice", "bob"]
+
+    schedule.record("alice", 3, now=0)
+    schedule.record("bob", 0, now=0)
+    assert schedule.due(now=10) == ["alice"]
+    assert schedule.due(now=20) == ["alice", "bob"]
+
+    # Idle polls double the interval up to the maximum
+    for _ in range(5):
+        schedule.record("bob", 0, now=0)
+    assert schedule.intervals["bob"] == 40
+
+    # A failed poll keeps the interval, new plays reset it
+    schedule.record("bob", None, now=0)
+    assert schedule.intervals["bob"] == 40
+    schedule.record("bob", 1, now=0)
+    assert schedule.intervals["bob"] == 10
+    assert schedule.seconds_until_due(now=5) == 5
+
+
+def test_sync_daemon_coalesces_enrichment_across_cycles():
+    """Test due users are polled and enrichment waits for a flush."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(
+            DatabaseConnection(db_path, persistent=True)
+        )
+        shared_client = MagicMock()
+        shared_client.get_track_enriched_data.return_value = []
+        shared_client.pop_failed_track_ids.return_value = {}
+        persistence = DataPersistenceLayer(shared_client, db_models)
+
+        clients = {
+            "alice": make_user_client("alice"),
+            "bob": make_user_client("bob"),
+        }
+        daemon = SyncDaemon(
+            TeamSync(persistence, clients),
+            PollSchedule(min_interval=10, max_interval=40),
+            max_enrichment_delay=8,
+        )
+
+        assert daemon.run_once(now=0) == {"alice": 2, "bob": 2}
+        # Fewer than 50 tracks queued: nothing is enriched yet
+        shared_client.get_track_enriched_data.assert_not_called()
+        assert daemon.run_once(now=5) == {}
+
+        # Once the queue is overdue it is flushed in one call
+        daemon.run_once(now=8)
+        shared_client.get_track_enriched_data.assert_called_once()
+        track_ids = shared_client.get_track_enriched_data.call_args.args[0]
+        assert sorted(track_ids) == [
+            "alice_track",
+            "bob_track",
+            "shared_track",
+        ]
+        assert set(db_models.get_user_profiles()) == {"alice", "bob"}
+        persistence.close()
+
+
+def test_sync_daemon_stops_gracefully():
+    """Test stop() ends run() and queued enrichment is flushed."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(
+            DatabaseConnection(db_path, persistent=True)
+        )
+        shared_client = MagicMock()
+        shared_client.get_track_enriched_data.return_value = []
+        shared_client.pop_failed_track_ids.return_value = {}
+        persistence = DataPersistenceLayer(shared_client, db_models)
+
+        daemon = SyncDaemon(
+            TeamSync(persistence, {"alice": make_user_client("alice")}),
+            PollSchedule(min_interval=60),
+        )
+        polled = threading.Event()
+        run_once = daemon.run_once
+
+        def recording_run_once(now=None):
+            new_plays = run_once(now)
+            polled.set()
+            return new_plays
+
+        daemon.run_once = recording_run_once
+        thread = threading.Thread(target=daemon.run)
+        thread.start()
+        assert polled.wait(5)
+        daemon.stop()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        shared_client.get_track_enriched_data.assert_called_once()
+        persistence.close()
+
+
+def test_sync_daemon_releases_database_between_cycles():
+    """Test readers can open the database while the daemon is idle."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(
+            DatabaseConnection(db_path, persistent=True)
+        )
+        shared_client = MagicMock()
+        shared_client.get_track_enriched_data.return_value = []
+        shared_client.pop_failed_track_ids.return_value = {}
+        persistence = DataPersistenceLayer(shared_client, db_models)
+        daemon = SyncDaemon(
+            TeamSync(persistence, {"alice": make_user_client("alice")})
+        )
+        read_while_idle = []
+
+        def seconds_until_due(now=None):
+            reader = DatabaseModels(
+                DatabaseConnection.for_reading(db_path, lock_timeout=0)
+            )
+            read_while_idle.append(len(reader.get_recent_tracks(limit=10)))
+            daemon.stop()
+            return 0
+
+        daemon.schedule.seconds_until_due = seconds_until_due
+        daemon.run()
+
+        assert read_while_idle == [2]
+        # The daemon reconnects for its next cycle
+        shared_client.get_track_enriched_data.assert_called_once()
+        assert len(db_models.get_recent_tracks(limit=10)) == 2
+        persistence.close()
+
+
+def test_sync_daemon_survives_failed_cycle():
+    """Test a cycle that raises is logged and the next one retries."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(
+            DatabaseConnection(db_path, persistent=True)
+        )
+        shared_client = MagicMock()
+        shared_client.get_track_enriched_data.return_value = []
+        shared_client.pop_failed_track_ids.return_value = {}
+        persistence = DataPersistenceLayer(shared_client, db_models)
+        daemon = SyncDaemon(
+            TeamSync(persistence, {"alice": make_user_client("alice")}),
+            PollSchedule(min_interval=0.01),
+        )
+        save_plays = persistence.save_plays
+        calls = []
+
+        def flaky_save_plays(tracks, user_id):
+            calls.append(user_id)
+            if len(calls) == 1:
+                raise duckdb.IOException("Conflicting lock is held")
+            saved = save_plays(tracks, user_id)
+            daemon.stop()
+            return saved
+
+        persistence.save_plays = flaky_save_plays
+        thread = threading.Thread(target=daemon.run)
+        thread.start()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert calls == ["alice", "alice"]
+        assert len(db_models.get_recent_tracks(limit=10)) == 2
+        persistence.close()
@@ -0,0 +1,224 @@
+import os
+import tempfile
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from src.data_persistence import DataPersistenceLayer
+from src.database import DatabaseConnection, DatabaseModels
+from src.database.models import DEAD_LETTER_THRESHOLD
+
+
+def make_enriched(track_id, genres):
+    return {
+        "id": track_id,
+        "name": f"Song {track_id}",
+        "popularity": 70,
+        "duration_ms": 180000,
+        "explicit": False,
+        "release_date": "2023-01-15",
+        "album_type": "album",
+        "artists": [
+            {
+                "id": f"artist_{track_id}",
+                "name": "Artist",
+                "genres": genres,
+                "popularity": 60,
+                "followers": 1000,
+            }
+        ],
+    }
+
+
+def make_spotify_client():
+    spotify_client = MagicMock()
+    spotify_client.pop_failed_track_ids.return_value = {}
+    return spotify_client
+
+
+def test_sync_recent_tracks_with_enriched_data():
+    """Test syncing saves tracks and enriched data in bulk."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+
+        spotify_client = make_spotify_client()
+        spotify_client.get_recent_tracks.return_value = [
+            {
+                "id": "track1",
+                "name": "Song track1",
+                "artist": "Artist",
+                "album": "Album",
+                "played_at": "2025-10-03T12:01:00.000Z",
+            },
+            {
+                "id": "track2",
+                "name": "Song track2",
+                "artist": "Artist",
+                "album": "Album",
+                "played_at": "2025-10-03T12:00:00.000Z",
+            },
+        ]
+        spotify_client.get_track_enriched_data.return_value = [
+            make_enriched("track1", ["rock"]),
+            make_enriched("track2", ["pop", "dance"]),
+        ]
+
+        persistence = DataPersistenceLayer(spotify_client, db_models)
+        tracks = persistence.sync_recent_tracks_with_enriched_data(limit=7)
+
+        assert [track["id"] for track in tracks] == ["track1", "track2"]
+        assert tracks[0]["popularity"] == 70
+        assert tracks[0]["artist_popularity"] == 60
+        assert db_models.get_tracks_without_enriched_data() == []
+        persistence.close()
+
+
+def test_sync_is_incremental_after_first_run():
+    """Test later syncs only request plays after the stored high-water mark."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+
+        spotify_client = make_spotify_client()
+        spotify_client.get_recent_tracks.return_value = [
+            {
+                "id": "track1",
+                "name": "Song track1",
+                "artist": "Artist",
+                "album": "Album",
+                "played_at": "2025-10-03T12:00:00.000Z",
+            }
+        ]
+        spotify_client.get_track_enriched_data.return_value = [
+            make_enriched("track1", ["rock"])
+        ]
+        spotify_client.get_tracks_played_after.return_value = []
+
+        persistence = DataPersistenceLayer(spotify_client, db_models)
+        persistence.sync_recent_tracks_with_enriched_data()
+        tracks = persistence.sync_recent_tracks_with_enriched_data()
+
+        spotify_client.get_recent_tracks.assert_called_once()
+        spotify_client.get_tracks_played_after.assert_called_once_with(
+            datetime(2025, 10, 3, 12, 0)
+        )
+        spotify_client.get_track_enriched_data.assert_called_once()
+        assert [track["id"] for track in tracks] == ["track1"]
+        persistence.close()
+
+
+def test_enrichment_failures_are_dead_lettered():
+    """Test tracks failing repeatedly stop being retried in backfills."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+
+        def iter_track_enriched_data(track_ids, max_workers=None):
+            assert list(track_ids) == ["bad"]
+            yield []
+
+        spotify_client = make_spotify_client()
+        spotify_client.iter_track_enriched_data.side_effect = (
+            iter_track_enriched_data
+        )
+        spotify_client.pop_failed_track_ids.return_value = {
+            "bad": "400 invalid id"
+        }
+
+        persistence = DataPersistenceLayer(spotify_client, db_models)
+        db_models.save_track(
+            "bad", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+        )
+
+        for _ in range(DEAD_LETTER_THRESHOLD):
+            assert db_models.get_tracks_without_enriched_data() == ["bad"]
+            persistence.ensure_enriched_data_for_all_tracks()
+
+        assert db_models.get_tracks_without_enriched_data() == []
+        assert db_models.get_dead_letter_track_ids() == ["bad"]
+        assert db_models.get_tracks_without_enriched_data(
+            max_failures=None
+        ) == ["bad"]
+        persistence.close()
+
+
+def test_ensure_enriched_data_streams_and_commits_per_batch():
+    """Test backfills page IDs lazily and commit each batch as it lands."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        spotify_client = make_spotify_client()
+        persistence = DataPersistenceLayer(spotify_client, db_models)
+
+        db_models.save_tracks_bulk(
+            [
+                {
+                    "id": f"track{i:03d}",
+                    "name": "Song",
+                    "artist": "Artist",
+                    "album": "Album",
+                    "played_at": "2025-10-03T12:00:00.000Z",
+                }
+                for i in range(120)
+            ]
+        )
+
+        def iter_track_enriched_data(track_ids, max_workers=None):
+            # Batches must be committed before the next one is requested
+            track_ids = iter(track_ids)
+            for _ in range(3):
+                batch = [tid for _, tid in zip(range(50), track_ids)]
+                yield [make_enriched(tid, ["rock"]) for tid in batch]
+                assert db_models.missing_enrichment(batch) == []
+
+        spotify_client.iter_track_enriched_data.side_effect = (
+            iter_track_enriched_data
+        )
+        persistence.ensure_enriched_data_for_all_tracks()
+
+        assert db_models.count_tracks_without_enriched_data() == 0
+        persistence.close()
+
+
+def test_process_enriched_batch_aggregates_artists():
+    """Test artist stats and unique genres are computed per track."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        persistence = DataPersistenceLayer(make_spotify_client(), db_models)
+
+        track1 = make_enriched("track1", ["rock", "pop"])
+        track1["artists"].append(
+            {
+                "id": "unknown_artist",
+                "name": "Unknown",
+                "genres": ["rock", "indie"],
+                "popularity": 0,
+                "followers": 500,
+            }
+        )
+        track2 = make_enriched("track2", [])
+        track2["artists"] = []
+        del track2["explicit"]
+
+        frame = persistence._process_enriched_batch([track1, None, track2])
+        rows = frame.set_index("track_id").to_dict("index")
+
+        # The zero-popularity artist is left out of the average
+        assert rows["track1"]["artist_popularity"] == 60
+        assert rows["track1"]["artist_followers"] == 1500
+        assert rows["track1"]["genres"] == ["rock", "pop", "indie"]
+        assert rows["track2"]["artist_popularity"] == 0
+        assert rows["track2"]["artist_followers"] == 0
+        assert rows["track2"]["genres"] == []
+        assert rows["track2"]["explicit"] is False
+
+        for track_id in ("track1", "track2"):
+            db_models.save_track(
+                track_id, f"Song {track_id}", "Artist", "Album", datetime.now()
+            )
+        assert db_models.save_enriched_track_data_bulk(frame) == 2
+        assert [t["id"] for t in db_models.tracks_by_genre("indie")] == [
+            "track1"
+        ]
+        persistence.close()
@@ -1,12 +1,21 @@
+import json
 import os
+import subprocess
+import sys
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import duckdb
+import pandas as pd
+import pytest
 
 from src.database import DatabaseConnection, DatabaseModels
+from src.database.models import _fetch, _to_arrow_reader
 
 # from unittest.mock import MagicMock, patch
 
-# import pytest
-
 
 def test_database_connection():
     """Test database connection creation and context manager."""
@@ -218,3 +227,621 @@ def test_tracks_without_enriched_data():
         assert len(missing) == 1
         assert "without_enriched_data" in missing
         assert "with_enriched_data" not in missing
+
+
+def test_persistent_connection_reuses_cursor():
+    """Test persistent mode keeps the connection open between calls."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_conn = DatabaseConnection(db_path, persistent=True)
+        db_models = DatabaseModels(db_conn)
+        db_models.initialize_database()
+
+        db_models.save_track(
+            "test123",
+            "Test Song",
+            "Test Artist",
+            "Test Album",
+            "2025-10-03T12:00:00.000Z",
+        )
+
+        # Same thread gets the same cursor and the connection stays open
+        with db_conn as first, db_conn as second:
+            assert first is second
+        assert db_conn.connection is not None
+        assert db_models.track_exists("test123") is True
+
+        db_models.close()
+        assert db_conn.connection is None
+
+
+def test_persistent_connection_cursor_per_thread():
+    """Test each thread gets its own cursor on the shared connection."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_conn = DatabaseConnection(db_path, persistent=True)
+        db_models = DatabaseModels(db_conn)
+        db_models.initialize_database()
+
+        cursors = []
+
+        def save(i):
+            cursors.append(db_conn.cursor())
+            db_models.save_track(
+                f"test{i}",
+                f"Song {i}",
+                "Artist",
+                "Album",
+                f"2025-10-03T12:0{i}:00.000Z",
+            )
+
+        threads = [threading.Thread(target=save, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(cursor) for cursor in cursors}) == 4
+        assert len(db_models.get_recent_tracks(limit=10)) == 4
+        db_conn.close()
+
+
+def test_save_tracks_bulk():
+    """Test bulk track ingestion from dicts and DataFrames."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        tracks = [
+            {
+                "id": f"test{i}",
+                "name": f"Song {i}",
+                "artist": "Artist",
+                "album": "Album",
+                "played_at": f"2025-10-03T12:0{i}:00.000Z",
+            }
+            for i in range(3)
+        ]
+        # A replay of test0 within the same batch is a separate play
+        tracks.append({**tracks[0], "played_at": "2025-10-03T13:00:00.000Z"})
+
+        assert db_models.save_tracks_bulk(tracks) == 4
+        # Plays already stored are not counted again
+        assert db_models.save_tracks_bulk(pd.DataFrame(tracks[1:3])) == 0
+        assert db_models.save_tracks_bulk([]) == 0
+
+        recent = db_models.get_recent_tracks(limit=10)
+        assert [track["id"] for track in recent] == [
+            "test0",
+            "test2",
+            "test1",
+            "test0",
+        ]
+
+
+def test_save_enriched_track_data_bulk():
+    """Test bulk enriched data ingestion in a single transaction."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        db_models.save_tracks_bulk(
+            [
+                {
+                    "id": f"test{i}",
+                    "name": f"Song {i}",
+                    "artist": "Artist",
+                    "album": "Album",
+                    "played_at": "2025-10-03T12:00:00.000Z",
+                }
+                for i in range(2)
+            ]
+        )
+        rows = [
+            {
+                "track_id": "test0",
+                "popularity": 75,
+                "duration_ms": 180000,
+                "explicit": False,
+                "release_date": "2023-01-15",
+                "album_type": "album",
+                "genres": ["rock", "alternative rock"],
+                "artist_popularity": 68.5,
+                "artist_followers": 1000000,
+            },
+            {"track_id": "test1", "popularity": 50},
+        ]
+
+        # Repeated and missing IDs are not counted as saved
+        rows_with_repeats = rows + [rows[1], {"track_id": None}]
+        assert db_models.save_enriched_track_data_bulk(rows_with_repeats) == 2
+        assert db_models.get_tracks_without_enriched_data() == []
+
+        tracks_by_id = {
+            track["id"]: track for track in db_models.get_recent_tracks()
+        }
+        assert json.loads(tracks_by_id["test0"]["genres"]) == [
+            "rock",
+            "alternative rock",
+        ]
+        assert tracks_by_id["test1"]["popularity"] == 50
+        assert tracks_by_id["test1"]["duration_ms"] is None
+
+
+def test_missing_enrichment():
+    """Test set-based lookup of tracks that still need enriched data."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        db_models.save_track(
+            "enriched", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+        )
+        db_models.save_enriched_track_data("enriched", {"popularity": 80})
+
+        missing = db_models.missing_enrichment(
+            ["new2", "enriched", None, "new1", "new2"]
+        )
+        assert missing == ["new2", "new1"]
+        assert db_models.missing_enrichment([]) == []
+
+
+def test_missing_enrichment_cache_skips_database():
+    """Test the known-enriched cache answers without querying DuckDB."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_conn = DatabaseConnection(db_path)
+        db_models = DatabaseModels(db_conn, cache_enriched_ids=True)
+        db_models.initialize_database()
+
+        db_models.save_track(
+            "track1", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+        )
+        db_models.save_enriched_track_data_bulk(
+            [{"track_id": "track1", "popularity": 80}]
+        )
+
+        # Remove the row behind the cache's back: a cached answer proves
+        # the lookup never reached the database
+        with db_conn as conn:
+            conn.execute("DELETE FROM enriched_track_data")
+
+        assert db_models.missing_enrichment(["track1", "track2"]) == ["track2"]
+        assert db_models.enriched_track_data_exist("track1") is True
+
+
+def test_plays_keep_listening_history():
+    """Test replays are appended to plays instead of overwriting."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_conn = DatabaseConnection(db_path)
+        db_models = DatabaseModels(db_conn)
+        db_models.initialize_database()
+
+        for played_at in (
+            "2025-10-03T12:00:00.000Z",
+            "2025-10-03T13:00:00.000Z",
+            "2025-10-03T13:00:00.000Z",  # Duplicate play is ignored
+        ):
+            db_models.save_track(
+                "test123", "Test Song", "Test Artist", "Test Album", played_at
+            )
+        db_models.save_track(
+            "test123",
+            "Test Song",
+            "Test Artist",
+            "Test Album",
+            "2025-10-03T13:00:00.000Z",
+            user_id="alice",
+        )
+
+        with db_conn as conn:
+            play_count = conn.execute("SELECT count(*) FROM plays").fetchone()
+            latest = conn.execute(
+                "SELECT played_at FROM tracks WHERE id = 'test123'"
+            ).fetchone()
+        assert play_count[0] == 3
+        assert str(latest[0]) == "2025-10-03 13:00:00"
+
+        assert len(db_models.get_recent_tracks(limit=10)) == 3
+        alice_tracks = db_models.get_recent_tracks(limit=10, user_id="alice")
+        assert len(alice_tracks) == 1
+        assert alice_tracks[0]["user_id"] == "alice"
+
+
+def test_plays_seeded_from_existing_tracks():
+    """Test databases created before plays existed get their history."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_conn = DatabaseConnection(db_path)
+        with db_conn as conn:
+            conn.execute(
+                """
+                CREATE TABLE tracks (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    artist TEXT,
+                    album TEXT,
+                    played_at TIMESTAMP,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            conn.execute(
+                """
+                INSERT INTO tracks (id, name, artist, album, played_at)
+                VALUES ('old', 'Old Song', 'Artist', 'Album',
+                        '2025-10-01T08:00:00.000Z')
+            """
+            )
+
+        db_models = DatabaseModels(db_conn)
+        db_models.initialize_database()
+        db_models.initialize_database()  # Seeding happens only once
+
+        recent = db_models.get_recent_tracks(limit=10)
+        assert [track["id"] for track in recent] == ["old"]
+
+
+def test_iter_tracks_without_enriched_data_pages_lazily():
+    """Test keyset paging survives rows being enriched mid-iteration."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        db_models.save_tracks_bulk(
+            [
+                {
+                    "id": f"track{i}",
+                    "name": "Song",
+                    "artist": "Artist",
+                    "album": "Album",
+                    "played_at": "2025-10-03T12:00:00.000Z",
+                }
+                for i in range(7)
+            ]
+        )
+
+        seen = []
+        for track_id in db_models.iter_tracks_without_enriched_data(
+            page_size=2
+        ):
+            seen.append(track_id)
+            db_models.save_enriched_track_data(track_id, {"popularity": 1})
+
+        assert seen == [f"track{i}" for i in range(7)]
+        assert db_models.count_tracks_without_enriched_data() == 0
+
+
+def test_genre_queries_use_bridge_table():
+    """Test genre counts over plays and tracks-by-genre lookups."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        for track_id, played_at in (
+            ("rock1", "2025-10-01T12:00:00.000Z"),
+            ("rock1", "2025-10-03T12:00:00.000Z"),
+            ("pop1", "2025-10-03T13:00:00.000Z"),
+        ):
+            db_models.save_track(
+                track_id, "Song", "Artist", "Album", played_at
+            )
+        db_models.save_enriched_track_data(
+            "rock1", {"popularity": 60, "genres": ["rock", "indie"]}
+        )
+        db_models.save_enriched_track_data_bulk(
+            [{"track_id": "pop1", "popularity": 90, "genres": ["pop"]}]
+        )
+
+        assert db_models.genre_counts() == [
+            {"genre": "indie", "plays": 2},
+            {"genre": "rock", "plays": 2},
+            {"genre": "pop", "plays": 1},
+        ]
+        recent = db_models.genre_counts(since="2025-10-02", limit=2)
+        assert recent == [
+            {"genre": "indie", "plays": 1},
+            {"genre": "pop", "plays": 1},
+        ]
+
+        # Re-enrichment replaces the track's genres
+        db_models.save_enriched_track_data(
+            "rock1", {"popularity": 65, "genres": ["rock"]}
+        )
+        assert [t["id"] for t in db_models.tracks_by_genre("rock")] == [
+            "rock1"
+        ]
+        assert db_models.tracks_by_genre("indie") == []
+
+
+def test_track_genres_seeded_from_json_genres():
+    """Test databases with only JSON genres get the bridge table filled."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_conn = DatabaseConnection(db_path)
+        db_models = DatabaseModels(db_conn)
+        db_models.initialize_database()
+        db_models.save_track(
+            "test123", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+        )
+        db_models.save_enriched_track_data("test123", {"genres": ["jazz"]})
+
+        # Simulate a database written before the bridge table existed
+        with db_conn as conn:
+            conn.execute("DROP TABLE track_genres")
+            conn.execute("DROP TABLE genres")
+
+        db_models.initialize_database()
+        assert db_models.genre_counts() == [{"genre": "jazz", "plays": 1}]
+
+
+def test_read_methods_return_columnar_results():
+    """Test reads as DataFrames and batched exports match the dict API."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+        db_models.save_tracks_bulk(
+            [
+                {
+                    "id": f"track{i}",
+                    "name": f"Song {i}",
+                    "artist": "Artist",
+                    "album": "Album",
+                    "played_at": f"2025-10-03T12:{i:02d}:00.000Z",
+                }
+                for i in range(5)
+            ]
+        )
+
+        frame = db_models.get_recent_tracks(limit=3, output="pandas")
+        assert isinstance(frame, pd.DataFrame)
+        rows = db_models.get_recent_tracks(limit=3)
+        assert list(frame.columns) == list(rows[0])
+        assert frame["id"].tolist() == [row["id"] for row in rows]
+        assert frame["played_at"].tolist() == [
+            row["played_at"] for row in rows
+        ]
+
+        chunks = list(
+            db_models.fetch_record_batches(
+                "SELECT * FROM plays ORDER BY played_at", output="pandas"
+            )
+        )
+        assert sum(len(chunk) for chunk in chunks) == 5
+
+        with pytest.raises(ValueError):
+            db_models.genre_counts(output="rows")
+
+
+def test_read_methods_return_arrow():
+    """Test Arrow tables and record batches when pyarrow is installed."""
+    pytest.importorskip("pyarrow")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+        db_models.save_track(
+            "track1", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+        )
+
+        table = db_models.get_recent_tracks(output="arrow")
+        assert table.column("id").to_pylist() == ["track1"]
+
+        batches = list(
+            db_models.fetch_record_batches("SELECT * FROM plays", batch_size=1)
+        )
+        assert sum(batch.num_rows for batch in batches) == 1
+
+
+def test_arrow_output_falls_back_on_older_duckdb():
+    """Test Arrow reads use fetch_arrow_table where to_* is missing."""
+    result = MagicMock(spec=["fetch_arrow_table", "fetch_record_batch"])
+    assert _fetch(result, "arrow") is result.fetch_arrow_table.return_value
+    assert (
+        _to_arrow_reader(result, 10) is result.fetch_record_batch.return_value
+    )
+    result.fetch_record_batch.assert_called_once_with(10)
+
+
+def test_archive_plays_to_parquet():
+    """Test archived plays stay readable and can be attached elsewhere."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        archive_dir = os.path.join(temp_dir, "archive")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        for user_id, track_id, played_at in (
+            ("alice", "rock1", "2025-08-15T12:00:00.000Z"),
+            ("alice", "rock1", "2025-09-15T12:00:00.000Z"),
+            ("1234", "pop1", "2025-09-20T12:00:00.000Z"),
+            ("alice", "pop1", "2025-10-03T12:00:00.000Z"),
+        ):
+            db_models.save_track(
+                track_id, "Song", "Artist", "Album", played_at, user_id
+            )
+        db_models.save_enriched_track_data_bulk(
+            [
+                {"track_id": "rock1", "genres": ["rock"]},
+                {"track_id": "pop1", "genres": ["pop"]},
+            ]
+        )
+        recent = db_models.get_recent_tracks(limit=10)
+        genres = db_models.genre_counts()
+
+        assert db_models.archive_plays(archive_dir, before="2025-10-01") == 3
+        assert os.path.isdir(
+            os.path.join(
+                archive_dir, "plays", "user_id=alice", "month=2025-08"
+            )
+        )
+        with db_models.db as conn:
+            assert conn.execute("SELECT count(*) FROM plays").fetchone() == (
+                1,
+            )
+
+        # Reads cover hot and archived plays alike
+        assert db_models.get_recent_tracks(limit=10) == recent
+        assert db_models.genre_counts() == genres
+        assert db_models.get_latest_played_at("1234") is not None
+
+        # Re-initializing must not re-seed archived plays from tracks
+        db_models.initialize_database()
+        assert db_models.get_recent_tracks(limit=10) == recent
+
+        # A fresh database can attach the archive as external data
+        other = DatabaseModels(
+            DatabaseConnection(os.path.join(temp_dir, "other.duckdb"))
+        )
+        other.initialize_database()
+        other.attach_parquet_archive(archive_dir)
+        assert other.get_recent_tracks(limit=10) == recent[1:]
+        assert other.genre_counts(user_id="1234") == [
+            {"genre": "pop", "plays": 1}
+        ]
+
+
+def test_export_parquet_skips_plays_already_exported():
+    """Test exporting the same plays again does not duplicate them."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        archive_dir = os.path.join(temp_dir, "archive")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+        db_models.save_track(
+            "track1", "Song", "Artist", "Album", "2025-09-15T12:00:00.000Z"
+        )
+
+        assert db_models.export_parquet(archive_dir) == 1
+        assert db_models.export_parquet(archive_dir) == 0
+        db_models.save_track(
+            "track2", "Song", "Artist", "Album", "2025-09-16T12:00:00.000Z"
+        )
+        assert db_models.export_parquet(archive_dir) == 1
+        # Plays already exported are still moved out of the database
+        assert db_models.archive_plays(archive_dir, "2025-10-01") == 2
+        assert len(db_models.get_recent_tracks(limit=10)) == 2
+
+        other = DatabaseModels(
+            DatabaseConnection(os.path.join(temp_dir, "other.duckdb"))
+        )
+        other.initialize_database()
+        other.attach_parquet_archive(archive_dir)
+        assert [t["id"] for t in other.get_recent_tracks(limit=10)] == [
+            "track2",
+            "track1",
+        ]
+
+
+def test_in_memory_database_with_settings():
+    """Test in-memory databases keep data and apply DuckDB settings."""
+    db_conn = DatabaseConnection.in_memory(threads=2, memory_limit="256MB")
+    assert db_conn.persistent
+    db_models = DatabaseModels(db_conn)
+    db_models.initialize_database()
+
+    db_models.save_track(
+        "track1", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+    )
+    assert [t["id"] for t in db_models.get_recent_tracks()] == ["track1"]
+    with db_conn as conn:
+        assert conn.execute(
+            "SELECT current_setting('threads')"
+        ).fetchone() == (2,)
+
+    with pytest.raises(ValueError):
+        DatabaseConnection.in_memory(read_only=True)
+    db_models.close()
+
+
+def test_read_only_connection_reads_without_writing():
+    """Test a read-only connection sees the writer's data and no more."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        writer = DatabaseModels(DatabaseConnection(db_path))
+        writer.initialize_database()
+        writer.save_track(
+            "track1", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+        )
+
+        reader = DatabaseModels(DatabaseConnection.for_reading(db_path))
+        reader.initialize_database()  # No-op for readers
+        assert [t["id"] for t in reader.get_recent_tracks()] == ["track1"]
+        with pytest.raises(duckdb.Error):
+            reader.save_track(
+                "track2",
+                "Song",
+                "Artist",
+                "Album",
+                "2025-10-03T12:01:00.000Z",
+            )
+
+        # Readers never create missing database files or directories
+        missing = os.path.join(temp_dir, "missing", "test.duckdb")
+        with pytest.raises(duckdb.Error):
+            with DatabaseConnection.for_reading(missing, lock_timeout=0):
+                pass
+        assert not os.path.exists(os.path.dirname(missing))
+
+
+def test_writer_waits_for_reader_in_another_process():
+    """Test a writer reconnects once another process's reader closes."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        DatabaseModels(DatabaseConnection(db_path)).initialize_database()
+
+        reader = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "import sys, time, duckdb\n"
+                "conn = duckdb.connect(sys.argv[1], read_only=True)\n"
+                "print('open', flush=True)\n"
+                "time.sleep(1)\n"
+                "conn.close()\n",
+                db_path,
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            assert reader.stdout.readline().strip() == "open"
+            with pytest.raises(duckdb.IOException, match="lock"):
+                DatabaseConnection(db_path, persistent=True).connect()
+
+            writer = DatabaseModels(DatabaseConnection.for_writing(db_path))
+            writer.save_track(
+                "track1", "Song", "Artist", "Album", "2025-10-03T12:00:00Z"
+            )
+            assert writer.track_exists("track1")
+            writer.close()
+        finally:
+            reader.wait(timeout=10)
+            reader.stdout.close()
+
+
+def test_read_only_connection_is_shared_by_threads():
+    """Test concurrent reads through one reader each get a connection."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        writer = DatabaseModels(DatabaseConnection(db_path))
+        writer.initialize_database()
+        writer.save_track(
+            "track1", "Song", "Artist", "Album", "2025-10-03T12:00:00.000Z"
+        )
+
+        reader = DatabaseModels(DatabaseConnection.for_reading(db_path))
+
+        def read(_):
+            return [len(reader.get_recent_tracks()) for _ in range(50)]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            counts = [n for ns in executor.map(read, range(8)) for n in ns]
+        assert counts == [1] * 400
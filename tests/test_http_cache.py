@@ -0,0 +1,93 @@
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.http_cache import build_session
+
+
+@contextmanager
+def catalog_server(cache_control="max-age=60"):
+    """
+    Run a local stand-in for Spotify's catalog API.
+
+    Every response carries an ETag; requests revalidating it get a 304.
+    Yields the base URL and the list of request paths received.
+    """
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            received.append(self.path)
+            etag = '"v1"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({"path": self.path}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", received
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fresh_catalog_responses_skip_the_network():
+    """Test cached catalog responses are reused across sessions."""
+    with (
+        tempfile.TemporaryDirectory() as temp_dir,
+        catalog_server() as (base_url, received),
+    ):
+        session = build_session(cache_dir=temp_dir)
+        url = f"{base_url}/v1/tracks/"
+        first = session.get(url, params={"ids": "a,b"})
+        second = session.get(url, params={"ids": "a,b"})
+        assert first.json() == second.json()
+        assert len(received) == 1
+
+        # Other IDs and uncached endpoints still go to the server
+        session.get(url, params={"ids": "c"})
+        session.get(f"{base_url}/v1/me/player/recently-played")
+        assert len(received) == 3
+        assert session.stats() == {"hits": 1, "revalidations": 0, "misses": 2}
+
+        # A new session (e.g. the next run) reads the cache from disk
+        other = build_session(cache_dir=temp_dir)
+        assert other.get(url, params={"ids": "a,b"}).json() == first.json()
+        assert len(received) == 3
+
+
+def test_stale_catalog_responses_are_revalidated():
+    """Test stale entries are revalidated with their ETag."""
+    with (
+        tempfile.TemporaryDirectory() as temp_dir,
+        catalog_server(cache_control="no-cache") as (base_url, received),
+    ):
+        session = build_session(cache_dir=temp_dir)
+        url = f"{base_url}/v1/artists/?ids=x"
+        first = session.get(url)
+        second = session.get(url)
+
+        assert len(received) == 2
+        assert second.status_code == 200
+        assert second.json() == first.json()
+        assert session.stats()["revalidations"] == 1
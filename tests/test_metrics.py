@@ -0,0 +1,146 @@
+import os
+import tempfile
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+from spotipy.exceptions import SpotifyException
+
+from src.data_persistence import DataPersistenceLayer
+from src.database import DatabaseConnection, DatabaseModels
+from src.metrics import MemorySink, Metrics, PrometheusSink
+from src.retry import RetryPolicy
+from src.spotify_client import SpotifyClient
+from tests.test_spotify_client import make_play_item
+
+
+def test_spans_nest_and_record_errors():
+    """Test spans carry their parent path and the exception raised."""
+    sink = MemorySink()
+    metrics = Metrics([sink])
+
+    with metrics.span("sync", user_id="alice"):
+        metrics.count("spotify.api_calls", endpoint="tracks")
+        with pytest.raises(ValueError):
+            with metrics.span("save"):
+                raise ValueError("boom")
+
+    [counter] = sink.find("spotify.api_calls")
+    assert counter.span == "sync"
+    [save] = sink.find("save", "span")
+    assert save.span == "sync"
+    assert save.labels == {"error": "ValueError"}
+    [sync] = sink.find("sync", "span", user_id="alice")
+    assert sync.span is None
+    assert sync.value >= save.value
+
+
+def test_prometheus_sink_renders_and_serves_metrics():
+    """Test counters and histograms are exposed in text format."""
+    sink = PrometheusSink()
+    metrics = Metrics([sink])
+    metrics.count("db.rows_written", 3, table="plays")
+    metrics.count("db.rows_written", 2, table="plays")
+    metrics.observe("spotify.batch_size", 50)
+    with metrics.span("sync"):
+        pass
+
+    text = sink.render()
+    assert 'team_tracks_db_rows_written_total{table="plays"} 5' in text
+    assert 'team_tracks_spotify_batch_size_bucket{le="25"} 0' in text
+    assert 'team_tracks_spotify_batch_size_bucket{le="50"} 1' in text
+    assert "team_tracks_spotify_batch_size_count 1" in text
+    assert 'team_tracks_span_seconds_count{stage="sync"} 1' in text
+
+    server = sink.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.read().decode() == sink.render()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_sync_reports_api_calls_cache_hits_and_rows_written():
+    """Test the sync pipeline reports its stages and counters."""
+    sp = MagicMock()
+    sp.current_user_recently_played.return_value = {
+        "items": [make_play_item("track1", "2025-10-03T12:00:00.000Z")]
+    }
+    calls = []
+
+    def tracks(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise SpotifyException(503, -1, "Service unavailable")
+        return {
+            "tracks": [
+                {
+                    "id": "track1",
+                    "name": "Song track1",
+                    "album": {},
+                    "artists": [{"id": "artist1", "name": "Test Artist"}],
+                }
+            ]
+        }
+
+    sp.tracks.side_effect = tracks
+    sp.artists.return_value = {
+        "artists": [{"id": "artist1", "genres": ["pop"], "popularity": 50}]
+    }
+
+    sink = MemorySink()
+    metrics = Metrics([sink])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        client = SpotifyClient(
+            spotify=sp,
+            requests_session=MagicMock(),
+            retry_policy=RetryPolicy(base_delay=0),
+            metrics=metrics,
+        )
+        persistence = DataPersistenceLayer(
+            client,
+            DatabaseModels(DatabaseConnection(db_path), metrics=metrics),
+            metrics=metrics,
+        )
+        persistence.sync_recent_tracks_with_enriched_data()
+
+        stages = {(e.span, e.name) for e in sink.events if e.kind == "span"}
+        assert {
+            (None, "sync"),
+            ("sync", "fetch"),
+            ("sync", "save"),
+            ("sync/enrich", "fetch"),
+            ("sync/enrich", "save"),
+            ("sync", "profiles"),
+        } <= stages
+        assert sink.total("spotify.api_calls") == 4
+        assert sink.total("spotify.retries") == 1
+        assert sink.total("cache.misses", cache="track") == 1
+        assert sink.total("db.rows_written", table="plays") == 1
+        assert sink.total("db.rows_written", table="enriched_track_data") == 1
+        assert sink.find("db.statement_seconds", operation="save_tracks_bulk")
+        # Per-user labels would make a series per team member
+        assert all(not e.labels for e in sink.find("fetch", "span"))
+
+        # Enriching the track again is served from the track cache
+        client.get_track_enriched_data(["track1"])
+        assert sink.total("cache.hits", cache="track") == 1
+        assert sink.total("spotify.api_calls") == 4
+
+        # Plays saved again are not counted as written
+        persistence.save_plays(
+            [
+                {
+                    "id": "track1",
+                    "name": "Song track1",
+                    "artist": "Test Artist",
+                    "album": "Test Album",
+                    "played_at": "2025-10-03T12:00:00.000Z",
+                }
+            ]
+        )
+        assert sink.total("db.rows_written", table="plays") == 1
+        persistence.close()
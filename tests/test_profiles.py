@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+import pytest
+
+from src.database import DatabaseConnection, DatabaseModels
+from src.profiles import ProfileEngine
+
+
+def make_track(track_id, played_at):
+    return {
+        "id": track_id,
+        "name": f"Song {track_id}",
+        "artist": "Artist",
+        "album": "Album",
+        "played_at": played_at,
+    }
+
+
+def make_enriched_row(track_id, popularity, explicit, year, genres):
+    return {
+        "track_id": track_id,
+        "popularity": popularity,
+        "duration_ms": 200000,
+        "explicit": explicit,
+        "release_date": f"{year}-05-01",
+        "album_type": "album",
+        "genres": genres,
+        "artist_popularity": 50,
+        "artist_followers": 100,
+    }
+
+
+def test_profiles_refresh_incrementally():
+    """Test profiles aggregate new plays only and merge with stored sums."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+        engine = ProfileEngine(db_models)
+
+        db_models.save_tracks_bulk(
+            [
+                make_track("track1", "2025-10-03T12:00:00.000Z"),
+                make_track("track2", "2025-10-03T12:05:00.000Z"),
+            ],
+            user_id="alice",
+        )
+        db_models.save_tracks_bulk(
+            [make_track("track1", "2025-10-03T12:00:00.000Z")],
+            user_id="bob",
+        )
+        db_models.save_enriched_track_data_bulk(
+            [
+                make_enriched_row("track1", 80, True, 2020, ["rock"]),
+                make_enriched_row("track2", 40, False, 1999, ["rock", "pop"]),
+            ]
+        )
+
+        profiles = engine.refresh()
+        assert set(profiles) == {"alice", "bob"}
+        alice = profiles["alice"]
+        assert alice["track_count"] == 2
+        assert alice["based_on_tracks"] == ["track2", "track1"]
+        assert alice["profile_data"]["avg_popularity"] == 60
+        assert alice["profile_data"]["explicit_ratio"] == 0.5
+        assert alice["profile_data"]["genre_counts"] == {"rock": 2, "pop": 1}
+        assert alice["profile_data"]["release_year_histogram"] == {
+            "1999": 1,
+            "2020": 1,
+        }
+
+        # Nothing new: no profile is touched
+        assert engine.refresh() == {}
+
+        db_models.save_tracks_bulk(
+            [make_track("track1", "2025-10-03T13:00:00.000Z")],
+            user_id="alice",
+        )
+        profiles = engine.refresh()
+        assert set(profiles) == {"alice"}
+        alice = profiles["alice"]
+        assert alice["track_count"] == 3
+        assert alice["based_on_tracks"] == ["track1", "track2", "track1"]
+        assert alice["profile_data"]["avg_popularity"] == pytest.approx(
+            200 / 3
+        )
+        assert alice["profile_data"]["genre_distribution"] == {
+            "rock": 0.75,
+            "pop": 0.25,
+        }
+
+        # The stored profile matches a full recomputation
+        stored = db_models.get_user_profiles(["alice"])["alice"]
+        with db_models.db as conn:
+            conn.execute("DELETE FROM user_profiles")
+        recomputed = engine.refresh(["alice"])["alice"]
+        assert stored["profile_data"] == recomputed["profile_data"]
+        assert stored["track_count"] == recomputed["track_count"] == 3
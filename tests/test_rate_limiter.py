@@ -0,0 +1,28 @@
+import time
+
+from src.rate_limiter import RateLimiter
+
+
+def test_rate_limiter_allows_burst_then_throttles():
+    """Test the bucket hands out a burst, then refills at the rate."""
+    limiter = RateLimiter(rate=50, burst=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.05
+
+    for _ in range(5):
+        limiter.acquire()
+    # Five more tokens at 50/s take about 0.1s to accumulate
+    assert time.monotonic() - start >= 0.08
+
+
+def test_rate_limiter_pause_blocks_callers():
+    """Test pause() holds callers back for the Retry-After period."""
+    limiter = RateLimiter(rate=1000, burst=10)
+    limiter.pause(0.1)
+
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.09
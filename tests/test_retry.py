@@ -0,0 +1,35 @@
+import requests
+from spotipy.exceptions import SpotifyException
+
+from src.retry import RetryPolicy
+
+
+def test_retry_policy_backoff_is_capped_and_jittered():
+    """Test delays grow exponentially, stay capped and are jittered."""
+    policy = RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+    assert [policy.delay(n) for n in range(1, 5)] == [1, 2, 4, 5]
+
+    jittered = RetryPolicy(base_delay=1, max_delay=5)
+    assert all(0 <= jittered.delay(3) <= 4 for _ in range(100))
+
+
+def test_retry_policy_is_retryable():
+    """Test only transient failures are retried."""
+    assert RetryPolicy.is_retryable(SpotifyException(429, -1, "slow down"))
+    assert RetryPolicy.is_retryable(SpotifyException(502, -1, "bad gateway"))
+    assert RetryPolicy.is_retryable(requests.exceptions.ConnectionError())
+    assert not RetryPolicy.is_retryable(SpotifyException(400, -1, "bad id"))
+    assert not RetryPolicy.is_retryable(ValueError("parse error"))
+
+
+def test_retry_policy_retries_http_errors_by_status():
+    """Test requests HTTP errors are retried on transient statuses only."""
+
+    def http_error(status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        return requests.exceptions.HTTPError(response=response)
+
+    assert RetryPolicy.is_retryable(http_error(503))
+    assert not RetryPolicy.is_retryable(http_error(400))
+    assert not RetryPolicy.is_retryable(requests.exceptions.HTTPError())
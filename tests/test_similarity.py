@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+import numpy as np
+
+from src.database import DatabaseConnection, DatabaseModels
+from src.similarity import SimilarityEngine
+from tests.test_profiles import make_enriched_row, make_track
+
+TRACKS = {
+    "rock1": (60, False, 1991, ["rock", "grunge"]),
+    "rock2": (65, False, 1994, ["rock"]),
+    "rock3": (62, False, 1993, ["rock", "grunge"]),
+    "pop1": (90, True, 2021, ["pop"]),
+    "pop2": (88, True, 2022, ["pop", "dance pop"]),
+}
+
+
+def save_plays(db_models, user_id, track_ids, day=3):
+    db_models.save_tracks_bulk(
+        [
+            make_track(track_id, f"2025-10-{day:02d}T12:0{i}:00.000Z")
+            for i, track_id in enumerate(track_ids)
+        ],
+        user_id=user_id,
+    )
+
+
+def test_similarity_engine_finds_similar_users_and_tracks():
+    """Test users who play alike are matched and get unplayed tracks."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        save_plays(db_models, "alice", ["rock1", "rock2"])
+        save_plays(db_models, "bob", ["rock1", "rock2", "rock3"])
+        save_plays(db_models, "carol", ["pop1", "pop2"])
+        db_models.save_enriched_track_data_bulk(
+            [
+                make_enriched_row(track_id, *features)
+                for track_id, features in TRACKS.items()
+            ]
+        )
+
+        engine = SimilarityEngine(db_models, batch_size=2)
+        assert engine.refresh() == ["alice", "bob", "carol"]
+        assert engine.track_matrix.shape[0] == len(TRACKS)
+        assert np.allclose(np.diag(engine.similarity), 1.0, atol=1e-5)
+
+        similar = engine.similar_users("alice")
+        assert [s["user_id"] for s in similar] == ["bob", "carol"]
+        assert similar[0]["similarity"] > similar[1]["similarity"]
+
+        # Bob's unplayed rock track ranks above the pop tracks
+        recommended = engine.recommend("alice", limit=2)
+        assert len(recommended) == 2
+        assert recommended[0]["track_id"] == "rock3"
+        assert recommended[0]["score"] > recommended[1]["score"]
+        assert engine.recommend("nobody") == []
+
+
+def test_similarity_engine_refreshes_only_users_with_new_plays():
+    """Test refresh() recomputes rows of changed users alone."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(DatabaseConnection(db_path))
+        db_models.initialize_database()
+
+        save_plays(db_models, "alice", ["rock1"])
+        save_plays(db_models, "carol", ["pop1"])
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("rock1", *TRACKS["rock1"])]
+        )
+
+        engine = SimilarityEngine(db_models)
+        assert engine.refresh() == ["alice", "carol"]
+        assert engine.refresh() == []
+        before = engine.similarity.copy()
+
+        # Carol's track is enriched later: her row is redone
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("pop1", *TRACKS["pop1"])]
+        )
+        assert engine.refresh() == ["carol"]
+        assert engine.similarity[0, 0] == before[0, 0]
+
+        save_plays(db_models, "carol", ["pop2"], day=4)
+        assert engine.refresh() == ["carol"]
+        assert [r["track_id"] for r in engine.recommend("carol")] == ["rock1"]
+
+        # Re-enriching a track updates its features and its listeners
+        row = engine.track_ids.index("rock1")
+        features = engine.track_matrix[row].copy()
+        db_models.save_enriched_track_data_bulk(
+            [make_enriched_row("rock1", 20, False, 1991, ["grunge"])]
+        )
+        assert engine.refresh() == ["alice"]
+        assert not np.array_equal(engine.track_matrix[row], features)
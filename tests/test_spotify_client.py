@@ -1,6 +1,12 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
+from spotipy.exceptions import SpotifyException
+
+from src.retry import RetryPolicy
 from src.spotify_client import SpotifyClient
 
 
@@ -186,3 +192,261 @@ def test_env_loading():
     assert os.getenv("SPOTIFY_CLIENT_ID") is not None
     assert os.getenv("SPOTIFY_CLIENT_SECRET") is not None
     assert os.getenv("SPOTIFY_REDIRECT_URI") is not None
+
+
+def make_play_item(track_id, played_at):
+    return {
+        "track": {
+            "id": track_id,
+            "name": f"Song {track_id}",
+            "artists": [{"name": "Test Artist"}],
+            "album": {"name": "Test Album"},
+        },
+        "played_at": played_at,
+    }
+
+
+@patch.dict(
+    os.environ,
+    {
+        "SPOTIFY_CLIENT_ID": "dummy_id",
+        "SPOTIFY_CLIENT_SECRET": "dummy_secret",
+        "SPOTIFY_REDIRECT_URI": "http://localhost:8888/callback",
+    },
+)
+@patch("src.spotify_client.RECENTLY_PLAYED_PAGE_SIZE", 2)
+@patch("src.spotify_client.SpotifyOAuth")
+@patch("src.spotify_client.spotipy.Spotify")
+def test_get_tracks_played_after_pages_with_cursor(mock_spotify, mock_oauth):
+    """Test incremental fetch follows the after cursor until exhausted."""
+    mock_instance = MagicMock()
+    mock_instance.current_user_recently_played.side_effect = [
+        {
+            "items": [
+                make_play_item("track2", "2025-10-03T12:02:00.000Z"),
+                make_play_item("track1", "2025-10-03T12:01:00.000Z"),
+            ],
+            "cursors": {"after": "1759492920000"},
+        },
+        {
+            "items": [make_play_item("track3", "2025-10-03T12:03:00.000Z")],
+            "cursors": {"after": "1759492980000"},
+        },
+    ]
+    mock_spotify.return_value = mock_instance
+
+    client = SpotifyClient()
+    after = datetime(2025, 10, 3, 12, 0)
+    tracks = client.get_tracks_played_after(after)
+
+    assert [t["id"] for t in tracks] == ["track2", "track1", "track3"]
+    calls = mock_instance.current_user_recently_played.call_args_list
+    assert calls[0].kwargs == {"limit": 2, "after": 1759492800000}
+    assert calls[1].kwargs == {"limit": 2, "after": 1759492920000}
+
+
+@patch.dict(
+    os.environ,
+    {
+        "SPOTIFY_CLIENT_ID": "dummy_id",
+        "SPOTIFY_CLIENT_SECRET": "dummy_secret",
+        "SPOTIFY_REDIRECT_URI": "http://localhost:8888/callback",
+    },
+)
+@patch("src.spotify_client.SpotifyOAuth")
+@patch("src.spotify_client.spotipy.Spotify")
+def test_get_track_enriched_data_reuses_cached_artists(
+    mock_spotify, mock_oauth
+):
+    """Test artists fetched in one run are not refetched in the next."""
+    mock_instance = MagicMock()
+    mock_instance.tracks.return_value = {
+        "tracks": [
+            {
+                "id": "track1",
+                "name": "Test Song 1",
+                "album": {"release_date": "2023-01-15", "album_type": "album"},
+                "artists": [{"id": "artist1", "name": "Test Artist 1"}],
+            }
+        ]
+    }
+    mock_instance.artists.return_value = {
+        "artists": [
+            {
+                "id": "artist1",
+                "name": "Test Artist 1",
+                "genres": ["rock"],
+                "popularity": 70,
+                "followers": {"total": 1000000},
+            }
+        ]
+    }
+    mock_spotify.return_value = mock_instance
+
+    client = SpotifyClient()
+    client.get_track_enriched_data(["track1"])
+    assert client.last_enrichment_stats["artist_cache_hit_ratio"] == 0
+
+    # The next run starts with a fresh track cache but shares artists
+    client = SpotifyClient(artist_cache=client.artist_cache)
+    enriched_data = client.get_track_enriched_data(["track1"])
+    assert mock_instance.artists.call_count == 1
+    assert client.last_enrichment_stats["artist_cache_hit_ratio"] == 1
+    assert enriched_data[0]["artists"][0]["genres"] == ["rock"]
+
+
+@patch.dict(
+    os.environ,
+    {
+        "SPOTIFY_CLIENT_ID": "dummy_id",
+        "SPOTIFY_CLIENT_SECRET": "dummy_secret",
+        "SPOTIFY_REDIRECT_URI": "http://localhost:8888/callback",
+    },
+)
+@patch("src.spotify_client.SpotifyOAuth")
+@patch("src.spotify_client.spotipy.Spotify")
+def test_get_track_enriched_data_concurrent_in_order(mock_spotify, mock_oauth):
+    """Test concurrent batches keep input order and survive a 429."""
+    mock_instance = MagicMock()
+    rate_limited = []
+
+    def tracks(batch):
+        if not rate_limited:
+            rate_limited.append(True)
+            raise SpotifyException(
+                429, -1, "Too many requests", headers={"Retry-After": "0"}
+            )
+        return {
+            "tracks": [
+                {"id": tid, "name": tid, "artists": [], "album": {}}
+                for tid in batch
+            ]
+        }
+
+    mock_instance.tracks.side_effect = tracks
+    mock_spotify.return_value = mock_instance
+
+    client = SpotifyClient(max_workers=4)
+    track_ids = [f"track{i}" for i in range(180)]
+    enriched_data = client.get_track_enriched_data(track_ids)
+
+    assert [t["id"] for t in enriched_data] == track_ids
+    # 4 batches plus the one retried after the 429
+    assert mock_instance.tracks.call_count == 5
+
+
+@patch.dict(
+    os.environ,
+    {
+        "SPOTIFY_CLIENT_ID": "dummy_id",
+        "SPOTIFY_CLIENT_SECRET": "dummy_secret",
+        "SPOTIFY_REDIRECT_URI": "http://localhost:8888/callback",
+    },
+)
+@patch("src.spotify_client.SpotifyOAuth")
+@patch("src.spotify_client.spotipy.Spotify")
+def test_get_track_enriched_data_retries_and_isolates_bad_ids(
+    mock_spotify, mock_oauth
+):
+    """Test transient errors are retried and bad IDs are bisected out."""
+    mock_instance = MagicMock()
+    attempts = []
+
+    def tracks(batch):
+        attempts.append(list(batch))
+        if len(attempts) == 1:
+            raise SpotifyException(503, -1, "Service unavailable")
+        if "bad" in batch:
+            raise SpotifyException(400, -1, "Invalid base62 id")
+        return {
+            "tracks": [
+                {"id": tid, "name": tid, "artists": [], "album": {}}
+                for tid in batch
+            ]
+        }
+
+    mock_instance.tracks.side_effect = tracks
+    mock_spotify.return_value = mock_instance
+
+    client = SpotifyClient(retry_policy=RetryPolicy(base_delay=0))
+    enriched_data = client.get_track_enriched_data(
+        ["track1", "track2", "bad", "track3"]
+    )
+
+    assert [t["id"] for t in enriched_data] == ["track1", "track2", "track3"]
+    assert list(client.last_failed_track_ids) == ["bad"]
+
+
+@patch.dict(
+    os.environ,
+    {
+        "SPOTIFY_CLIENT_ID": "dummy_id",
+        "SPOTIFY_CLIENT_SECRET": "dummy_secret",
+        "SPOTIFY_REDIRECT_URI": "http://localhost:8888/callback",
+    },
+)
+@patch("src.spotify_client.SpotifyOAuth")
+@patch("src.spotify_client.spotipy.Spotify")
+def test_get_track_enriched_data_records_tracks_returned_as_null(
+    mock_spotify, mock_oauth
+):
+    """Test IDs Spotify answers with null are recorded as failures."""
+    mock_instance = MagicMock()
+    mock_instance.tracks.return_value = {
+        "tracks": [
+            {"id": "track1", "name": "track1", "artists": [], "album": {}},
+            None,
+        ]
+    }
+    mock_spotify.return_value = mock_instance
+
+    client = SpotifyClient()
+    enriched_data = client.get_track_enriched_data(["track1", "removed"])
+
+    assert [t["id"] for t in enriched_data] == ["track1"]
+    assert list(client.pop_failed_track_ids()) == ["removed"]
+
+
+@patch.dict(
+    os.environ,
+    {
+        "SPOTIFY_CLIENT_ID": "dummy_id",
+        "SPOTIFY_CLIENT_SECRET": "dummy_secret",
+        "SPOTIFY_REDIRECT_URI": "http://localhost:8888/callback",
+    },
+)
+@patch("src.spotify_client.SpotifyOAuth")
+@patch("src.spotify_client.spotipy.Spotify")
+def test_get_track_enriched_data_shares_cached_and_in_flight_tracks(
+    mock_spotify, mock_oauth
+):
+    """Test known tracks are never refetched, even concurrently."""
+    mock_instance = MagicMock()
+    fetched = []
+
+    def tracks(batch):
+        fetched.extend(batch)
+        time.sleep(0.1)
+        return {
+            "tracks": [
+                {"id": tid, "name": tid, "artists": [], "album": {}}
+                for tid in batch
+            ]
+        }
+
+    mock_instance.tracks.side_effect = tracks
+    mock_spotify.return_value = mock_instance
+
+    client = SpotifyClient()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(
+            executor.map(client.get_track_enriched_data_single, ["track1"] * 4)
+        )
+    assert [r["id"] for r in results] == ["track1"] * 4
+    assert fetched == ["track1"]
+
+    # Batch and single lookups both hit the cache afterwards
+    enriched_data = client.get_track_enriched_data(["track2", "track1"])
+    assert [t["id"] for t in enriched_data] == ["track2", "track1"]
+    assert client.get_track_enriched_data_single("track2")["id"] == "track2"
+    assert fetched == ["track1", "track2"]
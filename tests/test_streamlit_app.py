@@ -3,6 +3,23 @@ import sys
 import types
 
 
+def dummy_cache(func=None, **kwargs):
+    """Stand-in for st.cache_resource / st.cache_data decorators."""
+
+    def decorate(f):
+        cache = {}
+
+        def wrapper(*args):
+            if args not in cache:
+                cache[args] = f(*args)
+            return cache[args]
+
+        wrapper.clear = cache.clear
+        return wrapper
+
+    return decorate(func) if func else decorate
+
+
 # Patch streamlit to avoid running the actual app logic
 class DummyStreamlit:
     def __init__(self):
@@ -16,6 +33,8 @@ class DummyStreamlit:
         self.caption = lambda *a, **kw: self._set("caption_called")
         self.info = lambda *a, **kw: self._set("info_called")
         self.error = lambda *a, **kw: self._set("error_called")
+        self.cache_resource = dummy_cache
+        self.cache_data = dummy_cache
 
     def _set(self, attr):
         setattr(self, attr, True)
@@ -27,13 +46,39 @@ def import_fresh_streamlit_app():
     importlib.invalidate_caches()
     import src.streamlit_app  # noqa: F401
 
+    return src.streamlit_app
 
-def test_streamlit_app_runs(monkeypatch):
+
+class DummyDatabaseConnection:
+    opened = []
+
+    @classmethod
+    def for_reading(cls, db_path=None, **kwargs):
+        cls.opened.append("read-only")
+        return cls()
+
+
+def install_dummies(monkeypatch, models_cls):
     dummy_st = DummyStreamlit()
+    DummyDatabaseConnection.opened = []
     monkeypatch.setitem(sys.modules, "streamlit", dummy_st)
+    monkeypatch.setitem(
+        sys.modules,
+        "src.database",
+        types.SimpleNamespace(
+            DatabaseConnection=DummyDatabaseConnection,
+            DatabaseModels=models_cls,
+        ),
+    )
+    return dummy_st
+
 
-    class DummySpotifyClient:
-        def get_recent_tracks(self, limit=10):
+def test_streamlit_app_runs(monkeypatch):
+    class DummyDatabaseModels:
+        def __init__(self, db):
+            pass
+
+        def get_recent_tracks(self, limit=7):
             return [
                 {
                     "name": "Test Song",
@@ -43,11 +88,7 @@ def test_streamlit_app_runs(monkeypatch):
                 }
             ]
 
-    monkeypatch.setitem(
-        sys.modules,
-        "spotify_client",
-        types.SimpleNamespace(SpotifyClient=DummySpotifyClient),
-    )
+    dummy_st = install_dummies(monkeypatch, DummyDatabaseModels)
     import_fresh_streamlit_app()
     assert dummy_st.title_called
     assert dummy_st.write_called
@@ -55,34 +96,47 @@ def test_streamlit_app_runs(monkeypatch):
 
 
 def test_streamlit_app_no_tracks(monkeypatch):
-    dummy_st = DummyStreamlit()
-    monkeypatch.setitem(sys.modules, "streamlit", dummy_st)
+    class DummyDatabaseModels:
+        def __init__(self, db):
+            pass
 
-    class DummySpotifyClient:
-        def get_recent_tracks(self, limit=10):
+        def get_recent_tracks(self, limit=7):
             return []
 
-    monkeypatch.setitem(
-        sys.modules,
-        "spotify_client",
-        types.SimpleNamespace(SpotifyClient=DummySpotifyClient),
-    )
+    dummy_st = install_dummies(monkeypatch, DummyDatabaseModels)
     import_fresh_streamlit_app()
     assert dummy_st.info_called
 
 
 def test_streamlit_app_error(monkeypatch):
-    dummy_st = DummyStreamlit()
-    monkeypatch.setitem(sys.modules, "streamlit", dummy_st)
+    class DummyDatabaseModels:
+        def __init__(self, db):
+            pass
 
-    class DummySpotifyClient:
-        def get_recent_tracks(self, limit=10):
+        def get_recent_tracks(self, limit=7):
             raise Exception("Test error")
 
-    monkeypatch.setitem(
-        sys.modules,
-        "spotify_client",
-        types.SimpleNamespace(SpotifyClient=DummySpotifyClient),
-    )
+    dummy_st = install_dummies(monkeypatch, DummyDatabaseModels)
     import_fresh_streamlit_app()
     assert dummy_st.error_called
+
+
+def test_streamlit_app_serves_cached_read_only_results(monkeypatch):
+    calls = {"read": 0}
+
+    class DummyDatabaseModels:
+        def __init__(self, db):
+            pass
+
+        def get_recent_tracks(self, limit=7):
+            calls["read"] += 1
+            return []
+
+    install_dummies(monkeypatch, DummyDatabaseModels)
+    app = import_fresh_streamlit_app()
+
+    # Reruns reuse the read-only models and cached query results
+    app.load_recent_tracks(app.TRACK_LIMIT)
+    app.get_db_models()
+    assert calls == {"read": 1}
+    assert DummyDatabaseConnection.opened == ["read-only"]
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from src.data_persistence import DataPersistenceLayer
+from src.database import MEMORY_DB, DatabaseConnection, DatabaseModels
+from src.team_sync import TeamSync, discover_team_members
+
+
+def make_user_client(user_id, delay=0.0, error=None):
+    def get_recent_tracks(limit=10):
+        time.sleep(delay)
+        if error:
+            raise error
+        return [
+            {
+                "id": "shared_track",
+                "name": "Shared Song",
+                "artist": "Artist",
+                "album": "Album",
+                "played_at": "2025-10-03T12:00:00.000Z",
+            },
+            {
+                "id": f"{user_id}_track",
+                "name": f"{user_id} Song",
+                "artist": "Artist",
+                "album": "Album",
+                "played_at": "2025-10-03T12:01:00.000Z",
+            },
+        ]
+
+    client = MagicMock()
+    client.get_recent_tracks.side_effect = get_recent_tracks
+    return client
+
+
+def test_discover_team_members():
+    """Test users are discovered from token cache file names."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for user_id in ("bob", "alice"):
+            open(os.path.join(temp_dir, user_id), "w").close()
+        os.mkdir(os.path.join(temp_dir, "not_a_user"))
+
+        assert discover_team_members(temp_dir) == ["alice", "bob"]
+        assert discover_team_members(os.path.join(temp_dir, "none")) == []
+
+
+def test_team_sync_fetches_concurrently_with_one_writer():
+    """Test users sync in parallel and enrichment is coalesced."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        db_models = DatabaseModels(
+            DatabaseConnection(db_path, persistent=True)
+        )
+
+        shared_client = MagicMock()
+        shared_client.get_track_enriched_data.return_value = []
+        shared_client.pop_failed_track_ids.return_value = {}
+        persistence = DataPersistenceLayer(shared_client, db_models)
+
+        writer_threads = set()
+        save_plays = persistence.save_plays
+
+        def recording_save_plays(tracks, user_id):
+            writer_threads.add(threading.current_thread())
+            return save_plays(tracks, user_id)
+
+        persistence.save_plays = recording_save_plays
+
+        clients = {
+            f"user{i}": make_user_client(f"user{i}", delay=0.2)
+            for i in range(8)
+        }
+        clients["broken"] = make_user_client("broken", error=Exception("401"))
+
+        start = time.monotonic()
+        new_plays = TeamSync(persistence, clients).sync_all()
+        elapsed = time.monotonic() - start
+
+        # Roughly the slowest user, not the sum of all users
+        assert elapsed < 1.0
+        assert new_plays["broken"] is None
+        assert new_plays["user0"] == 2
+        assert writer_threads == {threading.current_thread()}
+
+        # One enrichment call for the whole team, each track once
+        shared_client.get_track_enriched_data.assert_called_once()
+        track_ids = shared_client.get_track_enriched_data.call_args.args[0]
+        assert sorted(track_ids) == sorted(
+            ["shared_track"] + [f"user{i}_track" for i in range(8)]
+        )
+
+        user_tracks = db_models.get_recent_tracks(limit=10, user_id="user3")
+        assert {t["id"] for t in user_tracks} == {
+            "shared_track",
+            "user3_track",
+        }
+        persistence.close()
+
+
+@patch.dict(
+    os.environ,
+    {
+        "SPOTIFY_CLIENT_ID": "dummy_id",
+        "SPOTIFY_CLIENT_SECRET": "dummy_secret",
+        "SPOTIFY_REDIRECT_URI": "http://localhost:8888/callback",
+    },
+)
+def test_team_clients_share_a_pool_sized_for_the_workers():
+    """Test every fetch worker can keep its own pooled connection."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for user_id in ("alice", "bob"):
+            open(os.path.join(temp_dir, user_id), "w").close()
+        persistence = DataPersistenceLayer(
+            MagicMock(), DatabaseModels(DatabaseConnection(MEMORY_DB))
+        )
+
+        team_sync = TeamSync.from_token_cache_dir(
+            persistence, temp_dir, max_workers=32
+        )
+
+        sessions = {id(c.session) for c in team_sync.clients.values()}
+        assert len(sessions) == 1
+        session = team_sync.clients["alice"].session
+        adapter = session.get_adapter("https://api.spotify.com")
+        assert adapter._pool_maxsize == 32
+        persistence.close()
@@ -0,0 +1,276 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from src.database import DatabaseConnection, DatabaseModels
+from src.rate_limiter import RateLimiter
+from src.retry import RetryPolicy
+from src.teams import DEFAULT_SETTLE_MINUTES, TeamsPoster, WebhookSender
+
+NOW = datetime(2025, 10, 3, 15, 0)
+
+
+@contextmanager
+def webhook_server(statuses=()):
+    """
+    Run a local stand-in for a Teams webhook.
+
+    Requests are answered with ``statuses`` in order, then with 200.
+    Yields the URL and the list of received JSON bodies.
+    """
+    received = []
+    pending_statuses = list(statuses)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            with lock:
+                status = pending_statuses.pop(0) if pending_statuses else 200
+                if status == 200:
+                    received.append(json.loads(body))
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/webhook", received
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def make_sender(url):
+    return WebhookSender(
+        url,
+        rate_limiter=RateLimiter(rate=1000, burst=100),
+        retry_policy=RetryPolicy(base_delay=0.01, jitter=False),
+    )
+
+
+def make_db_models(temp_dir):
+    db_path = os.path.join(temp_dir, "test.duckdb")
+    db_models = DatabaseModels(DatabaseConnection(db_path, persistent=True))
+    db_models.initialize_database()
+    for user_id, track_id, played_at in (
+        ("alice", "track1", "2025-10-03T12:05:00.000Z"),
+        ("alice", "track2", "2025-10-03T12:45:00.000Z"),
+        ("alice", "track1", "2025-10-03T13:10:00.000Z"),
+        ("bob", "track2", "2025-10-03T12:30:00.000Z"),
+        ("bob", "track1", "2025-10-03T14:50:00.000Z"),
+    ):
+        db_models.save_track(
+            track_id, f"Song {track_id}", "Artist", "Album", played_at, user_id
+        )
+    return db_models
+
+
+def test_unposted_digests_group_plays_per_user_and_window():
+    """Test plays are grouped per user and hour, closed windows only."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_models = make_db_models(temp_dir)
+
+        digests = db_models.get_unposted_digests(
+            60, until=datetime(2025, 10, 3, 14, 0)
+        )
+        assert [d["message_key"] for d in digests] == [
+            "alice/60/2025-10-03T12:00",
+            "bob/60/2025-10-03T12:00",
+            "alice/60/2025-10-03T13:00",
+        ]
+        assert digests[0]["track_count"] == 2
+        assert [t["name"] for t in digests[0]["tracks"]] == [
+            "Song track1",
+            "Song track2",
+        ]
+
+        # Claimed digests are left out, and only claimed once
+        assert sorted(db_models.claim_messages(digests[:2])) == [
+            "alice/60/2025-10-03T12:00",
+            "bob/60/2025-10-03T12:00",
+        ]
+        assert db_models.claim_messages(digests[:1]) == []
+        assert len(db_models.get_unposted_digests(60, until=NOW)) == 2
+        db_models.close()
+
+
+def test_teams_poster_posts_each_digest_once():
+    """Test digests are posted over HTTP and never sent twice."""
+    with (
+        tempfile.TemporaryDirectory() as temp_dir,
+        webhook_server() as (url, received),
+    ):
+        db_models = make_db_models(temp_dir)
+        sender = make_sender(url)
+        poster = TeamsPoster(db_models, sender, batch_size=2)
+
+        assert poster.post_pending(until=NOW) == {"posted": 4, "failed": 0}
+        assert len(received) == 4
+        titles = sorted(
+            message["attachments"][0]["content"]["body"][0]["text"]
+            for message in received
+        )
+        assert titles == [
+            "alice played 1 tracks",
+            "alice played 2 tracks",
+            "bob played 1 tracks",
+            "bob played 1 tracks",
+        ]
+
+        # A second poster over the same ledger has nothing left to send
+        other = TeamsPoster(db_models, sender)
+        assert other.post_pending(until=NOW) == {"posted": 0, "failed": 0}
+        assert len(received) == 4
+
+        with db_models.db as conn:
+            assert conn.execute(
+                "SELECT count(*) FROM posted_messages WHERE status = 'posted'"
+            ).fetchone() == (4,)
+        sender.close()
+        db_models.close()
+
+
+def test_teams_poster_retries_and_releases_failed_posts():
+    """Test transient errors are retried and failed posts are released."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_models = make_db_models(temp_dir)
+        until = datetime(2025, 10, 3, 13, 0)
+
+        # One 503 is retried by the sender and the digest still posts
+        with webhook_server(statuses=[503]) as (url, received):
+            sender = make_sender(url)
+            poster = TeamsPoster(db_models, sender, max_workers=1)
+            totals = poster.post_pending(until=until)
+            sender.close()
+        assert totals == {"posted": 2, "failed": 0}
+        assert len(received) == 2
+
+        # A rejected post is released and sent again on the next run
+        until = datetime(2025, 10, 3, 14, 0)
+        with webhook_server(statuses=[400]) as (url, received):
+            sender = make_sender(url)
+            poster = TeamsPoster(db_models, sender)
+            assert poster.post_pending(until=until) == {
+                "posted": 0,
+                "failed": 1,
+            }
+            assert poster.post_pending(until=until) == {
+                "posted": 1,
+                "failed": 0,
+            }
+            sender.close()
+        assert len(received) == 1
+        db_models.close()
+
+
+def test_teams_poster_waits_for_late_plays_to_settle():
+    """Test windows are posted only after late syncs have landed."""
+    with (
+        tempfile.TemporaryDirectory() as temp_dir,
+        webhook_server() as (url, received),
+    ):
+        db_models = make_db_models(temp_dir)
+        sender = make_sender(url)
+        poster = TeamsPoster(db_models, sender)
+        settled = datetime(2025, 10, 3, 13, 0) + timedelta(
+            minutes=DEFAULT_SETTLE_MINUTES
+        )
+        with patch("src.teams.datetime") as mock_datetime:
+            # The 12:00 window has closed but has not settled yet
+            mock_datetime.now.return_value = settled - timedelta(minutes=1)
+            assert poster.post_pending()["posted"] == 0
+
+            # An idle user's 12:50 play is only synced after 13:00
+            db_models.save_track(
+                "track3",
+                "Song track3",
+                "Artist",
+                "Album",
+                "2025-10-03T12:50:00.000Z",
+                "alice",
+            )
+            mock_datetime.now.return_value = settled
+            assert poster.post_pending()["posted"] == 2
+        alice = next(
+            message["attachments"][0]["content"]["body"][0]["text"]
+            for message in received
+            if "alice" in str(message)
+        )
+        assert alice == "alice played 3 tracks"
+        sender.close()
+        db_models.close()
+
+
+def test_stale_pending_claims_are_reclaimed():
+    """Test digests claimed by a crashed poster are posted later."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_models = make_db_models(temp_dir)
+        until = datetime(2025, 10, 3, 13, 0)
+        digests = db_models.get_unposted_digests(60, until=until)
+        assert len(db_models.claim_messages(digests)) == 2
+
+        # Live claims are left alone until their lease runs out
+        assert db_models.get_unposted_digests(60, until=until) == []
+        assert db_models.claim_messages(digests) == []
+        stale = db_models.get_unposted_digests(
+            60, until=until, lease_minutes=0
+        )
+        assert len(stale) == 2
+        assert len(db_models.claim_messages(stale, lease_minutes=0)) == 2
+
+        # Posted digests are never reclaimed
+        db_models.mark_messages_posted([d["message_key"] for d in stale])
+        assert not db_models.get_unposted_digests(
+            60, until=until, lease_minutes=0
+        )
+        db_models.close()
+
+
+def test_teams_poster_skips_old_history_on_first_run():
+    """Test a first run posts recent windows, not the seeded history."""
+    with (
+        tempfile.TemporaryDirectory() as temp_dir,
+        webhook_server() as (url, received),
+    ):
+        db_models = make_db_models(temp_dir)
+        db_models.save_track(
+            "track3",
+            "Song track3",
+            "Artist",
+            "Album",
+            "2025-06-01T09:00:00.000Z",
+            "alice",
+        )
+        sender = make_sender(url)
+        poster = TeamsPoster(db_models, sender)
+
+        assert poster.post_pending(until=NOW) == {"posted": 4, "failed": 0}
+        assert "Song track3" not in json.dumps(received)
+
+        # Later runs read on from the latest posted window
+        db_models.save_track(
+            "track3",
+            "Song track3",
+            "Artist",
+            "Album",
+            "2025-10-03T15:20:00.000Z",
+            "bob",
+        )
+        until = NOW + timedelta(hours=1)
+        assert poster.post_pending(until=until)["posted"] == 1
+        assert db_models.get_latest_posted_window() == NOW
+        sender.close()
+        db_models.close()